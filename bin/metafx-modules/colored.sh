@@ -12,9 +12,11 @@ help_message () {
     echo ""
     echo "Launch options:"
     echo "    -h | --help                       show this help message and exit"
-    echo "    -t | --threads       <int>        number of threads to use [default: all]"
-    echo "    -m | --memory        <MEM>        memory to use (values with suffix: 1500M, 4G, etc.) [default: 90% of free RAM]"
+    echo "    -t | --threads       <int>        number of threads to use [default: all available to the job]"
+    echo "    -m | --memory        <MEM>        memory to use (values with suffix: 1500M, 4G, etc.) [default: 90% of RAM available to the job]"
     echo "    -w | --work-dir      <dirname>    working directory [default: workDir/]"
+    echo "         --plan                       assign memory and threads to every step according to sizes of input reads and k-mers (within -m and -t limits) and print resources plan. Per-sample steps get at most one thread per sample and as many threads as fit into memory [default: False]"
+    echo "         --dry-run                    print resources plan and exit without running any step [default: False]"
     echo ""
     echo "Input parameters:"
     echo "    -k | --k             <int>        k-mer size (in nucleotides, maximum value is 31) [mandatory]"
@@ -26,7 +28,13 @@ help_message () {
     echo "         --n-comps       <int>        select not more than <int> components for each category [default: -1, means all components]"
     echo "         --perc          <float>      relative abundance of k-mer in category to be considered color-specific [default: 0.9]"
     echo "         --kmers-dir     <dirname>    directory with pre-computed k-mers for samples in binary format [optional]"
+    echo "         --shards        <int>        split k-mers into <int> shards by hash and color each shard separately, memory of coloring decreases proportionally. Cannot be used with --total-coverage [default: 1]"
+    echo "         --shard-jobs    <int>        number of shards colored concurrently, threads and memory are split equally between them [default: 1]"
+    echo "         --kmers-cache   <dirname>    directory with k-mers cache shared between runs, keyed by reads files content, k and bad frequency. Cache size is limited by METAFX_KMERS_CACHE_SIZE variable [optional, default: \$METAFX_KMERS_CACHE]"
+    echo "         --reads-cache   <dirname>    directory for decompressed copies of gzip/bzip2 reads files shared between runs, files are decompressed in parallel, one file uses several threads only via pigz/lbzip2/pbzip2 if installed or for multi-stream bzip2 (e.g. written by pbzip2) [optional, default: \$METAFX_READS_CACHE]"
     echo "         --skip-graph                 if TRUE skip de Bruijn graph and fasta construction from components [default: False]"
+    echo "         --retain        <policy>     files to keep in working directory: all (every intermediate file) or needed (only components, contigs, graphs and feature table used by calc_features, bandage and feature_analysis modules) [default: all]"
+    echo "         --compress                   compress text outputs (GFA, FASTA, feature vectors) with gzip [default: False]"
     echo "";}
 
 
@@ -40,10 +48,14 @@ pwd=`dirname "$0"`
 comment () { ${SOFT}/pretty_print.py "$1" "-"; }
 warning () { ${SOFT}/pretty_print.py "$1" "*"; }
 error   () { ${SOFT}/pretty_print.py "$1" "*"; exit 1; }
+source ${SOFT}/kmers_step.sh
 
 
 
 w="workDir"
+retain="all"
+kmersCache="${METAFX_KMERS_CACHE}"
+readsCache="${METAFX_READS_CACHE}"
 POSITIONAL=()
 while [[ $# -gt 0 ]]
 do
@@ -73,10 +85,30 @@ case $key in
     shift
     shift
     ;;
+    --kmers-cache)
+    kmersCache="$2"
+    shift
+    shift
+    ;;
+    --reads-cache)
+    readsCache="$2"
+    shift
+    shift
+    ;;
     --total-coverage)
     totalCoverage=true
     shift
     ;;
+    --shards)
+    shards="$2"
+    shift
+    shift
+    ;;
+    --shard-jobs)
+    shardJobs="$2"
+    shift
+    shift
+    ;;
     --separate)
     separate=true
     shift
@@ -115,6 +147,24 @@ case $key in
     skipGraph=true
     shift
     ;;
+    --retain)
+    retain="$2"
+    shift
+    shift
+    ;;
+    --compress)
+    compress=true
+    shift
+    ;;
+    --plan)
+    plan=true
+    shift
+    ;;
+    --dry-run)
+    plan=true
+    dryRun=true
+    shift
+    ;;
     *)    # unknown option
     POSITIONAL+=("$1") # save it in an array for later
     shift
@@ -124,56 +174,84 @@ done
 set -- "${POSITIONAL[@]}" # restore positional parameters
 
 
+if [[ ${retain} != "all" && ${retain} != "needed" ]]; then
+    error "Unknown retention policy '${retain}'. Select one of: all, needed"
+    exit 1
+fi
+
+
 if [[ ${separate} && ${linear} ]]; then
     help_message
     error "Error! Both 'separate' and 'linear' flags were selected! You can choose only one."
     exit 1
 fi
 
+if [[ ${totalCoverage} && ${shards:-1} -gt 1 ]]; then
+    error "Error! 'total-coverage' flag cannot be used with more than 1 shard."
+    exit 1
+fi
+
 
 cmd="${PIPES}/metafast.sh "
 if [[ $k ]]; then
     cmd+="-k $k "
 fi
-if [[ $m ]]; then
-    cmd+="-m $m "
-fi
-if [[ $p ]]; then
-    cmd+="-p $p "
-fi
 
 
 
-# ==== Step 1 ====
-if [[ ${kmers} ]]; then
-    kmersDir="${kmers}"
-    mkdir ${w}
-    comment "Skipping step 1: will use provided k-mers"
-else
-    kmersDir="$w/kmers/kmers"
-    comment "Running step 1: counting k-mers for samples"
-    cmd1=$cmd
-    cmd1+="-t kmer-counter-many "
-    if [[ ${b} ]]; then
-        cmd1+="-b ${b} "
+# default budget is memory and CPUs available to this job (cgroup and SLURM limits), not the whole shared node
+read mNode pNode <<< "$(python3 ${SOFT}/split_resources.py "${m}" "${p}" 1)"
+m=${m:-${mNode}}
+p=${p:-${pNode}}
+
+# memory and threads options for step $1: planned values if resources plan was made, otherwise global ones
+resources () {
+    local mStep=$m
+    local pStep=$p
+    if [[ ${plan} ]]; then
+        read mStep pStep <<< "$(awk -F'\t' -v s=$1 '$1 == s {print $2, $3}' ${w}/resources_plan.tsv)"
+    fi
+    if [[ ${mStep} ]]; then
+        echo -n "-m ${mStep} "
     fi
-    if [[ ${i} ]]; then
-        cmd1+="-i $(cut -f1 ${i} | tr '\n' ' ') "
+    if [[ ${pStep} ]]; then
+        echo -n "-p ${pStep} "
     fi
-    cmd1+="-w ${w}/kmers/"
+}
 
-    echo "$cmd1"
-    $cmd1
-    if [[ $? -eq 0 ]]; then
-        comment "Step 1 finished successfully!"
-    else
-        error "Error during step 1!"
+if [[ ${plan} ]]; then
+    cmdPlan="python3 ${SOFT}/plan_resources.py --pipeline colored --reads-file ${i} "
+    if [[ ${kmers} ]]; then
+        cmdPlan+="--kmers-dir ${kmers} "
+    fi
+    if [[ $m ]]; then
+        cmdPlan+="-m $m "
+    fi
+    if [[ $p ]]; then
+        cmdPlan+="-t $p "
+    fi
+    if [[ -z ${dryRun} ]]; then
+        mkdir -p ${w}
+        cmdPlan+="--out ${w}/resources_plan.tsv "
+    fi
+    ${cmdPlan}
+    if [[ $? -ne 0 ]]; then
+        error "Cannot make resources plan!"
         exit 1
     fi
+    if [[ ${dryRun} ]]; then
+        comment "Dry run finished, no steps were executed"
+        exit 0
+    fi
 fi
 
 
 
+# ==== Step 1 ====
+kmers_step "${cmd}$(resources 1)" "$(cut -f1 ${i} | tr '\n' ' ')"
+
+
+
 # ==== Step 2 ====
 comment "Running step 2: defining k-mers colors based on occurrences in categories"
 
@@ -193,11 +271,7 @@ fi
 IFS=$'\n' read -rd '' -a catNames <<< "$(python3 ${SOFT}/get_samples_labels_for_colored.py ${w})"
 
 
-cmd2=$cmd
-cmd2+="-t kmers-color "
-tmp=$(cut -d$'\t' -f2 ${w}/categories_samples.tsv | tr '\n' ' ' | sed -e 's/[[:space:]]*$//')
-tmp="${kmersDir}/${tmp// /.kmers.bin ${kmersDir}/}.kmers.bin "
-cmd2+="-kf ${tmp} "
+cmd2="-t kmers-color "
 cmd2+="--class ${w}/samples_labels.tsv "
 if [[ ${b} ]]; then
     cmd2+="-b ${b} "
@@ -205,10 +279,71 @@ fi
 if [[ ${totalCoverage} ]]; then
     cmd2+="--val "
 fi
-cmd2+="-w ${w}/kmers_color/"
+tmp=$(cut -d$'\t' -f2 ${w}/categories_samples.tsv | tr '\n' ' ' | sed -e 's/[[:space:]]*$//')
+
+if [[ ${shards:-1} -gt 1 ]]; then
+    # every shard gets k-mers of all samples with the same hash prefix, so k-mer presence counts per category are the same
+    # as without sharding. Total coverage mode (--val) is rejected above, as its equivalence is not verified
+    shardsDir="${w}/kmers_color/shards"
+    python3 ${SOFT}/shard_kmers.py split -w ${shardsDir} --shards ${shards} -t ${p:-0} ${kmersDir}/${tmp// /.kmers.bin ${kmersDir}/}.kmers.bin
+    if [[ $? -ne 0 ]]; then
+        error "Error during step 2! Cannot split k-mers into shards"
+        exit 1
+    fi
 
-echo "${cmd2}"
-${cmd2}
+    shardJobs=${shardJobs:-1}
+    mStep=$m
+    pStep=$p
+    if [[ ${plan} ]]; then
+        read mStep pStep <<< "$(awk -F'\t' '$1 == 2 {print $2, $3}' ${w}/resources_plan.tsv)"
+    fi
+    read mJob pJob <<< "$(python3 ${SOFT}/split_resources.py "${mStep}" "${pStep}" ${shardJobs})"
+    echo "Coloring ${shards} shards, ${shardJobs} concurrently, each with ${pJob} threads and ${mJob} of memory"
+
+    color_shard () {
+        cmd2_j="${cmd}-m ${mJob} -p ${pJob} ${cmd2}"
+        cmd2_j+="-kf ${shardsDir}/kmers_$1/${tmp// /.kmers.bin ${shardsDir}/kmers_$1/}.kmers.bin "
+        cmd2_j+="-w ${shardsDir}/color_$1/"
+        echo "${cmd2_j}"
+        ${cmd2_j} > ${shardsDir}/color_$1.log 2>&1 </dev/null
+        if [[ $? -ne 0 ]]; then
+            echo "Coloring of shard $1 failed, see log in ${shardsDir}/color_$1.log"
+            return 1
+        fi
+        rm -r ${shardsDir}/kmers_$1
+    }
+
+    pids=()
+    for ((j=0;j<shards;j++)); do
+        while [[ $(jobs -rp | wc -l) -ge ${shardJobs} ]]; do
+            sleep 1
+        done
+        color_shard ${j} &
+        pids+=($!)
+    done
+
+    failed=0
+    for pid in ${pids[@]}; do
+        wait ${pid} || failed=1
+    done
+    if [[ ${failed} -ne 0 ]]; then
+        error "Error during step 2!"
+        exit 1
+    fi
+
+    files=""
+    for ((j=0;j<shards;j++)); do
+        files+="${shardsDir}/color_${j}/colored-kmers/colored_kmers.kmers.bin "
+    done
+    python3 ${SOFT}/shard_kmers.py merge --out ${w}/kmers_color/colored-kmers/colored_kmers.kmers.bin ${files} && rm -r ${shardsDir}
+else
+    cmd2="${cmd}$(resources 2)${cmd2}"
+    cmd2+="-kf ${kmersDir}/${tmp// /.kmers.bin ${kmersDir}/}.kmers.bin "
+    cmd2+="-w ${w}/kmers_color/"
+
+    echo "${cmd2}"
+    ${cmd2}
+fi
 if [[ $? -eq 0 ]]; then
     comment "Step 2 finished successfully!"
 else
@@ -220,7 +355,7 @@ fi
 # ==== Step 3 ====
 comment "Running step 3: extracting graph components based on k-mers coloring"
 
-cmd3=$cmd
+cmd3="${cmd}$(resources 3)"
 cmd3+="-t component-colored "
 cmd3+="-i ${w}/kmers_color/colored-kmers/colored_kmers.kmers.bin "
 cmd3+="--n_groups ${n_cat} "
@@ -257,7 +392,7 @@ done
 # ==== Step 4 ====
 comment "Running step 4: calculating features as coverage of components by samples"
 
-cmd4=$cmd
+cmd4="${cmd}$(resources 4)"
 cmd4+="-t features-calculator "
 
 while read line ; do
@@ -303,7 +438,7 @@ if [[ ${skipGraph} ]]; then
 else
     comment "Running step 5: transforming binary components to fasta sequences and de Bruijn graph"
 
-    cmd5=$cmd
+    cmd5="${cmd}$(resources 5)"
     cmd5+="-t comp2graph "
 
     while read line ; do
@@ -338,6 +473,22 @@ else
     fi
 fi
 
+cmdStorage="python3 ${SOFT}/workdir_storage.py --pipeline colored -w ${w} --retain ${retain} "
+if [[ ${kmers} ]]; then
+    cmdStorage+="--keep ${kmers} "
+fi
+if [[ ${compress} ]]; then
+    cmdStorage+="--compress "
+fi
+if [[ $p ]]; then
+    cmdStorage+="-t $p "
+fi
+${cmdStorage}
+if [[ $? -ne 0 ]]; then
+    warning "Cannot clean up working directory ${w}"
+fi
+
+
 comment "MetaFX colored module finished successfully!"
 exit 0
 
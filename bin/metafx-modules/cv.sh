@@ -18,6 +18,7 @@ help_message () {
     echo "    -f | --feature-table  <filename>   file with feature table in tsv format: rows – features, columns – samples (\"workDir/feature_table.tsv\" can be used) [mandatory]"
     echo "    -i | --metadata-file  <filename>   tab-separated file with 2 values in each row: <sample>\t<category> (\"workDir/samples_categories.tsv\" can be used) [mandatory]"
     echo "    -n | --n-splits       <int>        number of folds in cross-validation. Must be at least 2. [optional, default: 5]"
+    echo "    -e | --estimator      [RF, XGB]    classification model: RF – scikit-learn Random Forest, XGB – XGBoost [optional, default: RF]"
     echo "         --name           <filename>   name of output trained model in workDir [optional, default: rf_model_cv]"
     echo "         --grid                        if TRUE, perform grid search of optimal parameters for classification model [optional, default: False]"
     echo "";}
@@ -40,6 +41,7 @@ w="workDir"
 nSplits=5
 nThreads=1
 grid="false"
+estimator="RF"
 POSITIONAL=()
 while [[ $# -gt 0 ]]
 do
@@ -73,6 +75,11 @@ case $key in
     grid="true"
     shift
     ;;
+    -e|--estimator)
+    estimator="$2"
+    shift
+    shift
+    ;;
     -t|--threads)
     nThreads="$2"
     shift
@@ -102,6 +109,20 @@ if [[ ! -f ${metadataFile} ]]; then
     exit 1
 fi
 
+case ${estimator} in
+    "RF") : ;;
+    "XGB")
+    if [[ ${grid} == "true" ]]; then
+        error "Grid search is supported only for RF classification model!"
+        exit 1
+    fi
+    ;;
+    *)
+    error "Unknown classification model type! Please, select from [RF, XGB]"
+    exit 1
+    ;;
+esac
+
 mkdir -p ${w}
 
 
@@ -112,7 +133,7 @@ else
 fi
 
 
-python3 ${SOFT}/cv.py ${featureFile} ${outputName} ${metadataFile} ${nSplits} ${grid} ${nThreads}
+python3 ${SOFT}/cv.py ${featureFile} ${outputName} ${metadataFile} ${nSplits} ${grid} ${nThreads} ${estimator}
 if [[ $? -ne 0 ]]; then
     error "Classification model training failed!"
     exit 1
@@ -18,9 +18,11 @@ help_message () {
     echo "Input parameters:"
     echo "    -k | --k             <int>        k-mer size to build de Bruij graphs (in nucleotides, maximum value is 31) [mandatory]"
     echo "    -f | --feature-dir   <dirname>    directory containing folders with contigs for each category, feature_table.tsv and categories_samples.tsv files. Usually, it is workDir from other MetaFX modules (unique, stats, colored, metafast, metaspades) [mandatory]"
-    echo "    -n | --feature-name  <string>     name of the feature of interest (should be one of the values from first column of feature_table.tsv) [mandatory]"
+    echo "    -n | --feature-name  <string>     name of the feature of interest (should be one of the values from first column of feature_table.tsv) [mandatory, if --feature-list is not set]"
+    echo "         --feature-list  <filename>   file with names of features of interest, one per line. Reads of each sample are processed once for all selected features [optional, if set '-n' is ignored]"
     echo "    -r | --reads-dir     <dirname>    directory containing files with reads for samples. FASTQ, FASTA, gzip- or bzip2-compressed [mandatory]"
     echo "         --relab         <int>        minimal relative abundance of feature in sample to include sample for further analysis [optional, default: 0.1]"
+    echo "    -j | --jobs          <int>        number of samples processed concurrently, threads and memory are split equally between them [optional, default: 1]"
     echo "";}
 
 
@@ -37,6 +39,7 @@ error   () { ${SOFT}/pretty_print.py "$1" "*"; exit 1; }
 
 
 w="workDir"
+nJobs=1
 POSITIONAL=()
 while [[ $# -gt 0 ]]
 do
@@ -66,11 +69,21 @@ case $key in
     shift
     shift
     ;;
+    --feature-list)
+    featList="$2"
+    shift
+    shift
+    ;;
     --relab)
     relab="$2"
     shift
     shift
     ;;
+    -j|--jobs)
+    nJobs="$2"
+    shift
+    shift
+    ;;
     -m|--memory)
     m="$2"
     shift
@@ -110,14 +123,36 @@ if [ ! -f ${featDir}/feature_table.tsv ]; then
 fi
 
 # ==== Step 1 ====
-comment "Running step 1: selecting samples containing feature '${featName}'"
-cnt=`awk -v var="${featName}" '$1==var {CNT++} END{ print CNT }' ${featDir}/feature_table.tsv`
-if [[ cnt -ne 1 ]]; then
-    error "Cannot find feature '${featName}' in ${featDir}/feature_table.tsv"
+if [[ ${featList} ]]; then
+    if [ ! -f ${featList} ]; then
+        error "File with features' names ${featList} does not exist"
+    fi
+    featNames=$(grep -v '^[[:space:]]*$' ${featList} | tr '\n' ' ')
+    comment "Running step 1: selecting samples containing features from ${featList}"
+else
+    featNames="${featName}"
+    comment "Running step 1: selecting samples containing feature '${featName}'"
+fi
+
+if [[ -z ${featNames// /} ]]; then
+    error "No features of interest provided"
+fi
+
+featArgs=""
+for feat in ${featNames}; do
+    featArgs+="--feature ${feat} "
+done
+python3 ${SOFT}/feature_index.py --table ${featDir}/feature_table.tsv ${featArgs} > /dev/null
+if [[ $? -ne 0 ]]; then
+    error "Cannot query feature(s) '${featNames}' in ${featDir}/feature_table.tsv"
 fi
 
 mkdir ${w}
-cmd1="python ${SOFT}/select_samples_by_feature.py --work-dir ${featDir} --feature ${featName} --res-dir ${w} "
+cmd1="python ${SOFT}/select_samples_by_feature.py --work-dir ${featDir} --res-dir ${w} ${featArgs}"
+if [[ ${featList} ]]; then
+    mkdir ${w}/seeds
+    cmd1+="--seeds-dir ${w}/seeds "
+fi
 if [[ $relab ]]; then
     cmd1+="--board ${relab}"
 fi
@@ -125,9 +160,11 @@ fi
 echo "$cmd1"
 $cmd1
 if [[ $? -eq 0 ]]; then
-    echo "Total `wc -l ${w}/samples_list_feature_${featName}.txt | cut -d" " -f1` samples were selected"
-    echo "List of samples containing feature '${featName}' saved to ${w}/samples_list_feature_${featName}.txt"
-    echo "Nucleotide sequence for feature '${featName}' saved to ${w}/seq_feature_${featName}.fasta"
+    for feat in ${featNames}; do
+        echo "Total `wc -l ${w}/samples_list_feature_${feat}.txt | cut -d" " -f1` samples were selected"
+        echo "List of samples containing feature '${feat}' saved to ${w}/samples_list_feature_${feat}.txt"
+        echo "Nucleotide sequence for feature '${feat}' saved to ${w}/seq_feature_${feat}.fasta"
+    done
     comment "Step 1 finished successfully!"
 else
     error "Error during step 1!"
@@ -144,40 +181,86 @@ cmd2="${PIPES}/metacherchant.sh "
 if [[ $k ]]; then
     cmd2+="-k $k "
 fi
-if [[ $m ]]; then
-    cmd2+="-m $m "
-fi
-if [[ $p ]]; then
-    cmd2+="-p $p "
+if [[ ${nJobs} -gt 1 ]]; then
+    read mJob pJob <<< "$(python3 ${SOFT}/split_resources.py "${m}" "${p}" ${nJobs})"
+    echo "Processing ${nJobs} samples concurrently, each with ${pJob} threads and ${mJob} of memory"
+    cmd2+="-m ${mJob} -p ${pJob} "
+else
+    if [[ $m ]]; then
+        cmd2+="-m $m "
+    fi
+    if [[ $p ]]; then
+        cmd2+="-p $p "
+    fi
 fi
 
 cmd2+="--coverage 1 --maxradius 1000 --bothdirs true --chunklength 10  --merge true "
-cmd2+="--seq ${w}/seq_feature_${featName}.fasta "
 
-mkdir ${w}/graphs
-
-while read sample ; do
+process_sample () {
+    sample=$1
     cmd2_i=${cmd2}
+    if [[ ${featList} ]]; then
+        cmd2_i+="--seq ${w}/seeds/${sample}.fasta "
+    else
+        cmd2_i+="--seq ${w}/seq_feature_${featName}.fasta "
+    fi
     cmd2_i+="-w ${w}/wd_${sample} "
     cmd2_i+="-o ${w}/wd_${sample}/output "
     readsFiles=`find ${readsDir}/${sample}_* ${readsDir}/${sample}.* 2>/dev/null | paste -s -d " " -`
     cmd2_i+="--reads ${readsFiles}"
 
     echo "${cmd2_i}"
-    echo -n "Processing sample ${sample} (log saved to ${w}/metacherchant.log) ...    "
+    echo "Processing sample ${sample} (log saved to ${w}/metacherchant_${sample}.log)"
 
-    ${cmd2_i} 1>>${w}/metacherchant.log 2>&1
-    if [[ $? -eq 0 ]]; then
-        echo "DONE"
+    ${cmd2_i} 1>>${w}/metacherchant_${sample}.log 2>&1 </dev/null
+    if [[ $? -ne 0 ]]; then
+        echo "Error during processing sample ${sample}"
+        return 1
+    fi
+    if [[ ${featList} ]]; then
+        for feat in $(awk -F'\t' -v s="${sample}" '$1==s {print $2}' ${w}/samples_features.tsv); do
+            python3 ${SOFT}/merge_feature_graphs.py ${w}/wd_${sample}/output ${feat} ${w}/graphs_${feat}/${sample}.gfa || return 1
+        done
     else
-        error "Error during step 2!"
+        ln -s `realpath $w`/wd_${sample}/output/merged/graph.gfa ${w}/graphs/${sample}.gfa
+    fi
+    echo "Processed sample ${sample}"
+}
+
+if [[ ${featList} ]]; then
+    samplesList="${w}/samples_features.tsv"
+    for feat in ${featNames}; do
+        mkdir ${w}/graphs_${feat}
+    done
+else
+    samplesList="${w}/samples_list_feature_${featName}.txt"
+    mkdir ${w}/graphs
+fi
+
+pids=()
+while read sample _ ; do
+    if [[ -z ${sample} ]]; then
+        continue
     fi
-    ln -s `realpath $w`/wd_${sample}/output/merged/graph.gfa ${w}/graphs/${sample}.gfa
-done<${w}/samples_list_feature_${featName}.txt
+    while [[ $(jobs -rp | wc -l) -ge ${nJobs} ]]; do
+        sleep 1
+    done
+    process_sample ${sample} &
+    pids+=($!)
+done<${samplesList}
+
+failed=0
+for pid in ${pids[@]}; do
+    wait ${pid} || failed=1
+done
 
 
-if [[ $? -eq 0 ]]; then
-    comment "All de Bruijn graphs saved to: ${w}/graphs/. To visualise them simultaneously in BandageNG follow instructions from https://github.com/ctlab/BandageNG/wiki#multigraph-mode"
+if [[ ${failed} -eq 0 ]]; then
+    if [[ ${featList} ]]; then
+        comment "De Bruijn graphs for each feature saved to: ${w}/graphs_<feature>/. To visualise them simultaneously in BandageNG follow instructions from https://github.com/ctlab/BandageNG/wiki#multigraph-mode"
+    else
+        comment "All de Bruijn graphs saved to: ${w}/graphs/. To visualise them simultaneously in BandageNG follow instructions from https://github.com/ctlab/BandageNG/wiki#multigraph-mode"
+    fi
     comment "Step 2 finished successfully!"
 else
     error "Error during step 2!"
@@ -11,6 +11,7 @@ help_message () {
     echo ""
     echo "Launch options:"
     echo "    -h | --help                        show this help message and exit"
+    echo "    -t | --threads        <int>        number of threads to use [default: all for XGB, 1 for RF]"
     echo "    -w | --work-dir       <dirname>    working directory [default: workDir/]"
     echo ""
     echo "Input parameters:"
@@ -18,6 +19,10 @@ help_message () {
     echo "    -i | --metadata-file  <filename>   tab-separated file with 2 values in each row: <sample>\t<category> (\"workDir/samples_categories.tsv\" can be used) [mandatory]"
     echo "    -e | --estimator      [RF, XGB, Torch] classification model: RF – scikit-learn Random Forest, XGB – XGBoost, Torch – PyTorch neural network, default: RF]"
     echo "         --name           <filename>   name of output trained model in workDir [optional, default: model]"
+    echo "         --n-rounds       <int>        maximal number of boosting rounds for XGB [optional, default: 100]"
+    echo "         --early-stopping <int>        for XGB stop training if loss on held-out samples does not improve for <int> rounds [optional, default: 0 – no early stopping]"
+    echo "         --valid-fraction <float>      fraction of samples held out for early stopping [optional, default: 0.2]"
+    echo "         --chunk-size     <int>        for XGB stream feature table by chunks of <int> samples into external-memory matrix, for tables larger than RAM [optional, default: 0 – load table into RAM]"
     echo "";}
 
 
@@ -36,6 +41,11 @@ error   () { ${SOFT}/pretty_print.py "$1" "*"; exit 1; }
 
 w="workDir"
 estimator="RF"
+nThreads=0
+nRounds=100
+earlyStopping=0
+validFraction=0.2
+chunkSize=0
 POSITIONAL=()
 while [[ $# -gt 0 ]]
 do
@@ -65,6 +75,31 @@ case $key in
     shift
     shift
     ;;
+    -t|--threads)
+    nThreads="$2"
+    shift
+    shift
+    ;;
+    --n-rounds)
+    nRounds="$2"
+    shift
+    shift
+    ;;
+    --early-stopping)
+    earlyStopping="$2"
+    shift
+    shift
+    ;;
+    --valid-fraction)
+    validFraction="$2"
+    shift
+    shift
+    ;;
+    --chunk-size)
+    chunkSize="$2"
+    shift
+    shift
+    ;;
     -w|--work-dir)
     w="$2"
     shift
@@ -111,7 +146,7 @@ if [[ ${estimator} ]] ; then
 fi
 
 
-python3 ${SOFT}/fit.py ${featureFile} ${outputName} ${metadataFile} ${estimator}
+python3 ${SOFT}/fit.py ${featureFile} ${outputName} ${metadataFile} ${estimator} ${nThreads} ${nRounds} ${earlyStopping} ${validFraction} ${chunkSize}
 if [[ $? -ne 0 ]]; then
     error "Classification model training failed!"
     exit 1
@@ -12,11 +12,13 @@ help_message () {
     echo ""
     echo "Launch options:"
     echo "    -h | --help                        show this help message and exit"
+    echo "    -t | --threads        <int>        number of chunks of samples processed in parallel [default: 1]"
     echo "    -w | --work-dir       <dirname>    working directory [default: workDir/]"
     echo ""
     echo "Input parameters:"
     echo "    -f | --feature-table  <filename>   file with feature table in tsv format: rows – features, columns – samples (\"workDir/feature_table.tsv\" can be used) [mandatory]"
     echo "    -i | --metadata-file  <filename>   tab-separated file with 2 values in each row: <sample>\t<category> (\"workDir/samples_categories.tsv\" can be used) [mandatory]"
+    echo "         --chunk-size     <int>        number of samples loaded and predicted at once, predictions are appended to output as soon as chunk is processed (0 – all samples at once) [optional, default: 0]"
     echo "         --name           <filename>   name of output files in workDir [optional, default: model]"
     echo "";}
 
@@ -35,6 +37,8 @@ error   () { ${SOFT}/pretty_print.py "$1" "*"; exit 1; }
 
 
 w="workDir"
+chunkSize=0
+nThreads=1
 POSITIONAL=()
 while [[ $# -gt 0 ]]
 do
@@ -59,6 +63,16 @@ case $key in
     shift
     shift
     ;;
+    --chunk-size)
+    chunkSize="$2"
+    shift
+    shift
+    ;;
+    -t|--threads)
+    nThreads="$2"
+    shift
+    shift
+    ;;
     -w|--work-dir)
     w="$2"
     shift
@@ -93,7 +107,7 @@ else
 fi
 
 
-python3 ${SOFT}/fit_predict.py ${featureFile} ${outputName} ${metadataFile}
+python3 ${SOFT}/fit_predict.py ${featureFile} ${outputName} ${metadataFile} ${chunkSize} ${nThreads}
 if [[ $? -ne 0 ]]; then
     error "Classification model training failed!"
     exit 1
@@ -23,6 +23,9 @@ help_message () {
     echo "    -b1 | --min-comp-size <int>        minimum size of extracted components (features) in k-mers [default: 1000]"
     echo "    -b2 | --max-comp-size <int>        maximum size of extracted components (features) in k-mers [default: 10000]"
     echo "          --kmers-dir     <dirname>    directory with pre-computed k-mers for samples in binary format [optional, if set '-i' can be omitted]"
+    echo "    -j  | --jobs          <int>        number of metaSPAdes assemblies run concurrently, threads and memory are split equally between them [optional, default: 1]"
+    echo "          --sketch                     if TRUE replace distance matrix and heatmap construction (steps 4-5) by fast approximate estimation via FracMinHash sketches of samples' k-mers, requires --kmers-dir [default: False]"
+    echo "          --scale         <int>        sketch keeps one of every <scale> k-mers on average, used with --sketch [default: 1000]"
     echo "          --skip-graph                 if TRUE skip de Bruijn graph and fasta construction from components [default: False]"
     echo "";}
 
@@ -41,6 +44,7 @@ error   () { ${SOFT}/pretty_print.py "$1" "*"; exit 1; }
 
 
 w="workDir"
+nJobs=1
 POSITIONAL=()
 while [[ $# -gt 0 ]]
 do
@@ -88,6 +92,11 @@ case $key in
     shift
     shift
     ;;
+    -j|--jobs)
+    nJobs="$2"
+    shift
+    shift
+    ;;
     -m|--memory)
     m="$2"
     shift
@@ -103,6 +112,15 @@ case $key in
     shift
     shift
     ;;
+    --sketch)
+    sketch=true
+    shift
+    ;;
+    --scale)
+    scale="$2"
+    shift
+    shift
+    ;;
     --skip-graph)
     skipGraph=true
     shift
@@ -116,6 +134,12 @@ done
 set -- "${POSITIONAL[@]}" # restore positional parameters
 
 
+# sketches are fast only when k-mers of samples are already counted
+if [[ ${sketch} && -z ${kmers} ]]; then
+    error "--sketch requires pre-computed k-mers of samples provided via --kmers-dir"
+    exit 1
+fi
+
 cmd="${PIPES}/metafast.sh "
 if [[ $k ]]; then
     cmd+="-k $k "
@@ -134,15 +158,24 @@ fi
 comment "Running step 1: extracting contigs via metaSPAdes assembly"
 
 cmd1="metaspades.py "
-if [[ $m ]]; then
-    if [[ "${m:0-1}" == "G" ]]; then
-        cmd1+="-m ${m: : -1} "
+if [[ ${nJobs} -gt 1 ]]; then
+    read mJob pJob <<< "$(python3 ${SOFT}/split_resources.py "${m}" "${p}" ${nJobs})"
+    echo "Running ${nJobs} assemblies concurrently, each with ${pJob} threads and ${mJob} of memory"
+else
+    mJob=$m
+    pJob=$p
+fi
+if [[ ${mJob} ]]; then
+    if [[ "${mJob:0-1}" == "G" ]]; then
+        cmd1+="-m ${mJob: : -1} "
+    elif [[ "${mJob:0-1}" == "M" && ${mJob: : -1} -ge 1024 ]]; then
+        cmd1+="-m $(( ${mJob: : -1} / 1024 )) "
     else
-        cmd1+= "-m 1 "
+        cmd1+="-m 1 "
     fi
 fi
-if [[ $p ]]; then
-    cmd1+="-t $p "
+if [[ ${pJob} ]]; then
+    cmd1+="-t ${pJob} "
 fi
 
 samples_spades=$(python3 ${SOFT}/parse_samples_for_spades.py ${i})
@@ -151,31 +184,55 @@ if [[ $? -ne 0 ]]; then
     exit 1
 fi
 
-mkdir ${w}
+mkdir -p ${w}
 
-while read line ; do
-    IFS=$' ' read -ra samples <<< "${line}"
+assemble_sample () {
+    IFS=$' ' read -ra samples <<< "$1"
     cmd1_i=$cmd1
     if [[ ${samples[0]} == "True" ]]; then
         cmd1_i+="--only-assembler "
     fi
     cmd1_i+="-o ${w}/spades_${samples[1]} "
     cmd1_i+="-1 ${samples[2]} -2 ${samples[3]} "
-    comment "Processing samples: ${samples[2]} & ${samples[3]}"
-    
+    echo "Processing samples: ${samples[2]} & ${samples[3]}"
     echo "${cmd1_i}"
     echo "Log is saved to ${w}/spades_${samples[1]}.log"
-    ${cmd1_i} > "${w}/spades_${samples[1]}.log"
-    if [[ $? -eq 0 ]]; then
-        comment "Assembly results saved to: ${w}/spades_${samples[1]}"
-    else
-        error "Error during step 1!"
-        exit 1
+
+    start=$(date +%s)
+    ${cmd1_i} > "${w}/spades_${samples[1]}.log" </dev/null
+    if [[ $? -ne 0 ]]; then
+        echo "Assembly of sample ${samples[1]} failed!"
+        return 1
+    fi
+    elapsed=$(( $(date +%s) - start ))
+    echo -e "${samples[1]}\t${elapsed}" >> ${w}/spades_times.tsv
+    echo "Assembly results for sample ${samples[1]} saved to: ${w}/spades_${samples[1]} (${elapsed} seconds)"
+}
+
+pids=()
+while read line ; do
+    IFS=$' ' read -ra samples <<< "${line}"
+    if [[ -f ${w}/spades_${samples[1]}/contigs.fasta ]]; then
+        echo "Skipping sample ${samples[1]}: assembly ${w}/spades_${samples[1]}/contigs.fasta already exists"
+        continue
     fi
+    while [[ $(jobs -rp | wc -l) -ge ${nJobs} ]]; do
+        sleep 1
+    done
+    assemble_sample "${line}" &
+    pids+=($!)
 done<<<"${samples_spades}"
 
+failed=0
+for pid in ${pids[@]}; do
+    wait ${pid} || failed=1
+done
+
 
-if [[ $? -eq 0 ]]; then
+if [[ ${failed} -eq 0 ]]; then
+    if [[ -f ${w}/spades_times.tsv ]]; then
+        echo "Assembly time per sample (seconds) saved to ${w}/spades_times.tsv"
+    fi
     comment "Step 1 finished successfully!"
 else
     error "Error during step 1!"
@@ -281,55 +338,81 @@ rm -r ${w}/features_all
 
 
 
-# ==== Step 4 ====
-comment "Running step 4: calculating distance matrix using features values"
+if [[ ${sketch} ]]; then
+    # ==== Step 4-5 ====
+    comment "Running steps 4-5: estimating distance matrix and heatmap via sketches of samples' k-mers"
 
-cmd4="${PIPES}/metafast.sh "
-if [[ $m ]]; then
-    cmd4+="-m $m "
-fi
-if [[ $p ]]; then
-    cmd4+="-p $p "
-fi
-cmd4+="-t dist-matrix-calculator "
+    cmd4="${PIPES}/sketch.sh -k ${k} -w ${w} "
+    if [[ $m ]]; then
+        cmd4+="-m $m "
+    fi
+    if [[ $p ]]; then
+        cmd4+="-t $p "
+    fi
+    if [[ ${scale} ]]; then
+        cmd4+="--scale ${scale} "
+    fi
+    cmd4+="--kmers-dir ${kmers} "
 
-cmd4+="--features ${w}/features-calculator/vectors/*.vec "
-cmd4+="-w ${w}/matrices/"
+    echo "${cmd4}"
+    ${cmd4}
+    if [[ $? -eq 0 ]]; then
+        comment "Steps 4-5 finished successfully!"
+    else
+        error "Error during steps 4-5!"
+        exit 1
+    fi
+else
+    # ==== Step 4 ====
+    comment "Running step 4: calculating distance matrix using features values"
 
+    cmd4="${PIPES}/metafast.sh "
+    if [[ $m ]]; then
+        cmd4+="-m $m "
+    fi
+    if [[ $p ]]; then
+        cmd4+="-p $p "
+    fi
+    cmd4+="-t dist-matrix-calculator "
 
-echo "${cmd4}"
-${cmd4}
-if [[ $? -eq 0 ]]; then
-    comment "Step 4 finished successfully!"
-else
-    error "Error during step 4!"
-    exit 1
-fi
+    cmd4+="--features ${w}/features-calculator/vectors/*.vec "
+    cmd4+="-w ${w}/matrices/"
+
+
+    echo "${cmd4}"
+    ${cmd4}
+    if [[ $? -eq 0 ]]; then
+        comment "Step 4 finished successfully!"
+    else
+        error "Error during step 4!"
+        exit 1
+    fi
 
 
-# ==== Step 5 ====
-comment "Running step 5: constructing heatmap with dendrogram for distance matrix"
+    # ==== Step 5 ====
+    comment "Running step 5: constructing heatmap with dendrogram for distance matrix"
 
-cmd5="${PIPES}/metafast.sh "
-if [[ $m ]]; then
-    cmd5+="-m $m "
-fi
-if [[ $p ]]; then
-    cmd5+="-p $p "
-fi
-cmd5+="-t heatmap-maker "
+    cmd5="${PIPES}/metafast.sh "
+    if [[ $m ]]; then
+        cmd5+="-m $m "
+    fi
+    if [[ $p ]]; then
+        cmd5+="-p $p "
+    fi
+    cmd5+="-t heatmap-maker "
 
-cmd5+="-i ${w}/matrices/dist_matrix_*_original_order.txt "
-cmd5+="-w ${w}/heatmap-maker/"
+    cmd5+="-i ${w}/matrices/dist_matrix_*_original_order.txt "
+    cmd5+="-w ${w}/heatmap-maker/"
 
 
-echo "${cmd5}"
-${cmd5}
-if [[ $? -eq 0 ]]; then
-    comment "Step 5 finished successfully!"
-else
-    error "Error during step 5!"
-    exit 1
+    echo "${cmd5}"
+    ${cmd5}
+    if [[ $? -eq 0 ]]; then
+        comment "Step 5 finished successfully!"
+    else
+        error "Error during step 5!"
+        exit 1
+    fi
 fi
 
 
@@ -0,0 +1,266 @@
+#!/usr/bin/env bash
+##########################################################################################
+#####   MetaFX multi_k module to extract features for several k-mer sizes at once   ######
+##########################################################################################
+
+help_message () {
+    echo ""
+    echo "$(metafx -v)"
+    echo "MetaFX multi_k module – supervised feature extraction for several k-mer sizes with single decompression of reads"
+    echo "Usage: metafx multi_k [<Launch options>] [<Input parameters>] [<Pipeline parameters>]"
+    echo ""
+    echo "Launch options:"
+    echo "    -h | --help                       show this help message and exit"
+    echo "    -t | --threads       <int>        number of threads to use [default: all]"
+    echo "    -m | --memory        <MEM>        memory to use (values with suffix: 1500M, 4G, etc.) [default: 90% of free RAM]"
+    echo "    -w | --work-dir      <dirname>    working directory [default: workDir/]"
+    echo "    -j | --jobs          <int>        number of k-mer counting runs (one per k) executed concurrently, threads and memory are split equally between them [default: number of k values]"
+    echo ""
+    echo "Input parameters:"
+    echo "    -k | --k             <int,int,..> comma-separated list of k-mer sizes (in nucleotides, maximum value is 31) [mandatory]"
+    echo "    -i | --reads-file    <filename>   tab-separated file with 2 values in each row: <path_to_file>\t<category> [mandatory]"
+    echo "    -b | --bad-frequency <int>        maximal frequency for a k-mer to be assumed erroneous [default: 1]"
+    echo "         --pipeline      <name>       feature extraction pipeline to run for every k: unique, stats or chisq [default: unique]"
+    echo "         --reads-cache   <dirname>    directory for decompressed copies of reads files shared between runs [default: \$METAFX_READS_CACHE or workDir/reads, removed after k-mers counting]"
+    echo ""
+    echo "Pipeline parameters:"
+    echo "    all other parameters are passed to selected pipeline unchanged (e.g. '-n 1000' for chisq, '--skip-graph')"
+    echo ""
+    echo "Combined workDir/feature_table.tsv has features renamed to k<k>_<category>_<id> and is meant for fit, cv and predict modules."
+    echo "Reads are decompressed once, but k-mers are counted in a separate pass over decompressed reads for every k."
+    echo "Modules working with components (calc_features, bandage, feature_analysis) should be run on workDir/k<k>/ with original features of one k."
+    echo "";}
+
+
+# Paths to pipelines and scripts
+mfx_path=$(which metafx)
+bin_path=${mfx_path%/*}
+SOFT=${bin_path}/metafx-scripts
+PIPES=${bin_path}/metafx-modules
+pwd=`dirname "$0"`
+
+comment () { ${SOFT}/pretty_print.py "$1" "-"; }
+warning () { ${SOFT}/pretty_print.py "$1" "*"; }
+error   () { ${SOFT}/pretty_print.py "$1" "*"; exit 1; }
+
+
+
+w="workDir"
+pipeline="unique"
+readsCache="${METAFX_READS_CACHE}"
+POSITIONAL=()
+while [[ $# -gt 0 ]]
+do
+key="$1"
+case $key in
+    -h|--help)
+    help_message
+    exit 0
+    ;;
+    -k|--k)
+    kList="$2"
+    shift # past argument
+    shift # past value
+    ;;
+    -b|--bad-frequency)
+    b="$2"
+    shift
+    shift
+    ;;
+    -i|--reads-file)
+    i="$2"
+    shift
+    shift
+    ;;
+    --pipeline)
+    pipeline="$2"
+    shift
+    shift
+    ;;
+    --reads-cache)
+    readsCache="$2"
+    shift
+    shift
+    ;;
+    -m|--memory)
+    m="$2"
+    shift
+    shift
+    ;;
+    -t|--threads)
+    p="$2"
+    shift
+    shift
+    ;;
+    -w|--work-dir)
+    w="$2"
+    shift
+    shift
+    ;;
+    -j|--jobs)
+    nJobs="$2"
+    shift
+    shift
+    ;;
+    *)    # unknown option
+    POSITIONAL+=("$1") # save it in an array for later
+    shift
+    ;;
+esac
+done
+set -- "${POSITIONAL[@]}" # restore positional parameters
+
+
+if [[ ${pipeline} != "unique" && ${pipeline} != "stats" && ${pipeline} != "chisq" ]]; then
+    error "Unknown pipeline '${pipeline}'. Select one of: unique, stats, chisq"
+    exit 1
+fi
+IFS=',' read -ra ks <<< "${kList}"
+if [[ ${#ks[@]} -eq 0 ]]; then
+    error "Provide at least one k-mer size via -k!"
+    exit 1
+fi
+if [[ -z ${nJobs} ]]; then
+    nJobs=${#ks[@]}
+fi
+if [[ -z ${readsCache} ]]; then
+    readsCache="${w}/reads"
+    sharedCache=false
+else
+    sharedCache=true
+fi
+mkdir -p ${w}
+
+
+
+# ==== Step 1 ====
+comment "Running step 1: decompressing reads files into ${readsCache}"
+
+python3 ${SOFT}/prepare_reads.py --cache-dir ${readsCache} -t ${p:-0} --reads-file ${i} --out ${w}/reads_file.tsv
+if [[ $? -eq 0 ]]; then
+    comment "Step 1 finished successfully!"
+else
+    error "Error during step 1!"
+    exit 1
+fi
+
+
+
+# ==== Step 2 ====
+comment "Running step 2: counting k-mers for k = ${ks[*]}"
+
+if [[ ${nJobs} -gt 1 ]]; then
+    read mJob pJob <<< "$(python3 ${SOFT}/split_resources.py "${m}" "${p}" ${nJobs})"
+    echo "Running ${nJobs} k-mer counters concurrently, each with ${pJob} threads and ${mJob} of memory"
+else
+    mJob=$m
+    pJob=$p
+fi
+
+cmd2="${PIPES}/metafast.sh "
+if [[ ${mJob} ]]; then
+    cmd2+="-m ${mJob} "
+fi
+if [[ ${pJob} ]]; then
+    cmd2+="-p ${pJob} "
+fi
+cmd2+="-t kmer-counter-many "
+if [[ ${b} ]]; then
+    cmd2+="-b ${b} "
+fi
+cmd2+="-i $(cut -f1 ${w}/reads_file.tsv | sort -u | tr '\n' ' ')"
+
+count_kmers () {
+    cmd2_i=$cmd2
+    cmd2_i+="-k $1 "
+    cmd2_i+="-w ${w}/k$1/kmers/"
+    echo "${cmd2_i}"
+    echo "Log is saved to ${w}/k$1/kmer_counter.log"
+    mkdir -p ${w}/k$1
+    ${cmd2_i} > ${w}/k$1/kmer_counter.log 2>&1 </dev/null
+    if [[ $? -ne 0 ]]; then
+        echo "K-mer counting for k = $1 failed!"
+        return 1
+    fi
+    echo "K-mers for k = $1 saved to ${w}/k$1/kmers/kmers"
+}
+
+pids=()
+for k in ${ks[@]}; do
+    while [[ $(jobs -rp | wc -l) -ge ${nJobs} ]]; do
+        sleep 1
+    done
+    count_kmers ${k} &
+    pids+=($!)
+done
+
+failed=0
+for pid in ${pids[@]}; do
+    wait ${pid} || failed=1
+done
+
+if [[ ${failed} -eq 0 ]]; then
+    comment "Step 2 finished successfully!"
+else
+    error "Error during step 2!"
+    exit 1
+fi
+
+# decompressed reads are not needed after k-mers are counted for all k, unless cache is shared between runs
+if [[ ${sharedCache} == false ]]; then
+    rm -r ${readsCache} ${w}/reads_file.tsv
+fi
+
+
+
+# ==== Step 3 ====
+comment "Running step 3: extracting features via ${pipeline} pipeline for every k"
+
+cmd3="${PIPES}/${pipeline}.sh "
+if [[ $m ]]; then
+    cmd3+="-m $m "
+fi
+if [[ $p ]]; then
+    cmd3+="-t $p "
+fi
+if [[ ${b} ]]; then
+    cmd3+="-b ${b} "
+fi
+cmd3+="-i ${i} "
+
+for k in ${ks[@]}; do
+    echo "Processing k = ${k}"
+    cmd3_i=$cmd3
+    cmd3_i+="-k ${k} "
+    cmd3_i+="--kmers-dir ${w}/k${k}/kmers/kmers "
+    cmd3_i+="-w ${w}/k${k} "
+
+    echo "${cmd3_i}$*"
+    ${cmd3_i} "$@"
+    if [[ $? -eq 0 ]]; then
+        echo "Feature table for k = ${k} saved to ${w}/k${k}/feature_table.tsv"
+    else
+        error "Error during step 3!"
+        exit 1
+    fi
+done
+
+comment "Step 3 finished successfully!"
+
+
+
+# ==== Step 4 ====
+comment "Running step 4: combining feature tables for all k"
+
+python3 ${SOFT}/join_multi_k.py ${w} ${ks[@]}
+if [[ $? -eq 0 ]]; then
+    echo "Combined feature table saved to ${w}/feature_table.tsv"
+    comment "Step 4 finished successfully!"
+else
+    error "Error during step 4!"
+    exit 1
+fi
+
+
+comment "MetaFX multi_k module finished successfully!"
+exit 0
@@ -6,18 +6,20 @@
 help_message () {
     echo ""
     echo "$(metafx -v)"
-    echo "MetaFX predict module – Machine Learning methods to classify new samples based on pre-trained model"
+    echo "MetaFX predict module – Machine Learning methods to classify new samples based on one or several pre-trained models"
     echo "Usage: metafx predict [<Launch options>] [<Input parameters>]"
     echo ""
     echo "Launch options:"
     echo "    -h | --help                        show this help message and exit"
+    echo "    -t | --threads        <int>        number of chunks of samples processed in parallel [default: 1]"
     echo "    -w | --work-dir       <dirname>    working directory [default: workDir/]"
     echo ""
     echo "Input parameters:"
     echo "    -f | --feature-table  <filename>   file with feature table in tsv format: rows – features, columns – samples (\"workDir/feature_table.tsv\" can be used) [mandatory]"
-    echo "         --model          <filename>   file with pre-trained classification model, obtained via 'fit' or 'cv' module (\"workDir/model.joblib\" can be used) [mandatory]"
-    echo "    -e | --estimator      [RF, XGB, Torch] classification model: RF – scikit-learn Random Forest, XGB – XGBoost, Torch – PyTorch neural network, default: RF]"
+    echo "         --model          <filename>   file with pre-trained classification model, obtained via 'fit' or 'cv' module (\"workDir/model.joblib\" can be used). Can be repeated to score samples by several models at once: feature table is loaded once, models run concurrently and output contains labels and class probabilities for every model [mandatory]"
+    echo "    -e | --estimator      [RF, XGB, Torch, auto] classification model: RF – scikit-learn Random Forest, XGB – XGBoost, Torch – PyTorch neural network, auto – detect type of every model from its file [optional, default: auto]"
     echo "    -i | --metadata-file  <filename>   tab-separated file with 2 values in each row: <sample>\t<category> to check accuracy of predictions [optional, default: None]"
+    echo "         --chunk-size     <int>        number of samples loaded and predicted at once, predictions are appended to output as soon as chunk is processed (0 – all samples at once) [optional, default: 0]"
     echo "         --name           <filename>   name of output file with samples predicted labels in workDir [optional, default: predictions]"
     echo "";}
 
@@ -36,8 +38,11 @@ error   () { ${SOFT}/pretty_print.py "$1" "*"; exit 1; }
 
 
 w="workDir"
+chunkSize=0
+nThreads=1
 metadataFile=""
-estimator="RF"
+estimator="auto"
+modelFiles=()
 POSITIONAL=()
 while [[ $# -gt 0 ]]
 do
@@ -53,7 +58,7 @@ case $key in
     shift # past value
     ;;
     --model)
-    modelFile="$2"
+    modelFiles+=("$2")
     shift
     shift
     ;;
@@ -72,6 +77,16 @@ case $key in
     shift
     shift
     ;;
+    --chunk-size)
+    chunkSize="$2"
+    shift
+    shift
+    ;;
+    -t|--threads)
+    nThreads="$2"
+    shift
+    shift
+    ;;
     -w|--work-dir)
     w="$2"
     shift
@@ -91,10 +106,18 @@ if [[ ! -f ${featureFile} ]]; then
     exit 1
 fi
 
-if [[ ! -f ${modelFile} ]]; then
-    error "Pre-trained model file ${modelFile} does not exist!"
+if [[ ${#modelFiles[@]} -eq 0 ]]; then
+    error "Provide at least one pre-trained model file via --model!"
     exit 1
 fi
+modelArgs=""
+for modelFile in ${modelFiles[@]}; do
+    if [[ ! -f ${modelFile} ]]; then
+        error "Pre-trained model file ${modelFile} does not exist!"
+        exit 1
+    fi
+    modelArgs+="--model ${modelFile} "
+done
 
 mkdir -p ${w}
 
@@ -110,15 +133,20 @@ if [[ ${estimator} ]] ; then
         "RF") : ;;
         "XGB") : ;;
         "Torch") : ;;
+        "auto") : ;;
         *) 
-        error "Unknown classification model type! Please, select from [RF, XGB, Torch]"
+        error "Unknown classification model type! Please, select from [RF, XGB, Torch, auto]"
         exit 1
         ;;
     esac
 fi
 
 
-python3 ${SOFT}/predict.py ${featureFile} ${outputName} ${modelFile} ${estimator} ${metadataFile}
+cmd="python3 ${SOFT}/predict.py --table ${featureFile} --out ${outputName} ${modelArgs}-e ${estimator} --chunk-size ${chunkSize} -t ${nThreads}"
+if [[ ${metadataFile} ]]; then
+    cmd+=" --metadata ${metadataFile}"
+fi
+${cmd}
 if [[ $? -ne 0 ]]; then
     error "Labels prediction failed!"
     exit 1
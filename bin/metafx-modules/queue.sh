@@ -0,0 +1,405 @@
+#!/usr/bin/env bash
+##########################################################################################
+#####  MetaFX queue module to run pipelines by several workers on one or many nodes  #####
+##########################################################################################
+
+help_message () {
+    echo ""
+    echo "$(metafx -v)"
+    echo "MetaFX queue module – split pipeline into tasks run by independent workers sharing working directory (locally or on several nodes)"
+    echo "Usage: metafx queue init   --pipeline <name> [<Launch options>] [<Input parameters>]"
+    echo "       metafx queue worker [-w <dirname>] [-j <int>] [--timeout <int>]"
+    echo "       metafx queue status [-w <dirname>]"
+    echo ""
+    echo "Commands:"
+    echo "    init                              create list of tasks with dependencies in working directory"
+    echo "    worker                            claim and run ready tasks until all tasks are finished, may be launched on every node sharing working directory"
+    echo "    status                            print state of every task"
+    echo ""
+    echo "Launch options:"
+    echo "    -h | --help                       show this help message and exit"
+    echo "    -t | --threads       <int>        number of threads for every task [default: all]"
+    echo "    -m | --memory        <MEM>        memory for every task (values with suffix: 1500M, 4G, etc.). Set it if several workers share one node [default: 90% of free RAM]"
+    echo "    -w | --work-dir      <dirname>    working directory, must be accessible from all nodes running workers [default: workDir/]"
+    echo "    -j | --jobs          <int>        number of workers launched by 'worker' command on this node [default: 1]"
+    echo "         --retries       <int>        number of restarts of failed task [default: 2]"
+    echo "         --timeout       <int>        seconds without heartbeat of running task after which its worker is assumed lost and task is restarted [default: 600]"
+    echo ""
+    echo "Input parameters:"
+    echo "         --pipeline      <name>       pipeline to run: unique or calc_features [mandatory for init]"
+    echo "    -k | --k             <int>        k-mer size (in nucleotides, maximum value is 31) [mandatory for init]"
+    echo "    -i | --reads         <filenames>  unique: tab-separated file with 2 values in each row: <path_to_file>\t<category>; calc_features: list of reads files [mandatory, if --kmers-dir not set]"
+    echo "    -b | --bad-frequency <int>        maximal frequency for a k-mer to be assumed erroneous [default: 1]"
+    echo "    -d | --feature-dir   <dirname>    calc_features: directory with components for each category and categories_samples.tsv file [mandatory for calc_features]"
+    echo "         --kmers-dir     <dirname>    directory with pre-computed k-mers for samples in binary format [optional]"
+    echo "         --min-samples   <int>        unique: k-mer is considered group-specific if present in at least G samples of that group. G iterates in range [--min-samples; --max-samples] [default: 2]"
+    echo "         --max-samples   <int>        unique: k-mer is considered group-specific if present in at least G samples of that group. G iterates in range [--min-samples; --max-samples] [default: #{samples in category}/2 + 1]"
+    echo "         --depth         <int>        unique: depth of de Bruijn graph traversal from pivot k-mers in number of branches [default: 1]"
+    echo "         --skip-graph                 unique: if TRUE skip de Bruijn graph and fasta construction from components [default: False]"
+    echo "";}
+
+
+# Paths to pipelines and scripts
+mfx_path=$(which metafx)
+bin_path=${mfx_path%/*}
+SOFT=${bin_path}/metafx-scripts
+PIPES=${bin_path}/metafx-modules
+pwd=`dirname "$0"`
+
+comment () { ${SOFT}/pretty_print.py "$1" "-"; }
+warning () { ${SOFT}/pretty_print.py "$1" "*"; }
+error   () { ${SOFT}/pretty_print.py "$1" "*"; exit 1; }
+
+
+
+command="$1"
+shift
+w="workDir"
+nJobs=1
+retries=2
+timeout=600
+POSITIONAL=()
+while [[ $# -gt 0 ]]
+do
+key="$1"
+case $key in
+    -h|--help)
+    help_message
+    exit 0
+    ;;
+    --pipeline)
+    pipeline="$2"
+    shift # past argument
+    shift # past value
+    ;;
+    -k|--k)
+    k="$2"
+    shift
+    shift
+    ;;
+    -b|--bad-frequency)
+    b="$2"
+    shift
+    shift
+    ;;
+    -i|--reads|--reads-file)
+    shift
+    i=""
+    while [[ $1 ]] && [ ${1:0:1} != "-" ]
+    do
+        i+="$1 "
+        shift
+    done
+    ;;
+    -d|--feature-dir)
+    featDir="$2"
+    shift
+    shift
+    ;;
+    --kmers-dir)
+    kmers="$2"
+    shift
+    shift
+    ;;
+    --min-samples)
+    minSamples="$2"
+    shift
+    shift
+    ;;
+    --max-samples)
+    maxSamples="$2"
+    shift
+    shift
+    ;;
+    --depth)
+    depth="$2"
+    shift
+    shift
+    ;;
+    --skip-graph)
+    skipGraph=true
+    shift
+    ;;
+    -m|--memory)
+    m="$2"
+    shift
+    shift
+    ;;
+    -t|--threads)
+    p="$2"
+    shift
+    shift
+    ;;
+    -w|--work-dir)
+    w="$2"
+    shift
+    shift
+    ;;
+    -j|--jobs)
+    nJobs="$2"
+    shift
+    shift
+    ;;
+    --retries)
+    retries="$2"
+    shift
+    shift
+    ;;
+    --timeout)
+    timeout="$2"
+    shift
+    shift
+    ;;
+    *)    # unknown option
+    POSITIONAL+=("$1") # save it in an array for later
+    shift
+    ;;
+esac
+done
+set -- "${POSITIONAL[@]}" # restore positional parameters
+
+
+if [[ ${command} == "-h" || ${command} == "--help" ]]; then
+    help_message
+    exit 0
+fi
+
+
+
+if [[ ${command} == "status" ]]; then
+    python3 ${SOFT}/task_queue.py status -q ${w}/queue --timeout ${timeout}
+    exit $?
+fi
+
+
+
+if [[ ${command} == "worker" ]]; then
+    if [[ ! -f ${w}/queue/tasks.tsv ]]; then
+        error "No queue found in ${w}, create it via 'metafx queue init'"
+        exit 1
+    fi
+    comment "Running ${nJobs} worker(s) on $(hostname)"
+
+    pids=()
+    for ((j=0;j<nJobs;j++)); do
+        python3 ${SOFT}/task_queue.py worker -q ${w}/queue --timeout ${timeout} </dev/null &
+        pids+=($!)
+    done
+
+    failed=0
+    for pid in ${pids[@]}; do
+        wait ${pid} || failed=1
+    done
+
+    if [[ ${failed} -ne 0 ]]; then
+        error "Some tasks failed, see logs in ${w}/queue/logs"
+        exit 1
+    fi
+    if [[ -f ${w}/feature_table.tsv ]]; then
+        echo "Feature table saved to ${w}/feature_table.tsv"
+    fi
+    comment "MetaFX queue module finished successfully!"
+    exit 0
+fi
+
+
+
+if [[ ${command} != "init" ]]; then
+    help_message
+    error "Unknown command '${command}'. Select one of: init, worker, status"
+    exit 1
+fi
+if [[ ${pipeline} != "unique" && ${pipeline} != "calc_features" ]]; then
+    error "Unknown pipeline '${pipeline}'. Select one of: unique, calc_features"
+    exit 1
+fi
+
+# tasks are run from other directories and nodes, so all paths are absolute
+# (metafx itself may be found via relative directory in PATH)
+mkdir -p ${w}
+w=$(realpath ${w})
+SOFT=$(realpath ${SOFT})
+PIPES=$(realpath ${PIPES})
+tasks=${w}/queue_tasks.tsv
+> ${tasks}
+add_task () { printf "%s\t%s\t%s\n" "$1" "$2" "$3" >> ${tasks}; }
+
+cmd="${PIPES}/metafast.sh "
+if [[ $k ]]; then
+    cmd+="-k $k "
+fi
+if [[ $m ]]; then
+    cmd+="-m $m "
+fi
+if [[ $p ]]; then
+    cmd+="-p $p "
+fi
+
+
+
+# ==== Step 1 ====
+comment "Running step 1: creating k-mer counting tasks for samples"
+
+if [[ ${pipeline} == "unique" ]]; then
+    readsFiles="$(cut -f1 ${i} | tr '\n' ' ')"
+else
+    readsFiles="${i}"
+fi
+
+declare -A countTask
+samples=()
+if [[ ${kmers} ]]; then
+    kmersDir=$(realpath ${kmers})
+    for file in ${kmersDir}/*.kmers.bin; do
+        samples+=($(basename ${file} .kmers.bin))
+    done
+    echo "Using pre-computed k-mers for ${#samples[@]} samples from ${kmersDir}"
+else
+    kmersDir="${w}/kmers/kmers"
+    declare -A sampleFiles
+    for file in ${readsFiles}; do
+        # the same sample name as assigned by k-mer counter
+        sample=$(basename ${file} | sed -E 's/(_r1|_r2|_R1|_R2|)\.(fa|fasta|fq|fastq|FA|FASTA|FQ|FASTQ)(\.gz|\.bz2|)$//')
+        if [[ -z ${sampleFiles[${sample}]} ]]; then
+            samples+=(${sample})
+        fi
+        sampleFiles[${sample}]+="$(realpath ${file}) "
+    done
+
+    for sample in ${samples[@]}; do
+        cmd1=$cmd
+        cmd1+="-t kmer-counter-many "
+        if [[ ${b} ]]; then
+            cmd1+="-b ${b} "
+        fi
+        cmd1+="-i ${sampleFiles[${sample}]}"
+        cmd1+="-w ${w}/queue/work/count_${sample}/ "
+        cmd1+="&& mkdir -p ${kmersDir} && mv -f ${w}/queue/work/count_${sample}/kmers/${sample}.kmers.bin ${kmersDir}/"
+        add_task count_${sample} "" "${cmd1}"
+        countTask[${sample}]=count_${sample}
+    done
+    echo "Created ${#samples[@]} k-mer counting tasks"
+fi
+
+if [[ ${#samples[@]} -eq 0 ]]; then
+    error "No samples found!"
+    exit 1
+fi
+comment "Step 1 finished successfully!"
+
+
+
+# ==== Step 2 ====
+comment "Running step 2: creating feature extraction tasks for categories"
+
+if [[ ${pipeline} == "unique" ]]; then
+    compDir=${w}
+    catFile=${w}/categories_samples.tsv
+    python3 ${SOFT}/parse_samples_categories.py ${i} > ${catFile}
+    python3 ${SOFT}/get_samples_categories.py ${w}
+    tmp=$(wc -l < ${catFile})
+    if [[ $tmp -lt 2 ]]; then
+        echo "Found only $tmp categories in ${i} file. Provide at least 2 categories of input samples!"
+        error "Error during step 2!"
+        exit 1
+    fi
+    allCounts=$(IFS=','; echo "${countTask[*]}")
+
+    while read line ; do
+        IFS=$'\t' read -ra cat_samples <<< "${line}"
+        cat=${cat_samples[0]}
+        nSamples=$(wc -w <<< "${cat_samples[1]}")
+        catKmers="${kmersDir}/${cat_samples[1]// /.kmers.bin ${kmersDir}/}.kmers.bin "
+
+        cmd2=$cmd
+        cmd2+="-t unique-kmers-multi "
+        if [[ ${minSamples} ]]; then
+            minG=${minSamples}
+        elif [[ ${nSamples} -eq 1 ]]; then
+            minG=1
+        else
+            minG=2
+        fi
+        cmd2+="--min-samples ${minG} "
+        if [[ ${maxSamples} ]]; then
+            cmd2+="--max-samples ${maxSamples} "
+        else
+            cmd2+="--max-samples $(( ${nSamples} / 2 + 1)) "
+        fi
+        cmd2+="-i ${catKmers}"
+        cmd2+="--filter-kmers ${kmersDir}/${cat_samples[2]// /.kmers.bin ${kmersDir}/}.kmers.bin "
+        cmd2+="-w ${w}/unique_kmers_${cat}/"
+        add_task unique_${cat} "${allCounts}" "${cmd2}"
+
+        # G is determined when unique k-mers are found, so it is substituted when task is run
+        cmd3="G=\$(bash ${SOFT}/get_G.sh ${w}/unique_kmers_${cat}/log ${minG}) && echo \"Using G = \$G\" && "
+        cmd3+=$cmd
+        cmd3+="-t component-extractor "
+        if [[ ${depth} ]]; then
+            cmd3+="--depth ${depth} "
+        fi
+        cmd3+="--pivot ${w}/unique_kmers_${cat}/kmers/filtered_\${G}.kmers.bin "
+        cmd3+="-i ${catKmers}"
+        cmd3+="-w ${w}/components_${cat}/"
+        add_task components_${cat} unique_${cat} "${cmd3}"
+
+        if [[ -z ${skipGraph} ]]; then
+            cmd5=$cmd
+            cmd5+="-t comp2graph "
+            cmd5+="-cf ${w}/components_${cat}/components.bin "
+            cmd5+="-i ${catKmers}"
+            cmd5+="-cov "
+            cmd5+="-w ${w}/contigs_${cat}/ "
+            cmd5+="&& python3 ${SOFT}/graph2contigs.py ${w}/contigs_${cat}/"
+            add_task contigs_${cat} components_${cat} "${cmd5}"
+        fi
+    done<${catFile}
+else
+    if [ ! -f ${featDir}/categories_samples.tsv ]; then
+        error "categories_samples.tsv file missing in ${featDir}"
+        exit 1
+    fi
+    compDir=$(realpath ${featDir})
+    catFile=${compDir}/categories_samples.tsv
+fi
+comment "Step 2 finished successfully!"
+
+
+
+# ==== Step 3 ====
+comment "Running step 3: creating feature calculation tasks for samples"
+
+featureTasks=()
+while read line ; do
+    IFS=$'\t' read -ra cat_samples <<< "${line}"
+    cat=${cat_samples[0]}
+    for sample in ${samples[@]}; do
+        cmd4=$cmd
+        cmd4+="-t features-calculator "
+        cmd4+="-cm ${compDir}/components_${cat}/components.bin "
+        cmd4+="-ka ${kmersDir}/${sample}.kmers.bin "
+        cmd4+="-w ${w}/queue/work/features_${cat}_${sample}/ "
+        cmd4+="&& mkdir -p ${w}/features_${cat}/vectors "
+        cmd4+="&& mv -f ${w}/queue/work/features_${cat}_${sample}/vectors/${sample}.breadth ${w}/features_${cat}/vectors/"
+        deps=${countTask[${sample}]}
+        if [[ ${pipeline} == "unique" ]]; then
+            deps="components_${cat}${deps:+,${deps}}"
+        fi
+        add_task features_${cat}_${sample} "${deps}" "${cmd4}"
+        featureTasks+=(features_${cat}_${sample})
+    done
+done<${catFile}
+
+add_task join_features "$(IFS=','; echo "${featureTasks[*]}")" "python3 ${SOFT}/join_feature_vectors.py ${w} ${catFile}"
+
+python3 ${SOFT}/task_queue.py init -q ${w}/queue --tasks ${tasks} --retries ${retries}
+if [[ $? -eq 0 ]]; then
+    comment "Step 3 finished successfully!"
+else
+    error "Error during step 3!"
+    exit 1
+fi
+
+
+comment "Queue is ready. Launch workers on any nodes sharing ${w} via: metafx queue worker -w ${w} [-j <int>]"
+exit 0
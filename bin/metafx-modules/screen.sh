@@ -0,0 +1,214 @@
+#!/usr/bin/env bash
+##########################################################################################
+#####  MetaFX screen module for fast approximate predictions on subsamples of reads  #####
+##########################################################################################
+
+help_message () {
+    echo ""
+    echo "$(metafx -v)"
+    echo "MetaFX screen module – fast approximate classification of new samples based on features of reads subsamples of several sizes"
+    echo "Usage: metafx screen [<Launch options>] [<Input parameters>]"
+    echo ""
+    echo "Launch options:"
+    echo "    -h | --help                       show this help message and exit"
+    echo "    -t | --threads       <int>        number of threads to use [default: all]"
+    echo "    -m | --memory        <MEM>        memory to use (values with suffix: 1500M, 4G, etc.) [default: 90% of free RAM]"
+    echo "    -w | --work-dir      <dirname>    working directory [default: workDir/]"
+    echo ""
+    echo "Input parameters:"
+    echo "    -k | --k             <int>        k-mer size (in nucleotides, maximum value is 31) [mandatory]"
+    echo "    -i | --reads         <filenames>  list of reads files from single environment. FASTQ, FASTA, gzip- or bzip2-compressed [mandatory]"
+    echo "    -d | --feature-dir   <dirname>    directory containing folders with components.bin file for each category and categories_samples.tsv file. Usually, it is workDir from other MetaFX modules (unique, stats, colored, metafast, metaspades) [mandatory]"
+    echo "         --model         <filename>   file with pre-trained classification model, obtained via 'fit' or 'cv' module [mandatory]"
+    echo "    -e | --estimator     [RF, XGB, Torch, auto] classification model type [default: auto]"
+    echo "    -b | --bad-frequency <int>        maximal frequency for a k-mer to be assumed erroneous. Low-coverage subsamples lose more k-mers to this filter, so 0 is preferable for small subsamples [default: 1]"
+    echo "         --sizes         <int,int,..> comma-separated numbers of reads per file in subsamples, prediction is checked for stability across them [default: 100000,500000,2000000]"
+    echo "         --mode          <name>       subsampling mode: first (first N reads, fast) or random (about N reads chosen by hash of read names, whole files are read once) [default: first]"
+    echo "         --seed          <int>        seed for random subsampling [default: 0]"
+    echo "";}
+
+
+# Paths to pipelines and scripts
+mfx_path=$(which metafx)
+bin_path=${mfx_path%/*}
+SOFT=${bin_path}/metafx-scripts
+PIPES=${bin_path}/metafx-modules
+pwd=`dirname "$0"`
+
+comment () { ${SOFT}/pretty_print.py "$1" "-"; }
+warning () { ${SOFT}/pretty_print.py "$1" "*"; }
+error   () { ${SOFT}/pretty_print.py "$1" "*"; exit 1; }
+
+
+
+w="workDir"
+estimator="auto"
+sizes="100000,500000,2000000"
+mode="first"
+seed=0
+POSITIONAL=()
+while [[ $# -gt 0 ]]
+do
+key="$1"
+case $key in
+    -h|--help)
+    help_message
+    exit 0
+    ;;
+    -k|--k)
+    k="$2"
+    shift # past argument
+    shift # past value
+    ;;
+    -b|--bad-frequency)
+    b="$2"
+    shift
+    shift
+    ;;
+    -i|--reads)
+    shift
+    i=""
+    while [[ $1 ]] && [ ${1:0:1} != "-" ]
+    do
+        i+="$1 "
+        shift
+    done
+    ;;
+    -d|--feature-dir)
+    featDir="$2"
+    shift
+    shift
+    ;;
+    --model)
+    modelFile="$2"
+    shift
+    shift
+    ;;
+    -e|--estimator)
+    estimator="$2"
+    shift
+    shift
+    ;;
+    --sizes)
+    sizes="$2"
+    shift
+    shift
+    ;;
+    --mode)
+    mode="$2"
+    shift
+    shift
+    ;;
+    --seed)
+    seed="$2"
+    shift
+    shift
+    ;;
+    -m|--memory)
+    m="$2"
+    shift
+    shift
+    ;;
+    -t|--threads)
+    p="$2"
+    shift
+    shift
+    ;;
+    -w|--work-dir)
+    w="$2"
+    shift
+    shift
+    ;;
+    *)    # unknown option
+    POSITIONAL+=("$1") # save it in an array for later
+    shift
+    ;;
+esac
+done
+set -- "${POSITIONAL[@]}" # restore positional parameters
+
+
+if [[ ! -f ${modelFile} ]]; then
+    error "Pre-trained model file ${modelFile} does not exist!"
+    exit 1
+fi
+if [ ! -f ${featDir}/categories_samples.tsv ]; then
+    error "categories_samples.tsv file missing in ${featDir}"
+    exit 1
+fi
+IFS=',' read -ra sizeList <<< "${sizes}"
+mkdir -p ${w}
+
+
+
+# ==== Step 1 ====
+comment "Running step 1: subsampling reads (${mode} ${sizes} reads)"
+
+python3 ${SOFT}/subsample_reads.py -w ${w} --sizes ${sizes} --mode ${mode} --seed ${seed} -t ${p:-0} ${i}
+if [[ $? -eq 0 ]]; then
+    comment "Step 1 finished successfully!"
+else
+    error "Error during step 1!"
+    exit 1
+fi
+
+
+
+# ==== Step 2 ====
+comment "Running step 2: calculating features for every subsample"
+
+cmd2="${PIPES}/calc_features.sh -k ${k} -d ${featDir} --retain needed "
+if [[ ${b} ]]; then
+    cmd2+="-b ${b} "
+fi
+if [[ $m ]]; then
+    cmd2+="-m $m "
+fi
+if [[ $p ]]; then
+    cmd2+="-t $p "
+fi
+
+for size in ${sizeList[@]}; do
+    echo "Processing subsample of ${size} reads"
+    cmd2_i=$cmd2
+    cmd2_i+="-w ${w}/subsample_${size} "
+    cmd2_i+="-i ${w}/subsample_${size}/reads/*"
+
+    echo "${cmd2_i}"
+    ${cmd2_i} > ${w}/subsample_${size}/calc_features.log 2>&1
+    if [[ $? -eq 0 ]]; then
+        echo "Feature table saved to ${w}/subsample_${size}/feature_table.tsv"
+    else
+        error "Error during step 2! See log in ${w}/subsample_${size}/calc_features.log"
+        exit 1
+    fi
+    rm -r ${w}/subsample_${size}/reads
+done
+
+comment "Step 2 finished successfully!"
+
+
+
+# ==== Step 3 ====
+comment "Running step 3: predicting labels with coverage-scaled features and checking their stability"
+
+python3 ${SOFT}/screen_predict.py -w ${w} --model ${modelFile} -e ${estimator} ${sizeList[@]}
+if [[ $? -eq 0 ]]; then
+    echo "Screening report saved to ${w}/screening_report.tsv"
+    comment "Step 3 finished successfully!"
+else
+    error "Error during step 3!"
+    exit 1
+fi
+
+
+cmdFull="metafx calc_features -k ${k} -i ${i}-d ${featDir} -w ${w}/full "
+if [[ ${b} ]]; then
+    cmdFull+="-b ${b} "
+fi
+echo "To process samples at full depth run:"
+echo "    ${cmdFull}"
+echo "    metafx predict -f ${w}/full/feature_table.tsv --model ${modelFile} -e ${estimator} -w ${w}/full"
+
+comment "MetaFX screen module finished successfully!"
+exit 0
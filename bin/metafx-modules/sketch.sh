@@ -0,0 +1,164 @@
+#!/usr/bin/env bash
+##########################################################################################
+#####  MetaFX sketch module to estimate distances between samples via k-mer sketches  ####
+##########################################################################################
+
+help_message () {
+    echo ""
+    echo "$(metafx -v)"
+    echo "MetaFX sketch module – fast approximate distance matrix and heatmap for samples via FracMinHash sketches of k-mers"
+    echo "Usage: metafx sketch [<Launch options>] [<Input parameters>]"
+    echo ""
+    echo "Launch options:"
+    echo "    -h | --help                       show this help message and exit"
+    echo "    -t | --threads       <int>        number of threads to use [default: all]"
+    echo "    -m | --memory        <MEM>        memory to use (values with suffix: 1500M, 4G, etc.) [default: 90% of free RAM]"
+    echo "    -w | --work-dir      <dirname>    working directory [default: workDir/]"
+    echo ""
+    echo "Input parameters:"
+    echo "    -k | --k             <int>        k-mer size (in nucleotides, maximum value is 31) [mandatory]"
+    echo "    -i | --reads         <filenames>  list of reads files from single environment. FASTQ, FASTA, gzip- or bzip2-compressed [mandatory, if --kmers-dir not set]"
+    echo "    -b | --bad-frequency <int>        maximal frequency for a k-mer to be assumed erroneous [default: 1]"
+    echo "         --kmers-dir     <dirname>    directory with pre-computed k-mers for samples in binary format [optional, if set '-i' can be omitted]"
+    echo "         --kmers-cache   <dirname>    directory with k-mers cache shared between runs, keyed by reads files content, k and bad frequency. Cache size is limited by METAFX_KMERS_CACHE_SIZE variable [optional, default: \$METAFX_KMERS_CACHE]"
+    echo "         --scale         <int>        sketch keeps one of every <scale> k-mers on average [default: 1000]"
+    echo "         --sketch-cache  <dirname>    directory with samples' sketches and distances shared between runs [default: \$METAFX_KMERS_CACHE/sketches if set, otherwise workDir/sketch/sketches]"
+    echo "";}
+
+
+# Paths to pipelines and scripts
+mfx_path=$(which metafx)
+bin_path=${mfx_path%/*}
+SOFT=${bin_path}/metafx-scripts
+PIPES=${bin_path}/metafx-modules
+pwd=`dirname "$0"`
+
+comment () { ${SOFT}/pretty_print.py "$1" "-"; }
+warning () { ${SOFT}/pretty_print.py "$1" "*"; }
+error   () { ${SOFT}/pretty_print.py "$1" "*"; exit 1; }
+source ${SOFT}/kmers_step.sh
+
+
+
+w="workDir"
+kmersCache="${METAFX_KMERS_CACHE}"
+if [[ ${METAFX_KMERS_CACHE} ]]; then
+    sketchCache="${METAFX_KMERS_CACHE}/sketches"
+fi
+POSITIONAL=()
+while [[ $# -gt 0 ]]
+do
+key="$1"
+case $key in
+    -h|--help)
+    help_message
+    exit 0
+    ;;
+    -k|--k)
+    k="$2"
+    shift # past argument
+    shift # past value
+    ;;
+    -b|--bad-frequency)
+    b="$2"
+    shift
+    shift
+    ;;
+    -i|--reads)
+    shift
+    i=""
+    while [[ $1 ]] && [ ${1:0:1} != "-" ]
+    do
+        i+="$1 "
+        shift
+    done
+    ;;
+    --kmers-dir)
+    kmers="$2"
+    shift
+    shift
+    ;;
+    --kmers-cache)
+    kmersCache="$2"
+    shift
+    shift
+    ;;
+    --scale)
+    scale="$2"
+    shift
+    shift
+    ;;
+    --sketch-cache)
+    sketchCache="$2"
+    shift
+    shift
+    ;;
+    -m|--memory)
+    m="$2"
+    shift
+    shift
+    ;;
+    -t|--threads)
+    p="$2"
+    shift
+    shift
+    ;;
+    -w|--work-dir)
+    w="$2"
+    shift
+    shift
+    ;;
+    *)    # unknown option
+    POSITIONAL+=("$1") # save it in an array for later
+    shift
+    ;;
+esac
+done
+set -- "${POSITIONAL[@]}" # restore positional parameters
+
+
+cmd="${PIPES}/metafast.sh "
+if [[ $k ]]; then
+    cmd+="-k $k "
+fi
+if [[ $m ]]; then
+    cmd+="-m $m "
+fi
+if [[ $p ]]; then
+    cmd+="-p $p "
+fi
+
+
+
+# ==== Step 1 ====
+kmers_step "${cmd}" "${i}"
+
+
+
+# ==== Step 2 ====
+comment "Running step 2: sketching samples and constructing distance matrix with heatmap"
+
+cmd2="python3 ${SOFT}/sketch.py --kmers-dir ${kmersDir} -k ${k} -w ${w}/sketch "
+if [[ ${scale} ]]; then
+    cmd2+="--scale ${scale} "
+fi
+if [[ ${sketchCache} ]]; then
+    cmd2+="--cache-dir ${sketchCache} "
+fi
+if [[ $p ]]; then
+    cmd2+="-t $p "
+fi
+
+mkdir -p ${w}/sketch
+echo "${cmd2}"
+${cmd2}
+if [[ $? -eq 0 ]]; then
+    comment "Step 2 finished successfully!"
+else
+    error "Error during step 2!"
+    exit 1
+fi
+
+
+comment "MetaFX sketch module finished successfully!"
+exit 0
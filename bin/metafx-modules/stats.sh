@@ -11,9 +11,11 @@ help_message () {
     echo ""
     echo "Launch options:"
     echo "    -h | --help                       show this help message and exit"
-    echo "    -t | --threads       <int>        number of threads to use [default: all]"
-    echo "    -m | --memory        <MEM>        memory to use (values with suffix: 1500M, 4G, etc.) [default: 90% of free RAM]"
+    echo "    -t | --threads       <int>        number of threads to use [default: all available to the job]"
+    echo "    -m | --memory        <MEM>        memory to use (values with suffix: 1500M, 4G, etc.) [default: 90% of RAM available to the job]"
     echo "    -w | --work-dir      <dirname>    working directory [default: workDir/]"
+    echo "         --plan                       assign memory and threads to every step according to sizes of input reads and k-mers (within -m and -t limits) and print resources plan. Per-sample steps get at most one thread per sample and as many threads as fit into memory [default: False]"
+    echo "         --dry-run                    print resources plan and exit without running any step [default: False]"
     echo ""
     echo "Input parameters:"
     echo "    -k | --k             <int>        k-mer size (in nucleotides, maximum value is 31) [mandatory]"
@@ -23,7 +25,11 @@ help_message () {
     echo "         --pmw           <float>      p-value for Mann–Whitney test [default: 0.05]"
     echo "         --depth         <int>        Depth of de Bruijn graph traversal from pivot k-mers in number of branches [default: 1]"
     echo "         --kmers-dir     <dirname>    directory with pre-computed k-mers for samples in binary format [optional]"
+    echo "         --kmers-cache   <dirname>    directory with k-mers cache shared between runs, keyed by reads files content, k and bad frequency. Cache size is limited by METAFX_KMERS_CACHE_SIZE variable [optional, default: \$METAFX_KMERS_CACHE]"
+    echo "         --reads-cache   <dirname>    directory for decompressed copies of gzip/bzip2 reads files shared between runs, files are decompressed in parallel, one file uses several threads only via pigz/lbzip2/pbzip2 if installed or for multi-stream bzip2 (e.g. written by pbzip2) [optional, default: \$METAFX_READS_CACHE]"
     echo "         --skip-graph                 if TRUE skip de Bruijn graph and fasta construction from components [default: False]"
+    echo "         --retain        <policy>     files to keep in working directory: all (every intermediate file) or needed (only components, contigs, graphs and feature table used by calc_features, bandage and feature_analysis modules) [default: all]"
+    echo "         --compress                   compress text outputs (GFA, FASTA, feature vectors) with gzip [default: False]"
     echo "";}
 
 
@@ -37,10 +43,14 @@ pwd=`dirname "$0"`
 comment () { ${SOFT}/pretty_print.py "$1" "-"; }
 warning () { ${SOFT}/pretty_print.py "$1" "*"; }
 error   () { ${SOFT}/pretty_print.py "$1" "*"; exit 1; }
+source ${SOFT}/kmers_step.sh
 
 
 
 w="workDir"
+retain="all"
+kmersCache="${METAFX_KMERS_CACHE}"
+readsCache="${METAFX_READS_CACHE}"
 POSITIONAL=()
 while [[ $# -gt 0 ]]
 do
@@ -70,6 +80,16 @@ case $key in
     shift
     shift
     ;;
+    --kmers-cache)
+    kmersCache="$2"
+    shift
+    shift
+    ;;
+    --reads-cache)
+    readsCache="$2"
+    shift
+    shift
+    ;;
     
     --pchi2)
     pChi2="$2"
@@ -106,6 +126,24 @@ case $key in
     skipGraph=true
     shift
     ;;
+    --retain)
+    retain="$2"
+    shift
+    shift
+    ;;
+    --compress)
+    compress=true
+    shift
+    ;;
+    --plan)
+    plan=true
+    shift
+    ;;
+    --dry-run)
+    plan=true
+    dryRun=true
+    shift
+    ;;
     *)    # unknown option
     POSITIONAL+=("$1") # save it in an array for later
     shift
@@ -115,49 +153,72 @@ done
 set -- "${POSITIONAL[@]}" # restore positional parameters
 
 
+if [[ ${retain} != "all" && ${retain} != "needed" ]]; then
+    error "Unknown retention policy '${retain}'. Select one of: all, needed"
+    exit 1
+fi
+
+
 cmd="${PIPES}/metafast.sh "
 if [[ $k ]]; then
     cmd+="-k $k "
 fi
-if [[ $m ]]; then
-    cmd+="-m $m "
-fi
-if [[ $p ]]; then
-    cmd+="-p $p "
-fi
 
 
 
-# ==== Step 1 ====
-if [[ ${kmers} ]]; then
-    kmersDir="${kmers}"
-    mkdir ${w}
-    comment "Skipping step 1: will use provided k-mers"
-else
-    kmersDir="$w/kmers/kmers"
-    comment "Running step 1: counting k-mers for samples"
-    cmd1=$cmd
-    cmd1+="-t kmer-counter-many "
-    if [[ ${b} ]]; then
-        cmd1+="-b ${b} "
+# default budget is memory and CPUs available to this job (cgroup and SLURM limits), not the whole shared node
+read mNode pNode <<< "$(python3 ${SOFT}/split_resources.py "${m}" "${p}" 1)"
+m=${m:-${mNode}}
+p=${p:-${pNode}}
+
+# memory and threads options for step $1: planned values if resources plan was made, otherwise global ones
+resources () {
+    local mStep=$m
+    local pStep=$p
+    if [[ ${plan} ]]; then
+        read mStep pStep <<< "$(awk -F'\t' -v s=$1 '$1 == s {print $2, $3}' ${w}/resources_plan.tsv)"
     fi
-    if [[ ${i} ]]; then
-        cmd1+="-i $(cut -f1 ${i} | tr '\n' ' ') "
+    if [[ ${mStep} ]]; then
+        echo -n "-m ${mStep} "
     fi
-    cmd1+="-w ${w}/kmers/"
+    if [[ ${pStep} ]]; then
+        echo -n "-p ${pStep} "
+    fi
+}
 
-    echo "$cmd1"
-    $cmd1
-    if [[ $? -eq 0 ]]; then
-        comment "Step 1 finished successfully!"
-    else
-        error "Error during step 1!"
+if [[ ${plan} ]]; then
+    cmdPlan="python3 ${SOFT}/plan_resources.py --pipeline stats --reads-file ${i} "
+    if [[ ${kmers} ]]; then
+        cmdPlan+="--kmers-dir ${kmers} "
+    fi
+    if [[ $m ]]; then
+        cmdPlan+="-m $m "
+    fi
+    if [[ $p ]]; then
+        cmdPlan+="-t $p "
+    fi
+    if [[ -z ${dryRun} ]]; then
+        mkdir -p ${w}
+        cmdPlan+="--out ${w}/resources_plan.tsv "
+    fi
+    ${cmdPlan}
+    if [[ $? -ne 0 ]]; then
+        error "Cannot make resources plan!"
         exit 1
     fi
+    if [[ ${dryRun} ]]; then
+        comment "Dry run finished, no steps were executed"
+        exit 0
+    fi
 fi
 
 
 
+# ==== Step 1 ====
+kmers_step "${cmd}$(resources 1)" "$(cut -f1 ${i} | tr '\n' ' ')"
+
+
+
 # ==== Step 2 ====
 comment "Running step 2: extracting statistically-significant k-mers"
 
@@ -170,13 +231,7 @@ if [[ ${n_cat} -lt 2 ]]; then
     exit 1
 fi
 
-cmd2="${PIPES}/metafast.sh "
-if [[ $m ]]; then
-    cmd2+="-m $m "
-fi
-if [[ $p ]]; then
-    cmd2+="-p $p "
-fi
+cmd2="${PIPES}/metafast.sh $(resources 2)"
 
 
 if [[ ${n_cat} -eq 2 ]]; then # 2 categories
@@ -305,7 +360,7 @@ fi
 # ==== Step 3 ====
 comment "Running step 3: extracting graph components around group-specific k-mers"
 
-cmd3=$cmd
+cmd3="${cmd}$(resources 3)"
 cmd3+="-t component-extractor "
 
 if [[ ${depth} ]]; then
@@ -346,7 +401,7 @@ fi
 # ==== Step 4 ====
 comment "Running step 4: calculating features as coverage of components by samples"
 
-cmd4=$cmd
+cmd4="${cmd}$(resources 4)"
 cmd4+="-t features-calculator "
 
 while read line ; do
@@ -392,7 +447,7 @@ if [[ ${skipGraph} ]]; then
 else
     comment "Running step 5: transforming binary components to fasta sequences and de Bruijn graph"
 
-    cmd5=$cmd
+    cmd5="${cmd}$(resources 5)"
     cmd5+="-t comp2graph "
 
     while read line ; do
@@ -429,6 +484,22 @@ else
 fi
 
 
+cmdStorage="python3 ${SOFT}/workdir_storage.py --pipeline stats -w ${w} --retain ${retain} "
+if [[ ${kmers} ]]; then
+    cmdStorage+="--keep ${kmers} "
+fi
+if [[ ${compress} ]]; then
+    cmdStorage+="--compress "
+fi
+if [[ $p ]]; then
+    cmdStorage+="-t $p "
+fi
+${cmdStorage}
+if [[ $? -ne 0 ]]; then
+    warning "Cannot clean up working directory ${w}"
+fi
+
+
 comment "MetaFX stats module finished successfully!"
 exit 0
 
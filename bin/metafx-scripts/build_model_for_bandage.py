@@ -14,6 +14,9 @@ from sklearn.tree import DecisionTreeClassifier
 # to save and load classification model
 from joblib import dump, load
 
+# to read compressed sequences of features
+from workdir_storage import open_text
+
 
 def buildModelRandomForest(dataFile, rawLabels, nEstimators, maxDepth):
     """Fit Random Forest classification model
@@ -174,7 +177,7 @@ def printModel(model, resFileName, sourceDir, typeOfForest=0):
         prefix += tree.node_count
 
     for fClass in classes:
-        file = open(sourceDir + "/contigs_" + fClass + "/components.seq.fasta", 'r')
+        file = open_text(sourceDir + "/contigs_" + fClass + "/components.seq.fasta")
         line = file.readline()
         while line:
             feature = fClass + "_" + line[1:].split("_")[0]
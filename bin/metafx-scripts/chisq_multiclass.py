@@ -0,0 +1,127 @@
+#!/usr/bin/env python
+# Utility for extracting top N chi-squared significant k-mers for every category (one-vs-rest)
+# from per-category presence counts accumulated in a single pass over all samples
+import os
+import sys
+import numpy as np
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from metafx_kmers import read_kmers, write_kmers
+
+
+class PresenceCounter():
+    """Number of samples containing each k-mer, merged lazily to keep one sorted array of k-mers"""
+
+    def __init__(self):
+        self.kmers = np.empty(0, dtype=np.int64)
+        self.counts = np.empty(0, dtype=np.int32)
+        self.pending = []
+        self.pendingSize = 0
+
+    def add(self, kmers):
+        self.pending.append(kmers)
+        self.pendingSize += len(kmers)
+        if self.pendingSize > len(self.kmers):
+            self.merge()
+
+    def merge(self):
+        if not self.pending:
+            return
+        kmers = np.concatenate([self.kmers] + self.pending)
+        weights = np.concatenate([self.counts, np.ones(self.pendingSize, dtype=np.int32)])
+        self.kmers, inverse = np.unique(kmers, return_inverse=True)
+        self.counts = np.bincount(inverse.ravel(), weights=weights, minlength=len(self.kmers)).astype(np.int32)
+        self.pending = []
+        self.pendingSize = 0
+
+
+def count_presence(kmersDir, categories, b, nThreads):
+    """Count samples containing each k-mer in every category, reading every sample's file once
+
+    Arguments:
+    kmersDir (str): path to directory with samples' k-mers
+    categories (dict): category name -> list of samples
+    b (int): maximal frequency for a k-mer to be assumed erroneous
+    nThreads (int): number of files read in parallel
+
+    Returns:
+    tuple: (np.array of all k-mers, np.array of shape (n_kmers, n_categories) with presence counts)
+    """
+    counters = {cat: PresenceCounter() for cat in categories}
+    tasks = [(cat, sam) for cat, samples in categories.items() for sam in samples]
+    # at most nThreads samples' k-mers are held in memory before being added to counters
+    nThreads = max(nThreads, 1)
+    with ThreadPoolExecutor(max_workers=nThreads) as pool:
+        running = dict()
+        for cat, sam in tasks:
+            if len(running) == nThreads:
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    counters[running.pop(future)].add(future.result())
+            running[pool.submit(lambda sam: read_kmers(kmersDir + "/" + sam + ".kmers.bin", b)[0], sam)] = cat
+        for future in list(running):
+            counters[running.pop(future)].add(future.result())
+
+    for counter in counters.values():
+        counter.merge()
+    allKmers = np.unique(np.concatenate([counter.kmers for counter in counters.values()]))
+    presence = np.zeros((len(allKmers), len(categories)), dtype=np.int32)
+    for j, counter in enumerate(counters.values()):
+        presence[np.searchsorted(allKmers, counter.kmers), j] = counter.counts
+    return allKmers, presence
+
+
+def chi_squared(a, n1, b, n2):
+    """Pearson's chi-squared statistic for 2x2 tables of k-mers' presence in two groups of samples
+
+    Arguments:
+    a (np.array): number of samples containing k-mer in the first group
+    n1 (int): number of samples in the first group
+    b (np.array): number of samples containing k-mer in the second group
+    n2 (int): number of samples in the second group
+
+    Returns:
+    np.array: statistic value for every k-mer (0 for k-mers present in all or none samples)
+    """
+    a = a.astype(np.float64)
+    b = b.astype(np.float64)
+    n = n1 + n2
+    present = a + b
+    denominator = n1 * n2 * present * (n - present)
+    numerator = n * (a * (n2 - b) - b * (n1 - a)) ** 2
+    return np.divide(numerator, denominator, out=np.zeros_like(numerator), where=denominator > 0)
+
+
+if __name__ == "__main__":
+    catFile = sys.argv[1]
+    kmersDir = sys.argv[2]
+    nBest = int(sys.argv[3])
+    b = int(sys.argv[4])
+    w = sys.argv[5]
+    nThreads = int(sys.argv[6]) if len(sys.argv) > 6 else 0
+    if nThreads <= 0:
+        nThreads = os.cpu_count()
+
+    cat_samples = pd.read_csv(catFile, sep="\t", header=None, index_col=None, dtype=str)
+    cat_samples = cat_samples.fillna('')
+    categories = {cat: samples.split() for cat, samples in zip(cat_samples.iloc[:, 0], cat_samples.iloc[:, 1])}
+
+    allKmers, presence = count_presence(kmersDir, categories, b, nThreads)
+    total = presence.sum(axis=1)
+    N = sum(len(samples) for samples in categories.values())
+    print("Found " + str(len(allKmers)) + " k-mers in " + str(N) + " samples")
+
+    for j, (cat, samples) in enumerate(categories.items()):
+        n1 = len(samples)
+        a = presence[:, j]
+        rest = total - a
+        stat = chi_squared(a, n1, rest, N - n1)
+        # only k-mers more frequent in category than in the rest of samples are category-specific
+        stat[a * (N - n1) <= rest * n1] = 0
+        candidates = np.flatnonzero(stat > 0)
+        if len(candidates) > nBest:
+            candidates = candidates[np.argpartition(-stat[candidates], nBest - 1)[:nBest]]
+        best = np.sort(candidates)
+        write_kmers(w + "/statistic_kmers_" + cat + "/kmers/top_" + str(nBest) + "_chi_squared_specific.kmers.bin",
+                    allKmers[best], a[best])
+        print("Processed category " + cat + ": selected " + str(len(best)) + " k-mers")
@@ -1,5 +1,6 @@
 #!/usr/bin/env python
 # Utility for training RF model and cross-validation on feature table
+import os
 import sys
 import numpy as np
 import pandas as pd
@@ -7,16 +8,69 @@ from joblib import dump
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.model_selection import StratifiedKFold, GridSearchCV
 from sklearn.metrics import classification_report
+from sklearn import preprocessing
+from metafx_stream import read_samples
+
+
+def cv_xgb(featureFile, outName, metadata, nFolds, nThreads):
+    """Cross-validation of XGBoost model on cached binary DMatrix, feature table is parsed only on the first run
+
+    Arguments:
+    featureFile (str): path to feature table in tsv format: rows – features, columns – samples
+    outName (str): prefix of output files
+    metadata (pd.DataFrame): samples' labels
+    nFolds (int): number of folds
+    nThreads (int): number of threads
+
+    Returns:
+    None
+    """
+    from metafx_xgb import load_dmatrix, xgb_params, train_booster, predict_labels, to_classifier
+
+    allSamples = read_samples(featureFile)
+    samples = [sam for sam in allSamples if sam in metadata.index]
+    if len(samples) != len(allSamples) or len(samples) != metadata.shape[0]:
+        print("Samples from feature table and metadata does not match! " +
+              "Will use only " + str(len(samples)) + " common samples")
+
+    y = np.array([metadata.loc[i, 1] for i in samples])
+    le = preprocessing.LabelEncoder()
+    le.fit(y)
+    params = xgb_params(len(le.classes_), nThreads)
+    data = load_dmatrix(featureFile, samples, le.transform(y), params["nthread"],
+                        os.path.dirname(os.path.abspath(outName)) + "/xgb_cache")
+
+    cv = StratifiedKFold(n_splits=nFolds)
+    y_tests = []
+    y_preds = []
+    for train, test in cv.split(np.zeros(len(y)), y):
+        booster = train_booster(params, data.slice(train), 100)
+        y_tests.extend(y[test])
+        y_preds.extend(le.inverse_transform(predict_labels(booster, data.slice(test))))
+    print("Model accuracy on cross-validation:")
+    print(classification_report(y_tests, y_preds))
+
+    booster = train_booster(params, data, 100)
+    dump(to_classifier(booster), outName + ".joblib")
+    dump(le, outName + "_le.joblib")
+    print("Model accuracy after training:")
+    print(classification_report(y, le.inverse_transform(predict_labels(booster, data))))
 
 
 if __name__ == "__main__":
-    features = pd.read_csv(sys.argv[1], header=0, index_col=0, sep="\t")
     outName = sys.argv[2]
     metadata = pd.read_csv(sys.argv[3], sep="\t", header=None, index_col=0, dtype=str)
     metadata.index = metadata.index.astype(str)
     nFolds = int(sys.argv[4])
     gridSearch = True if sys.argv[5] == "true" else False
     nThreads = int(sys.argv[6])
+    estimator = sys.argv[7] if len(sys.argv) > 7 else "RF"
+
+    if estimator == "XGB":
+        cv_xgb(sys.argv[1], outName, metadata, nFolds, nThreads)
+        sys.exit(0)
+
+    features = pd.read_csv(sys.argv[1], header=0, index_col=0, sep="\t")
 
     if set(features.columns) != set(metadata.index):
         features = features.filter(items=metadata.index, axis=1)
@@ -0,0 +1,164 @@
+#!/usr/bin/env python
+# Utility for random-access queries of single features from feature_table.tsv via persistent binary index
+# -*- coding: UTF-8 -*-
+
+import os
+import sys
+import getopt
+import tempfile
+import numpy as np
+import pandas as pd
+from numpy.lib.format import open_memmap
+
+
+def index_paths(tableFile):
+    """Get names of index files stored next to feature table
+
+    Arguments:
+    tableFile (str): path to feature table in tsv format
+
+    Returns:
+    tuple: paths to binary values matrix, features' names and samples' names
+    """
+    prefix = os.path.splitext(tableFile)[0]
+    return prefix + ".values.npy", prefix + ".features.txt", prefix + ".samples.txt"
+
+
+def is_index_fresh(tableFile):
+    """Check that index exists and was built after the last modification of feature table
+
+    Arguments:
+    tableFile (str): path to feature table in tsv format
+
+    Returns:
+    bool: True if index can be used
+    """
+    tableTime = os.path.getmtime(tableFile)
+    return all(os.path.exists(f) and os.path.getmtime(f) >= tableTime for f in index_paths(tableFile))
+
+
+def build_index(tableFile):
+    """Convert feature table into row-major binary matrix without loading the whole table into memory.
+    Index is written into temporary files replacing old ones at the end, so concurrent builds do not clash
+
+    Arguments:
+    tableFile (str): path to feature table in tsv format
+
+    Returns:
+    None
+    """
+    valuesFile, featuresFile, samplesFile = index_paths(tableFile)
+    with open(tableFile) as f:
+        samples = f.readline().rstrip("\n").split("\t")[1:]
+        M = sum(1 for _ in f)
+
+    tmpFiles = []
+    for f in (valuesFile, featuresFile, samplesFile):
+        fd, tmp = tempfile.mkstemp(prefix=os.path.basename(f) + ".", suffix=".tmp", dir=os.path.dirname(os.path.abspath(f)))
+        os.close(fd)
+        os.chmod(tmp, os.stat(tableFile).st_mode & 0o666)
+        tmpFiles.append(tmp)
+    try:
+        values = open_memmap(tmpFiles[0], mode="w+", dtype=np.float64, shape=(M, len(samples)))
+        names = set()
+        with open(tableFile) as f, open(tmpFiles[1], "w") as features:
+            f.readline()
+            for i, line in enumerate(f):
+                name, row = line.rstrip("\n").split("\t", 1)
+                if name in names:
+                    raise ValueError("Feature '" + name + "' occurs more than once in " + tableFile)
+                names.add(name)
+                values[i] = np.array(row.split("\t"), dtype=np.float64)
+                print(name, file=features)
+        values.flush()
+        del values
+        with open(tmpFiles[2], "w") as out:
+            print(*samples, sep="\n", file=out)
+    except BaseException:
+        for tmp in tmpFiles:
+            os.remove(tmp)
+        raise
+
+    for tmp, f in zip(tmpFiles, (valuesFile, featuresFile, samplesFile)):
+        os.replace(tmp, f)
+
+
+def load_index(tableFile):
+    """Open feature index (building or refreshing it if needed) with memory-mapped values
+
+    Arguments:
+    tableFile (str): path to feature table in tsv format
+
+    Returns:
+    tuple: (np.memmap of shape (n_features, n_samples), dict feature name -> row number, list of samples)
+    """
+    if not is_index_fresh(tableFile):
+        build_index(tableFile)
+    valuesFile, featuresFile, samplesFile = index_paths(tableFile)
+    values = np.load(valuesFile, mmap_mode="r")
+    rows = {line.rstrip("\n"): i for i, line in enumerate(open(featuresFile))}
+    samples = [line.rstrip("\n") for line in open(samplesFile)]
+    return values, rows, samples
+
+
+def get_feature(tableFile, feature):
+    """Get per-sample values of one feature
+
+    Arguments:
+    tableFile (str): path to feature table in tsv format
+    feature (str): name of the feature (value from first column of feature table)
+
+    Returns:
+    pd.Series: values of feature indexed by samples' names, None if feature is absent
+    """
+    values, rows, samples = load_index(tableFile)
+    if feature not in rows:
+        return None
+    return pd.Series(np.array(values[rows[feature]]), index=samples, name=feature)
+
+
+if __name__ == "__main__":
+    tableFile = ''
+    features = []
+    build = False
+
+    helpString = 'Please add mandatory parameter --table and optional parameters --feature (can be repeated) or --build'
+
+    argv = sys.argv[1:]
+    try:
+        opts, args = getopt.getopt(argv, "h", ["table=", "feature=", "build"])
+    except getopt.GetoptError:
+        print(helpString)
+        sys.exit(2)
+    for opt, arg in opts:
+        if opt == "-h":
+            print(helpString)
+            sys.exit()
+        elif opt == "--table":
+            tableFile = arg
+        elif opt == "--feature":
+            features.append(arg)
+        elif opt == "--build":
+            build = True
+
+    if tableFile == '':
+        print(helpString)
+        sys.exit(2)
+
+    try:
+        if build:
+            build_index(tableFile)
+        values, rows, samples = load_index(tableFile)
+    except ValueError as e:
+        print(str(e), file=sys.stderr)
+        sys.exit(1)
+
+    missing = False
+    for feature in features:
+        if feature not in rows:
+            print("Cannot find feature '" + feature + "' in " + tableFile, file=sys.stderr)
+            missing = True
+            continue
+        for sam, val in zip(samples, values[rows[feature]]):
+            print(feature, sam, val, sep="\t")
+    sys.exit(1 if missing else 0)
@@ -1,21 +1,83 @@
 #!/usr/bin/env python
 # Utility for training RF model on feature table
+import os
 import sys
 import numpy as np
 import pandas as pd
 from joblib import dump
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.metrics import classification_report
-from xgboost import XGBClassifier
 from sklearn import preprocessing
+from sklearn.model_selection import train_test_split
 from metafx_torch import TorchLinearModel
 import torch
+from metafx_stream import read_samples
+from metafx_xgb import load_dmatrix, xgb_params, train_booster, predict_labels, to_classifier
+
+
+def fit_xgb(featureFile, outName, metadata, nThreads, nRounds, earlyStopping, validFraction, chunkSize):
+    """Train XGBoost model with histogram tree construction on cached (or streamed) DMatrix
+
+    Arguments:
+    featureFile (str): path to feature table in tsv format: rows – features, columns – samples
+    outName (str): prefix of output files
+    metadata (pd.DataFrame): samples' labels
+    nThreads (int): number of threads (0 – all cores)
+    nRounds (int): maximal number of boosting rounds
+    earlyStopping (int): number of rounds without improvement on held-out samples before stopping (0 – no early stopping)
+    validFraction (float): fraction of samples held out for early stopping
+    chunkSize (int): number of samples in one chunk for external-memory training (0 – load into RAM)
+
+    Returns:
+    None
+    """
+    allSamples = read_samples(featureFile)
+    samples = [sam for sam in allSamples if sam in metadata.index]
+    if len(samples) != len(allSamples) or len(samples) != metadata.shape[0]:
+        print("Samples from feature table and metadata does not match! " +
+              "Will use only " + str(len(samples)) + " common samples")
+
+    labels = np.array([metadata.loc[i, 1] for i in samples])
+    le = preprocessing.LabelEncoder()
+    le.fit(labels)
+    y = le.transform(labels)
+    params = xgb_params(len(le.classes_), nThreads)
+    cacheDir = os.path.dirname(os.path.abspath(outName)) + "/xgb_cache"
+
+    data = load_dmatrix(featureFile, samples, y, params["nthread"], cacheDir, chunkSize)
+    dtrain, dvalid = data, None
+    if earlyStopping > 0:
+        train, valid = train_test_split(np.arange(len(samples)), test_size=validFraction, stratify=y)
+        train, valid = np.sort(train), np.sort(valid)
+        print("Will use " + str(len(train)) + " samples for training and " +
+              str(len(valid)) + " held-out samples for early stopping")
+        if chunkSize > 0:
+            dtrain = load_dmatrix(featureFile, [samples[i] for i in train], y[train], params["nthread"], cacheDir, chunkSize)
+            dvalid = load_dmatrix(featureFile, [samples[i] for i in valid], y[valid], params["nthread"], cacheDir)
+        else:
+            dtrain, dvalid = data.slice(train), data.slice(valid)
+
+    booster = train_booster(params, dtrain, nRounds, dvalid, earlyStopping)
+    dump(to_classifier(booster), outName + ".joblib")
+    dump(le, outName + "_le.joblib")
+
+    print("Model accuracy after training:")
+    print(classification_report(y, predict_labels(booster, data)))
+
 
 if __name__ == "__main__":
-    features = pd.read_csv(sys.argv[1], header=0, index_col=0, sep="\t")
+    featureFile = sys.argv[1]
     outName = sys.argv[2]
     metadata = pd.read_csv(sys.argv[3], sep="\t", header=None, index_col=0, dtype=str)
     metadata.index = metadata.index.astype(str)
+    nThreads = int(sys.argv[5])
+
+    if sys.argv[4] == "XGB":
+        fit_xgb(featureFile, outName, metadata, nThreads, nRounds=int(sys.argv[6]), earlyStopping=int(sys.argv[7]),
+                validFraction=float(sys.argv[8]), chunkSize=int(sys.argv[9]))
+        sys.exit(0)
+
+    features = pd.read_csv(featureFile, header=0, index_col=0, sep="\t")
 
     if set(features.columns) != set(metadata.index):
         features = features.filter(items=metadata.index, axis=1)
@@ -30,17 +92,11 @@ if __name__ == "__main__":
 
     model = None
     if sys.argv[4] == "RF":
-        model = RandomForestClassifier(n_estimators=100)
-    elif sys.argv[4] == "XGB":
-        model = XGBClassifier(n_estimators=100)
+        model = RandomForestClassifier(n_estimators=100, n_jobs=nThreads if nThreads > 0 else None)
     else:
         model = TorchLinearModel(n_features=M, n_classes=len(set(y)))
 
-    if sys.argv[4] == "XGB":
-        le = preprocessing.LabelEncoder()
-        le.fit(y)
-        y = le.transform(y)
-    elif sys.argv[4] == "Torch":
+    if sys.argv[4] == "Torch":
         le = preprocessing.LabelEncoder()
         le.fit(y)
         y = le.transform(y)
@@ -49,9 +105,6 @@ if __name__ == "__main__":
 
     if sys.argv[4] == "RF":
         dump(model, outName + ".joblib")
-    elif sys.argv[4] == "XGB":
-        dump(model, outName + ".joblib")
-        dump(le, outName + "_le.joblib")
     elif sys.argv[4] == "Torch":
         torch.save(model, outName + ".joblib")
         dump(le, outName + "_le.joblib")
@@ -5,27 +5,32 @@ import pandas as pd
 from joblib import dump
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.metrics import classification_report
+from metafx_stream import read_samples, read_chunk, predict_stream
+from metafx_forest import fast_predictor
 
 
 if __name__ == "__main__":
-    features = pd.read_csv(sys.argv[1], header=0, index_col=0, sep="\t")
+    featureFile = sys.argv[1]
     outName = sys.argv[2]
     metadata = pd.read_csv(sys.argv[3], sep="\t", header=None, index_col=0, dtype=str)
     metadata.index = metadata.index.astype(str)
+    chunkSize = int(sys.argv[4])
+    nThreads = int(sys.argv[5])
 
-    if set(features.columns) != set(metadata.index):
-        features_train = features.filter(items=metadata.index, axis=1)
-        features_test = features[features.columns.difference(metadata.index)]
+    samples = read_samples(featureFile)
+    train_pos = [i for i, sam in enumerate(samples) if sam in metadata.index]
+    test_pos = [i for i, sam in enumerate(samples) if sam not in metadata.index]
+
+    if len(test_pos) > 0:
         predict = True
-        print("Will use " + str(features_train.shape[1]) + " common samples for model training " +
-              "and " + str(features_test.shape[1]) + " samples to predict new labels")
+        print("Will use " + str(len(train_pos)) + " common samples for model training " +
+              "and " + str(len(test_pos)) + " samples to predict new labels")
     else:
-        features_train = features
         predict = False
         print("Samples from feature table and metadata are the same! Will only train model, nothing to predict")
 
     model = RandomForestClassifier(n_estimators=100)
-    X_train = features_train.T
+    X_train = read_chunk(featureFile, train_pos)
     y_train = [metadata.loc[i, 1] for i in X_train.index]
 
     model.fit(X_train, y_train)
@@ -35,11 +40,6 @@ if __name__ == "__main__":
     print(classification_report(y_train, model.predict(X_train)))
 
     if predict:
-        X_test = features_test.T
-        y_pred = model.predict(X_test)
-
-        outFile = open(outName + ".tsv", "w")
-        for sam, pred in zip(X_test.index, y_pred):
-            print(sam, pred, sep="\t", file=outFile)
-        outFile.close()
+        del X_train
+        predict_stream(fast_predictor(model), featureFile, test_pos, outName, chunkSize, nThreads)
         print("Predicted labels saved to " + outName + ".tsv")
@@ -1,6 +1,7 @@
 #!/usr/bin/env python
 # Utility for extracting contigs from GFA to FASTA
 import sys
+from workdir_storage import open_text
 
 
 if __name__ == "__main__":
@@ -8,7 +9,7 @@ if __name__ == "__main__":
     file = open(wd + "/components.seq.fasta", "w")
     comp = -1
     comp_i = 0
-    for line in open(wd + "/components-graph.gfa"):
+    for line in open_text(wd + "/components-graph.gfa"):
         if line.split()[0] == 'S':
             _, name, seq, *_ = line.strip().split(sep="\t")
             raw_name = name
@@ -15,10 +15,11 @@ def load_cat(cat, wd):
     Returns:
     pd.DataFrame: table of features of shape (n_features, n_samples)
     """
-    all_files = glob.glob(wd + "/features_" + cat + "/vectors/" + "*.breadth")
+    all_files = glob.glob(wd + "/features_" + cat + "/vectors/" + "*.breadth") + \
+        glob.glob(wd + "/features_" + cat + "/vectors/" + "*.breadth.gz")
     df_list = [pd.read_csv(file, header=None, index_col=None) for file in all_files]
     data = pd.concat(df_list, axis=1)
-    data.columns = [file.replace(wd + "/features_" + cat + "/vectors/", "").replace(".breadth", "") for file in all_files]
+    data.columns = [file.replace(wd + "/features_" + cat + "/vectors/", "").replace(".breadth.gz", "").replace(".breadth", "") for file in all_files]
     data.index = [cat + "_" + str(i) for i in data.index]
     print("Found " + str(data.shape[0]) + " features for category " + cat)
     return data
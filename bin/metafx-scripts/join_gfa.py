@@ -1,6 +1,7 @@
 #!/usr/bin/env python
 # Joining several GFA files into one
 import sys
+from workdir_storage import open_text
 
 
 if __name__ == "__main__":
@@ -10,7 +11,7 @@ if __name__ == "__main__":
     m = dict()
     for fin in sys.argv[2:]:
         cat += 1
-        for line in open(fin):
+        for line in open_text(fin):
             if line.split()[0] == 'S':
                 a, b, c, d, e = line.strip().split(sep="\t")
                 m[b] = str(cat) + "_" + b
@@ -0,0 +1,19 @@
+#!/usr/bin/env python
+# Utility for combining feature tables obtained for different k-mer sizes into one table
+import sys
+import pandas as pd
+
+
+if __name__ == "__main__":
+    wd = sys.argv[1]
+    ks = sys.argv[2:]
+
+    subtables = []
+    for k in ks:
+        data = pd.read_csv(wd + "/k" + k + "/feature_table.tsv", header=0, index_col=0, sep="\t")
+        data.index = ["k" + k + "_" + str(i) for i in data.index]
+        print("Found " + str(data.shape[0]) + " features for k = " + k)
+        subtables.append(data)
+
+    feature_table = pd.concat(subtables, axis=0).fillna(0)
+    feature_table.to_csv(wd + "/feature_table.tsv", sep="\t")
@@ -0,0 +1,291 @@
+#!/usr/bin/env python
+# Utility for sharing samples' k-mers between runs via content-addressed cache with LRU eviction
+# -*- coding: UTF-8 -*-
+
+import os
+import sys
+import getopt
+import shutil
+import hashlib
+from parse_samples_categories import get_basename
+from split_resources import parse_mem
+
+
+def read_checksums(cacheDir):
+    """Read memoized checksums of reads files
+
+    Arguments:
+    cacheDir (str): path to cache directory
+
+    Returns:
+    dict: path to reads file -> (size, modification time, hex digest)
+    """
+    memo = dict()
+    memoFile = cacheDir + "/checksums.tsv"
+    if os.path.exists(memoFile):
+        for line in open(memoFile):
+            fields = line.rstrip("\n").split("\t")
+            if len(fields) == 4:
+                memo[fields[0]] = tuple(fields[1:])
+    return memo
+
+
+checksums = dict()
+
+
+def file_checksum(cacheDir, file):
+    """Calculate SHA-1 of file content, memoized in cache by path, size and modification time
+
+    Arguments:
+    cacheDir (str): path to cache directory
+    file (str): path to reads file
+
+    Returns:
+    str: hex digest of file content
+    """
+    if cacheDir not in checksums:
+        checksums[cacheDir] = read_checksums(cacheDir)
+    memo = checksums[cacheDir]
+    path = os.path.realpath(file)
+    st = os.stat(path)
+    stamp = (str(st.st_size), str(st.st_mtime_ns))
+    if path in memo and memo[path][:2] == stamp:
+        return memo[path][2]
+
+    sha = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 24), b""):
+            sha.update(block)
+    memo[path] = stamp + (sha.hexdigest(),)
+    with open(cacheDir + "/checksums.tsv", "a") as out:
+        print(path, *memo[path], sep="\t", file=out)
+    return sha.hexdigest()
+
+
+def prune_checksums(cacheDir, entries):
+    """Rewrite memoized checksums keeping only up-to-date files used by remaining cache entries
+
+    Arguments:
+    cacheDir (str): path to cache directory
+    entries (list): paths to remaining cached k-mers files
+
+    Returns:
+    None
+    """
+    used = set()
+    for entry in entries:
+        digestsFile = entry[:-len(".kmers.bin")] + ".digests"
+        if not os.path.exists(digestsFile):
+            used = None  # entry cached by older version, cannot tell which files it uses
+            break
+        used.update(open(digestsFile).read().split())
+
+    rows = []
+    for path, (size, mtime, digest) in read_checksums(cacheDir).items():
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue
+        if (str(st.st_size), str(st.st_mtime_ns)) != (size, mtime):
+            continue
+        if used is not None and digest not in used:
+            continue
+        rows.append((path, size, mtime, digest))
+
+    tmp = cacheDir + "/checksums.tsv.tmp" + str(os.getpid())
+    with open(tmp, "w") as out:
+        for row in rows:
+            print(*row, sep="\t", file=out)
+    os.replace(tmp, cacheDir + "/checksums.tsv")
+    checksums.pop(cacheDir, None)
+
+
+def group_samples(files):
+    """Group reads files by samples' names as done by k-mer counter
+
+    Arguments:
+    files (list): paths to reads files
+
+    Returns:
+    dict: sample name -> list of reads files
+    """
+    samples = dict()
+    for file in files:
+        samples.setdefault(get_basename(file), []).append(file)
+    return samples
+
+
+def cache_key(cacheDir, files, k, b):
+    """Get cache key of sample's k-mers
+
+    Arguments:
+    cacheDir (str): path to cache directory
+    files (list): paths to sample's reads files
+    k (str): k-mer size
+    b (str): maximal frequency for a k-mer to be assumed erroneous
+
+    Returns:
+    str: key used as name of cached file
+    """
+    sha = hashlib.sha1()
+    for digest in sorted(file_checksum(cacheDir, file) for file in files):
+        sha.update(digest.encode())
+    sha.update(("k=" + k + ";b=" + b).encode())
+    return sha.hexdigest() + "_k" + k + "_b" + b
+
+
+def link_or_copy(src, dst):
+    """Hard-link file (or copy it if cannot be linked), replacing destination atomically
+
+    Arguments:
+    src (str): path to source file
+    dst (str): path to destination file
+
+    Returns:
+    None
+    """
+    tmp = dst + ".tmp" + str(os.getpid())
+    try:
+        os.link(src, tmp)
+    except OSError:
+        shutil.copyfile(src, tmp)
+    os.replace(tmp, dst)
+
+
+def lookup(cacheDir, kmersDir, files, k, b):
+    """Put cached k-mers of samples into k-mers directory
+
+    Arguments:
+    cacheDir (str): path to cache directory
+    kmersDir (str): path to directory with samples' k-mers
+    files (list): paths to reads files
+    k (str): k-mer size
+    b (str): maximal frequency for a k-mer to be assumed erroneous
+
+    Returns:
+    list: reads files of samples not found in cache
+    """
+    missing = []
+    for sample, sampleFiles in group_samples(files).items():
+        cached = cacheDir + "/" + cache_key(cacheDir, sampleFiles, k, b) + ".kmers.bin"
+        if os.path.exists(cached):
+            link_or_copy(cached, kmersDir + "/" + sample + ".kmers.bin")
+            os.utime(cached)
+            print("Found k-mers for sample " + sample + " in cache", file=sys.stderr)
+        else:
+            missing.extend(sampleFiles)
+    return missing
+
+
+def store(cacheDir, kmersDir, files, k, b, maxSize):
+    """Save newly counted k-mers of samples to cache and evict least recently used entries
+
+    Arguments:
+    cacheDir (str): path to cache directory
+    kmersDir (str): path to directory with samples' k-mers
+    files (list): paths to reads files
+    k (str): k-mer size
+    b (str): maximal frequency for a k-mer to be assumed erroneous
+    maxSize (int): maximal size of cached k-mers in megabytes
+
+    Returns:
+    None
+    """
+    for sample, sampleFiles in group_samples(files).items():
+        counted = kmersDir + "/" + sample + ".kmers.bin"
+        key = cache_key(cacheDir, sampleFiles, k, b)
+        cached = cacheDir + "/" + key + ".kmers.bin"
+        if os.path.exists(counted) and not os.path.exists(cached):
+            with open(cacheDir + "/" + key + ".digests", "w") as out:
+                print(*sorted(file_checksum(cacheDir, file) for file in sampleFiles), sep="\n", file=out)
+            link_or_copy(counted, cached)
+            print("Saved k-mers for sample " + sample + " to cache", file=sys.stderr)
+
+    entries = [(os.path.getmtime(f), os.path.getsize(f), f) for f in
+               (cacheDir + "/" + name for name in os.listdir(cacheDir) if name.endswith(".kmers.bin"))]
+    total = sum(size for _, size, _ in entries)
+    evicted = set()
+    for _, size, f in sorted(entries):
+        if total <= maxSize * 1024 * 1024:
+            break
+        os.remove(f)
+        if os.path.exists(f[:-len(".kmers.bin")] + ".digests"):
+            os.remove(f[:-len(".kmers.bin")] + ".digests")
+        evicted.add(f)
+        total -= size
+        print("Evicted " + f + " from cache", file=sys.stderr)
+    prune_checksums(cacheDir, [f for _, _, f in entries if f not in evicted])
+
+
+def check(kmersDir, k, b):
+    """Check that pre-computed k-mers were obtained with the same parameters
+
+    Arguments:
+    kmersDir (str): path to directory with samples' k-mers
+    k (str): k-mer size
+    b (str): maximal frequency for a k-mer to be assumed erroneous
+
+    Returns:
+    bool: False if parameters of k-mers counting differ
+    """
+    propsFile = os.path.dirname(os.path.abspath(kmersDir)) + "/in.properties"
+    if not os.path.exists(propsFile):
+        print("Cannot check parameters of k-mers in " + kmersDir + ": " + propsFile + " not found", file=sys.stderr)
+        return True
+    props = dict()
+    for line in open(propsFile):
+        if "=" in line:
+            key, value = line.split("=", 1)
+            props[key.strip()] = value.strip()
+    ok = True
+    if k and props.get("k", k) != k:
+        print("K-mers in " + kmersDir + " were counted with k = " + props["k"] + ", but k = " + k + " requested", file=sys.stderr)
+        ok = False
+    if props.get("maximal-bad-frequence", b) != b:
+        print("K-mers in " + kmersDir + " were counted with bad frequency " + props["maximal-bad-frequence"] + ", but " + b + " requested", file=sys.stderr)
+        ok = False
+    return ok
+
+
+if __name__ == "__main__":
+    command = sys.argv[1]
+    cacheDir = ''
+    kmersDir = ''
+    k = ''
+    b = '1'
+    maxSize = os.environ.get("METAFX_KMERS_CACHE_SIZE", "100G")
+
+    helpString = 'Usage: kmers_cache.py [lookup|store|check] --kmers-dir <dir> -k <int> [-b <int>] [--cache-dir <dir>] [--max-size <MEM>] [reads files]'
+
+    try:
+        opts, files = getopt.getopt(sys.argv[2:], "hk:b:", ["cache-dir=", "kmers-dir=", "max-size="])
+    except getopt.GetoptError:
+        print(helpString)
+        sys.exit(2)
+    for opt, arg in opts:
+        if opt == "-h":
+            print(helpString)
+            sys.exit()
+        elif opt == "--cache-dir":
+            cacheDir = arg
+        elif opt == "--kmers-dir":
+            kmersDir = arg
+        elif opt == "-k":
+            k = arg
+        elif opt == "-b":
+            b = arg
+        elif opt == "--max-size":
+            maxSize = arg
+
+    if command == "lookup":
+        os.makedirs(cacheDir, exist_ok=True)
+        os.makedirs(kmersDir, exist_ok=True)
+        print(" ".join(lookup(cacheDir, kmersDir, files, k, b)))
+    elif command == "store":
+        os.makedirs(cacheDir, exist_ok=True)
+        store(cacheDir, kmersDir, files, k, b, parse_mem(maxSize))
+    elif command == "check":
+        sys.exit(0 if check(kmersDir, k, b) else 1)
+    else:
+        print(helpString)
+        sys.exit(2)
@@ -0,0 +1,61 @@
+#!/usr/bin/env bash
+# Step 1 of MetaFX modules: counting k-mers of samples, reusing k-mers from shared cache or pre-computed k-mers.
+# Sourced by modules, uses their variables w, k, b, p, kmers, kmersCache, readsCache, SOFT and functions comment, error
+
+# Usage: kmers_step <k-mer counter command with launch options> <reads files>
+# Sets kmersDir to directory with k-mers of all samples
+kmers_step () {
+    if [[ ${kmers} ]]; then
+        kmersDir="${kmers}"
+        mkdir -p ${w}
+        python3 ${SOFT}/kmers_cache.py check --kmers-dir ${kmersDir} -k ${k} -b ${b:-1}
+        if [[ $? -ne 0 ]]; then
+            error "Provided k-mers were counted with different parameters!"
+            exit 1
+        fi
+        comment "Skipping step 1: will use provided k-mers"
+        return 0
+    fi
+
+    kmersDir="$w/kmers/kmers"
+    local readsFiles="$2"
+    if [[ ${kmersCache} ]]; then
+        readsFiles=$(python3 ${SOFT}/kmers_cache.py lookup --cache-dir ${kmersCache} --kmers-dir ${kmersDir} -k ${k} -b ${b:-1} ${readsFiles})
+        if [[ $? -ne 0 ]]; then
+            error "Error during k-mers cache lookup!"
+            exit 1
+        fi
+    fi
+    if [[ -z ${readsFiles// /} ]]; then
+        comment "Skipping step 1: k-mers for all samples found in cache ${kmersCache}"
+        return 0
+    fi
+
+    comment "Running step 1: counting k-mers for samples"
+    local countFiles=${readsFiles}
+    if [[ ${readsCache} ]]; then
+        countFiles=$(python3 ${SOFT}/prepare_reads.py --cache-dir ${readsCache} -t ${p:-0} ${readsFiles})
+        if [[ $? -ne 0 ]]; then
+            error "Error during reads decompression!"
+            exit 1
+        fi
+    fi
+    local cmd1="$1"
+    cmd1+="-t kmer-counter-many "
+    if [[ ${b} ]]; then
+        cmd1+="-b ${b} "
+    fi
+    cmd1+="-i ${countFiles} "
+    cmd1+="-w ${w}/kmers/"
+
+    echo "$cmd1"
+    $cmd1
+    if [[ $? -ne 0 ]]; then
+        error "Error during step 1!"
+        exit 1
+    fi
+    if [[ ${kmersCache} ]]; then
+        python3 ${SOFT}/kmers_cache.py store --cache-dir ${kmersCache} --kmers-dir ${kmersDir} -k ${k} -b ${b:-1} ${readsFiles}
+    fi
+    comment "Step 1 finished successfully!"
+}
@@ -0,0 +1,35 @@
+#!/usr/bin/env python
+# Utility for merging MetaCherchant graphs of all seed sequences of one feature into one GFA file
+import sys
+import os
+import glob
+from workdir_storage import open_text
+
+
+if __name__ == "__main__":
+    outDir = sys.argv[1]
+    feature = sys.argv[2]
+    file = open(sys.argv[3], "w")
+
+    names = dict()  # node name in merged graph for each node sequence
+    links = set()
+    for fin in sorted(glob.glob(outDir + "/" + feature + "_*/graph.gfa")):
+        seedId = os.path.basename(os.path.dirname(fin))[len(feature) + 1:]
+        if not seedId.isdigit():
+            continue
+        m = dict()
+        for line in open_text(fin):
+            if line.split()[0] == 'S':
+                _, name, seq, *tags = line.strip().split(sep="\t")
+                if seq not in names:
+                    names[seq] = seedId + "_" + name
+                    print("S", names[seq], seq, *tags, sep="\t", file=file)
+                m[name] = names[seq]
+        for line in open_text(fin):
+            if line.split()[0] == 'L':
+                a, b, c, d, e, f = line.strip().split(sep="\t")
+                link = (m[b], c, m[d], e, f)
+                if link not in links:
+                    links.add(link)
+                    print(a, *link, sep="\t", file=file)
+    file.close()
@@ -0,0 +1,241 @@
+#!/usr/bin/env python
+# Compiled tree ensembles for fast batch inference
+import sys
+import threading
+import numpy as np
+import pandas as pd
+
+
+class CompiledForest():
+    """Trained scikit-learn tree ensemble (RandomForest, GradientBoosting or AdaBoost classifier)
+    flattened into contiguous arrays of nodes, evaluated for all trees and batch of samples at once"""
+
+    def __init__(self, model, batch_size=256):
+        self.kind = model.__class__.__name__
+        self.classes_ = model.classes_
+        self.feature_names = getattr(model, "feature_names_in_", None)
+        self.batch_size = batch_size
+        n_classes = len(self.classes_)
+
+        if self.kind in ("RandomForestClassifier", "ExtraTreesClassifier"):
+            trees = list(model.estimators_)
+            leaf_values = [self._leaf_proba(tc.tree_, n_classes) for tc in trees]
+            self.init = np.zeros(n_classes)
+            self.scale = len(trees)
+        elif self.kind == "GradientBoostingClassifier":
+            K = model.estimators_.shape[1]
+            trees = list(np.ravel(model.estimators_))
+            leaf_values = []
+            for i, tc in enumerate(trees):
+                value = np.zeros((tc.tree_.node_count, K))
+                value[:, i % K] = model.learning_rate * tc.tree_.value[:, 0, 0]
+                leaf_values.append(value)
+            X0 = np.zeros((1, model.n_features_in_), dtype=np.float32)
+            if self.feature_names is not None:
+                X0 = pd.DataFrame(X0, columns=self.feature_names)
+            self.init = model._raw_predict_init(X0)[0]
+            self.scale = 1
+        elif self.kind == "AdaBoostClassifier":
+            trees = list(model.estimators_)
+            weights = model.estimator_weights_
+            leaf_values = []
+            for tc, w in zip(trees, weights):
+                proba = self._leaf_proba(tc.tree_, n_classes)
+                if getattr(model, "algorithm", "SAMME") == "SAMME.R":
+                    np.clip(proba, np.finfo(proba.dtype).eps, None, out=proba)
+                    log_proba = np.log(proba)
+                    value = (n_classes - 1) * (log_proba - (1.0 / n_classes) * log_proba.sum(axis=1)[:, np.newaxis])
+                else:
+                    onehot = np.arange(n_classes) == np.argmax(proba, axis=1)[:, np.newaxis]
+                    value = np.where(onehot, w, -1 / (n_classes - 1) * w)
+                leaf_values.append(value)
+            self.init = np.zeros(n_classes)
+            self.scale = weights.sum()
+        else:
+            raise ValueError("Class of model " + self.kind + " is not supported. Supported classes: " +
+                             "RandomForestClassifier, GradientBoostingClassifier, AdaBoostClassifier")
+
+        sizes = [tc.tree_.node_count for tc in trees]
+        self.roots = np.concatenate([[0], np.cumsum(sizes)[:-1]]).astype(np.intp)
+        self.feature = np.concatenate([np.maximum(tc.tree_.feature, 0) for tc in trees]).astype(np.intp)
+        self.threshold = np.concatenate([tc.tree_.threshold for tc in trees])
+        # children of node i are stored at 2*i (right) and 2*i + 1 (left),
+        # leaves point to themselves to mark the end of traversal
+        self.children = np.empty(2 * sum(sizes), dtype=np.intp)
+        for tc, offset in zip(trees, self.roots):
+            tree = tc.tree_
+            nodes = np.arange(tree.node_count) + offset
+            is_leaf = tree.children_left == tree.children_right
+            self.children[2 * nodes] = np.where(is_leaf, nodes, tree.children_right + offset)
+            self.children[2 * nodes + 1] = np.where(is_leaf, nodes, tree.children_left + offset)
+        self.value = np.concatenate(leaf_values)
+
+    @staticmethod
+    def _leaf_proba(tree, n_classes):
+        """Normalized class distribution in every node of decision tree
+
+        Arguments:
+        tree (sklearn.tree._tree.Tree): fitted decision tree
+        n_classes (int): number of classes
+
+        Returns:
+        np.array: array of shape (n_nodes, n_classes)
+        """
+        proba = tree.value[:, 0, :n_classes].astype(np.float64)
+        normalizer = proba.sum(axis=1)[:, np.newaxis]
+        normalizer[normalizer == 0.0] = 1.0
+        return proba / normalizer
+
+    def _prepare(self, X):
+        if self.feature_names is not None and isinstance(X, pd.DataFrame):
+            X = X[self.feature_names]
+        return np.asarray(X, dtype=np.float32)
+
+    def apply(self, X):
+        """Find leaves reached by samples in every tree
+
+        Arguments:
+        X (np.array): array of shape (n_samples, n_features) of type float32
+
+        Returns:
+        np.array: array of shape (n_samples, n_trees) with global indices of leaves
+        """
+        n, F = X.shape
+        T = len(self.roots)
+        Xf = X.ravel()
+        leaves = np.empty(n * T, dtype=np.intp)
+        active = np.arange(n * T)
+        cur = np.tile(self.roots, n)
+        base = np.repeat(np.arange(n) * F, T)
+        while active.size > 0:
+            go_left = Xf[base + self.feature[cur]] <= self.threshold[cur]
+            nxt = self.children[2 * cur + go_left]
+            moving = nxt != cur
+            leaves[active[~moving]] = cur[~moving]
+            active, cur, base = active[moving], nxt[moving], base[moving]
+        return leaves.reshape(n, T)
+
+    def raw_predict(self, X):
+        """Sum of trees' values for samples (before ensemble-specific transformation)
+
+        Arguments:
+        X (pd.DataFrame): table of shape (n_samples, n_features)
+
+        Returns:
+        np.array: array of shape (n_samples, n_outputs)
+        """
+        X = self._prepare(X)
+        raw = np.empty((X.shape[0], self.value.shape[1]))
+        for start in range(0, X.shape[0], self.batch_size):
+            leaves = self.apply(X[start:start + self.batch_size])
+            values = np.concatenate([np.broadcast_to(self.init, (leaves.shape[0], 1, len(self.init))),
+                                     self.value[leaves]], axis=1)
+            # sequential accumulation in order of trees reproduces scikit-learn sums exactly
+            raw[start:start + self.batch_size] = np.add.accumulate(values, axis=1)[:, -1]
+        return raw / self.scale if self.scale != 1 else raw
+
+    def predict_proba(self, X):
+        """Predict class probabilities for samples
+
+        Arguments:
+        X (pd.DataFrame): table of shape (n_samples, n_features)
+
+        Returns:
+        np.array: array of shape (n_samples, n_classes)
+        """
+        raw = self.raw_predict(X)
+        n_classes = len(self.classes_)
+        if self.kind == "GradientBoostingClassifier" and raw.shape[1] == 1:
+            p = 1 / (1 + np.exp(-raw[:, 0]))
+            return np.vstack([1 - p, p]).T
+        if self.kind == "AdaBoostClassifier":
+            if n_classes == 2:
+                d = raw[:, 1] - raw[:, 0]
+                raw = np.vstack([-d, d]).T / 2
+            else:
+                raw = raw / (n_classes - 1)
+        if self.kind in ("GradientBoostingClassifier", "AdaBoostClassifier"):
+            raw = np.exp(raw - raw.max(axis=1)[:, np.newaxis])
+            return raw / raw.sum(axis=1)[:, np.newaxis]
+        return raw
+
+    def predict(self, X):
+        """Predict classes for samples
+
+        Arguments:
+        X (pd.DataFrame): table of shape (n_samples, n_features)
+
+        Returns:
+        np.array: predicted labels
+        """
+        raw = self.raw_predict(X)
+        if self.kind == "GradientBoostingClassifier" and raw.shape[1] == 1:
+            return self.classes_.take((raw[:, 0] >= 0).astype(int), axis=0)
+        if self.kind == "AdaBoostClassifier" and raw.shape[1] == 2:
+            return self.classes_.take((-raw[:, 0] + raw[:, 1] > 0).astype(int), axis=0)
+        return self.classes_.take(np.argmax(raw, axis=1), axis=0)
+
+
+def compile_model(model):
+    """Compile model into flat-array representation if it is supported, otherwise keep it as is
+
+    Arguments:
+    model: fitted classification model
+
+    Returns:
+    CompiledForest or original model
+    """
+    try:
+        return CompiledForest(model)
+    except (ValueError, AttributeError):
+        return model
+
+
+def verify_compiled(compiled, model, X):
+    """Check that compiled model gives the same results as original one
+
+    Arguments:
+    compiled (CompiledForest): compiled model
+    model: original fitted model
+    X (pd.DataFrame): table of shape (n_samples, n_features) used for check
+
+    Returns:
+    bool: True if predicted labels are identical and probabilities are equal up to float precision
+    """
+    if compiled is model:
+        return True
+    return (np.array_equal(compiled.predict(X), model.predict(X)) and
+            np.allclose(compiled.predict_proba(X), model.predict_proba(X)))
+
+
+def fast_predictor(model, maxBatch=500, method="predict"):
+    """Build prediction function using compiled model for small batches of samples.
+    Compiled model is checked against original one on the first batch, original model is used
+    for large batches (where scikit-learn per-tree evaluation is faster) and if check fails
+
+    Arguments:
+    model: fitted classification model
+    maxBatch (int): maximal number of samples in batch predicted with compiled model
+    method (str): 'predict' for labels or 'predict_proba' for class probabilities
+
+    Returns:
+    callable: function mapping pd.DataFrame (n_samples, n_features) to predictions
+    """
+    compiled = compile_model(model)
+    if compiled is model:
+        return getattr(model, method)
+    verified = []
+    lock = threading.Lock()
+
+    def predict(X):
+        if len(X) > maxBatch:
+            return getattr(model, method)(X)
+        with lock:
+            if not verified:
+                verified.append(verify_compiled(compiled, model, X[:100]))
+                if not verified[0]:
+                    print("Compiled model differs from original one, will use original model for predictions",
+                          file=sys.stderr)
+        return getattr(compiled if verified[0] else model, method)(X)
+
+    return predict
@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+# Utilities for reading and writing samples' k-mers in binary format of MetaFast
+import os
+import numpy as np
+
+
+# every record is a big-endian pair (k-mer packed into long, frequency)
+KMER_DTYPE = np.dtype([("kmer", ">i8"), ("freq", ">i4")])
+
+
+def hash_kmers(kmers):
+    """Mix bits of packed k-mers (SplitMix64 finalizer) to get uniformly distributed hashes
+
+    Arguments:
+    kmers (np.array): k-mers packed into int64
+
+    Returns:
+    np.array: hashes of type uint64
+    """
+    h = kmers.astype(np.uint64)
+    with np.errstate(over="ignore"):
+        h ^= h >> np.uint64(30)
+        h *= np.uint64(0xbf58476d1ce4e5b9)
+        h ^= h >> np.uint64(27)
+        h *= np.uint64(0x94d049bb133111eb)
+        h ^= h >> np.uint64(31)
+    return h
+
+
+def read_kmers(file, b=0):
+    """Read k-mers with their frequencies from binary file
+
+    Arguments:
+    file (str): path to .kmers.bin file
+    b (int): maximal frequency for a k-mer to be assumed erroneous, such k-mers are skipped
+
+    Returns:
+    tuple: (np.array of k-mers of type int64, np.array of frequencies of type int32)
+    """
+    data = np.fromfile(file, dtype=KMER_DTYPE)
+    if b > 0:
+        data = data[data["freq"] > b]
+    return data["kmer"].astype(np.int64), data["freq"].astype(np.int32)
+
+
+def write_kmers(file, kmers, freqs):
+    """Write k-mers with their frequencies to binary file
+
+    Arguments:
+    file (str): path to .kmers.bin file
+    kmers (np.array): k-mers packed into int64
+    freqs (np.array): frequencies of k-mers
+
+    Returns:
+    None
+    """
+    data = np.empty(len(kmers), dtype=KMER_DTYPE)
+    data["kmer"] = kmers
+    data["freq"] = freqs
+    os.makedirs(os.path.dirname(os.path.abspath(file)), exist_ok=True)
+    data.tofile(file)
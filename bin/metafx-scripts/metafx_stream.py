@@ -0,0 +1,148 @@
+#!/usr/bin/env python
+# Utilities for reading feature table by chunks of samples and streaming predictions
+import os
+import tempfile
+import numpy as np
+import pandas as pd
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+
+def read_samples(featureFile):
+    """Read samples' names from the header of feature table without loading values
+
+    Arguments:
+    featureFile (str): path to feature table in tsv format: rows – features, columns – samples
+
+    Returns:
+    list: names of samples in order of columns
+    """
+    return list(pd.read_csv(featureFile, header=0, index_col=0, sep="\t", nrows=0).columns)
+
+
+def read_chunk(featureFile, positions):
+    """Load values only for selected samples from feature table
+
+    Arguments:
+    featureFile (str): path to feature table in tsv format: rows – features, columns – samples
+    positions (list): positions of samples' columns (0-based, not counting features' names column)
+
+    Returns:
+    pd.DataFrame: table of shape (n_samples, n_features)
+    """
+    usecols = [0] + [pos + 1 for pos in sorted(positions)]
+    data = pd.read_csv(featureFile, header=0, index_col=0, sep="\t", usecols=usecols)
+    return data.T
+
+
+class SampleStore:
+    """Feature table transposed once into temporary binary file of shape (n_samples, n_features),
+    so chunks of samples are sliced from disk instead of parsing the whole table for every chunk"""
+
+    def __init__(self, featureFile, tmpDir, rowsChunk=10000):
+        self.samples = read_samples(featureFile)
+        with open(featureFile) as fin:
+            nFeatures = sum(1 for _ in fin) - 1
+        fd, self.path = tempfile.mkstemp(prefix=".samples_", suffix=".bin", dir=tmpDir)
+        os.close(fd)
+        self.data = np.memmap(self.path, dtype=np.float64, mode="w+", shape=(max(len(self.samples), 1), max(nFeatures, 1)))
+        features = []
+        for block in pd.read_csv(featureFile, header=0, index_col=0, sep="\t", chunksize=rowsChunk):
+            self.data[:len(self.samples), len(features):len(features) + block.shape[0]] = block.values.T
+            features.extend(block.index)
+            indexName = block.index.name
+        self.data.flush()
+        self.features = pd.Index(features, name=indexName if features else None)
+
+    def chunk(self, positions):
+        """Load values for selected samples
+
+        Arguments:
+        positions (list): positions of samples' columns in feature table
+
+        Returns:
+        pd.DataFrame: table of shape (n_samples, n_features)
+        """
+        positions = sorted(positions)
+        return pd.DataFrame(self.data[positions, :len(self.features)], index=[self.samples[pos] for pos in positions],
+                            columns=self.features)
+
+    def close(self):
+        del self.data
+        os.remove(self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def split_chunks(positions, chunkSize):
+    """Split samples' positions into consecutive chunks
+
+    Arguments:
+    positions (list): positions of samples' columns
+    chunkSize (int): maximal number of samples in one chunk (0 – all samples in one chunk)
+
+    Returns:
+    list: list of chunks with positions
+    """
+    positions = sorted(positions)
+    if chunkSize <= 0:
+        chunkSize = max(len(positions), 1)
+    return [positions[i:i + chunkSize] for i in range(0, len(positions), chunkSize)]
+
+
+def predict_stream(predict, featureFile, positions, outName, chunkSize=0, nThreads=1, header=None):
+    """Predict labels for samples chunk by chunk and append them to '<outName>.tsv' as soon as chunk is ready
+
+    Arguments:
+    predict (callable): function mapping pd.DataFrame (n_samples, n_features) to list of labels
+    featureFile (str): path to feature table in tsv format: rows – features, columns – samples
+    positions (list): positions of samples' columns to be predicted
+    outName (str): prefix of output file
+    chunkSize (int): maximal number of samples loaded at once (0 – all samples at once)
+    nThreads (int): number of chunks processed in parallel by workers sharing one loaded model
+    header (str): first line of output file [optional, default: no header]
+
+    Returns:
+    tuple: (list of samples, list of predicted labels) in order of output file
+    """
+    chunks = split_chunks(positions, chunkSize)
+    # table is parsed once: several chunks are sliced from its transposed copy next to output file
+    store = SampleStore(featureFile, os.path.dirname(os.path.abspath(outName))) if len(chunks) > 1 else None
+
+    def process(chunk):
+        X = store.chunk(chunk) if store is not None else read_chunk(featureFile, chunk)
+        return list(X.index), list(predict(X))
+
+    samples, labels = [], []
+    outFile = open(outName + ".tsv", "w")
+    if header is not None:
+        print(header, file=outFile)
+
+    def write(result):
+        chunkSamples, chunkLabels = result
+        for sam, pred in zip(chunkSamples, chunkLabels):
+            print(sam, pred, sep="\t", file=outFile)
+        outFile.flush()
+        samples.extend(chunkSamples)
+        labels.extend(chunkLabels)
+
+    # at most nThreads chunks are loaded at once, results are written in order of chunks
+    nThreads = max(nThreads, 1)
+    pending = deque()
+    try:
+        with ThreadPoolExecutor(max_workers=nThreads) as pool:
+            for chunk in chunks:
+                if len(pending) == nThreads:
+                    write(pending.popleft().result())
+                pending.append(pool.submit(process, chunk))
+            while pending:
+                write(pending.popleft().result())
+    finally:
+        if store is not None:
+            store.close()
+    outFile.close()
+    return samples, labels
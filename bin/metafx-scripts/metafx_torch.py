@@ -22,6 +22,7 @@ class TorchLinearModel():
         self.optimizer = optim.SGD(self.model.parameters(), lr=0.001, momentum=0.9)
 
     def fit(self, X, y):
+        self.feature_names_in_ = np.array(X.columns, dtype=object)
         y_true = np.zeros((X.shape[0], self.n_classes))
         for i, val in enumerate(y):
             y_true[i, val] = 1.
@@ -44,5 +45,10 @@ class TorchLinearModel():
         y_pred = self.model(torch.from_numpy(X.values).float()).cpu().data.numpy()
         return np.argmax(y_pred, axis=1)
 
+    def predict_proba(self, X):
+        with torch.no_grad():
+            y_pred = self.model(torch.from_numpy(X.values).float())
+        return torch.softmax(y_pred, dim=1).cpu().numpy()
+
     def get_model(self):
         return self.model
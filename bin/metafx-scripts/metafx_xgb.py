@@ -0,0 +1,206 @@
+#!/usr/bin/env python
+# Utilities for training XGBoost models on feature table with cached binary DMatrix
+import os
+import sys
+import glob
+import hashlib
+import numpy as np
+import xgboost as xgb
+from xgboost import XGBClassifier
+from metafx_stream import read_samples, read_chunk, split_chunks, SampleStore
+
+
+# number of binary DMatrix files kept in cache directory, older ones are removed
+CACHE_ENTRIES = 2
+
+
+def dmatrix_path(cacheDir, featureFile, samples, y):
+    """Get name of cached binary DMatrix, keyed by table version and labels
+
+    Arguments:
+    cacheDir (str): path to cache directory in working directory
+    featureFile (str): path to feature table in tsv format
+    samples (list): names of training samples
+    y (np.array): encoded labels of samples
+
+    Returns:
+    str: path to binary DMatrix file
+    """
+    st = os.stat(featureFile)
+    sha = hashlib.sha1((os.path.realpath(featureFile) + "\t" + str(st.st_size) + "\t" + str(st.st_mtime_ns)).encode())
+    for sam, label in zip(samples, y):
+        sha.update((sam + "\t" + str(label) + "\n").encode())
+    return cacheDir + "/" + sha.hexdigest()[:16] + ".dmatrix"
+
+
+def process_alive(pid):
+    """Check if process exists, works on Linux and macOS
+
+    Arguments:
+    pid (int): process id
+
+    Returns:
+    bool: False if there is no process with given id
+    """
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True  # process exists, but is owned by another user
+    return True
+
+
+def evict_cache(cacheDir):
+    """Remove all but CACHE_ENTRIES most recently used DMatrix files and pages of finished external-memory runs
+
+    Arguments:
+    cacheDir (str): path to cache directory
+
+    Returns:
+    None
+    """
+    entries = sorted(glob.glob(cacheDir + "/*.dmatrix"), key=os.path.getmtime, reverse=True)
+    for entry in entries[CACHE_ENTRIES:]:
+        os.remove(entry)
+    for page in glob.glob(cacheDir + "/pages_*"):
+        pid = os.path.basename(page).split("_")[1].split(".")[0]
+        if pid.isdigit() and int(pid) != os.getpid() and not process_alive(int(pid)):
+            os.remove(page)
+
+
+class ChunkIter(xgb.DataIter):
+    """Iterator over chunks of samples of feature table for external-memory DMatrix"""
+
+    def __init__(self, store, chunks, labels, cachePrefix):
+        self.store = store
+        self.chunks = chunks
+        self.labels = labels
+        self.it = 0
+        super().__init__(cache_prefix=cachePrefix)
+
+    def next(self, input_data):
+        if self.it == len(self.chunks):
+            return 0
+        X = self.store.chunk(self.chunks[self.it])
+        input_data(data=X.values, label=[self.labels[sam] for sam in X.index], feature_names=list(X.columns))
+        self.it += 1
+        return 1
+
+    def reset(self):
+        self.it = 0
+
+
+def load_dmatrix(featureFile, samples, y, nThreads, cacheDir, chunkSize=0):
+    """Load training samples into DMatrix, reusing binary copy saved in working directory by previous runs.
+    With chunkSize > 0 table is streamed by chunks of samples into external-memory DMatrix instead
+
+    Arguments:
+    featureFile (str): path to feature table in tsv format: rows – features, columns – samples
+    samples (list): names of training samples
+    y (np.array): encoded labels of samples
+    nThreads (int): number of threads
+    cacheDir (str): path to directory with cached DMatrix files and external-memory pages
+    chunkSize (int): number of samples in one chunk for external-memory training (0 – load into RAM)
+
+    Returns:
+    xgb.DMatrix: matrix of shape (n_samples, n_features) in order of samples
+    """
+    positions = dict((sam, pos) for pos, sam in enumerate(read_samples(featureFile)))
+    labels = dict(zip(samples, y))
+    os.makedirs(cacheDir, exist_ok=True)
+    evict_cache(cacheDir)
+    if chunkSize > 0:
+        order = sorted(samples, key=positions.get)
+        if list(order) != list(samples):
+            raise ValueError("Samples for external-memory DMatrix must follow order of feature table")
+        cachePrefix = cacheDir + "/pages_" + str(os.getpid())
+        # table is parsed once into transposed binary copy, chunks of samples are sliced from it
+        with SampleStore(featureFile, cacheDir) as store:
+            it = ChunkIter(store, split_chunks([positions[sam] for sam in samples], chunkSize), labels, cachePrefix)
+            return xgb.DMatrix(it, nthread=nThreads)
+
+    cached = dmatrix_path(cacheDir, featureFile, samples, y)
+    if os.path.exists(cached):
+        print("Using cached training matrix " + cached)
+        os.utime(cached)
+        return xgb.DMatrix(cached, nthread=nThreads)
+    X = read_chunk(featureFile, [positions[sam] for sam in samples]).loc[samples]
+    data = xgb.DMatrix(X.values, label=y, feature_names=list(X.columns), nthread=nThreads)
+    try:
+        data.save_binary(cached + ".tmp" + str(os.getpid()))
+        os.replace(cached + ".tmp" + str(os.getpid()), cached)
+        evict_cache(cacheDir)
+    except OSError:
+        print("Cannot save training matrix to " + cached + ", it will not be reused", file=sys.stderr)
+    return data
+
+
+def xgb_params(nClasses, nThreads):
+    """Training parameters of XGBoost with histogram tree construction
+
+    Arguments:
+    nClasses (int): number of classes
+    nThreads (int): number of threads (0 – all cores)
+
+    Returns:
+    dict: booster parameters
+    """
+    params = {"tree_method": "hist", "nthread": nThreads if nThreads > 0 else os.cpu_count()}
+    if nClasses > 2:
+        params.update({"objective": "multi:softprob", "num_class": nClasses, "eval_metric": "mlogloss"})
+    else:
+        params.update({"objective": "binary:logistic", "eval_metric": "logloss"})
+    return params
+
+
+def train_booster(params, dtrain, nRounds, dvalid=None, earlyStopping=0):
+    """Train booster, optionally stopping when loss on held-out samples does not improve
+
+    Arguments:
+    params (dict): booster parameters
+    dtrain (xgb.DMatrix): training samples
+    nRounds (int): maximal number of boosting rounds
+    dvalid (xgb.DMatrix): held-out samples for early stopping
+    earlyStopping (int): number of rounds without improvement before stopping (0 – no early stopping)
+
+    Returns:
+    xgb.Booster: trained booster truncated to the best iteration
+    """
+    if dvalid is None or earlyStopping <= 0:
+        return xgb.train(params, dtrain, num_boost_round=nRounds)
+    booster = xgb.train(params, dtrain, num_boost_round=nRounds, evals=[(dvalid, "valid")],
+                        early_stopping_rounds=earlyStopping, verbose_eval=False)
+    print("Early stopping: best iteration " + str(booster.best_iteration + 1) + " of " + str(nRounds) +
+          ", held-out " + params["eval_metric"] + " = " + str(round(booster.best_score, 4)))
+    return booster[:booster.best_iteration + 1]
+
+
+def predict_labels(booster, data):
+    """Predict encoded labels with trained booster
+
+    Arguments:
+    booster (xgb.Booster): trained booster
+    data (xgb.DMatrix): samples
+
+    Returns:
+    np.array: encoded labels
+    """
+    proba = booster.predict(data)
+    if proba.ndim == 1:
+        return (proba > 0.5).astype(int)
+    return np.argmax(proba, axis=1)
+
+
+def to_classifier(booster):
+    """Wrap trained booster into scikit-learn compatible classifier used by predict module
+
+    Arguments:
+    booster (xgb.Booster): trained booster
+
+    Returns:
+    XGBClassifier: classifier with the same trees
+    """
+    model = XGBClassifier()
+    model.load_model(bytearray(booster.save_raw(raw_format="json")))
+    return model
@@ -0,0 +1,212 @@
+#!/usr/bin/env python
+# Utility for planning memory and threads of every pipeline step based on sizes of input data
+import os
+import sys
+import glob
+import getopt
+import pandas as pd
+from parse_samples_categories import get_basename
+from split_resources import parse_mem, format_mem, available_mem, available_cpus
+
+
+# expected ratio of decompressed to compressed size of reads files
+EXPANSION = {".gz": 4.0, ".bz2": 5.0}
+# bytes of k-mer counter hash table per nucleotide of reads
+COUNTER_BYTES_PER_BASE = 2.5
+# bytes of k-mers file per nucleotide of reads (after removal of erroneous k-mers)
+KMERS_BYTES_PER_BASE = 0.5
+# in-memory size of k-mers relative to binary file (hash tables of long k-mers and int counts)
+KMERS_MEM_RATIO = 2.5
+# memory used by JVM and tool itself regardless of input, in megabytes
+BASE_MEM = 512
+MIN_MEM = 1024
+
+# steps of pipelines: (tool name, which k-mers are loaded at once)
+STEPS = {
+    "unique": [("kmer-counter-many", "reads"), ("unique-kmers-multi", "all"), ("component-extractor", "category"),
+               ("features-calculator", "sample"), ("comp2graph", "none")],
+    "stats": [("kmer-counter-many", "reads"), ("stats-kmers", "all"), ("component-extractor", "category"),
+              ("features-calculator", "sample"), ("comp2graph", "none")],
+    "chisq": [("kmer-counter-many", "reads"), ("top-stats-kmers", "all"), ("component-extractor", "category"),
+              ("features-calculator", "sample"), ("comp2graph", "none")],
+    "colored": [("kmer-counter-many", "reads"), ("kmers-color", "all"), ("component-colored", "all"),
+                ("features-calculator", "sample"), ("comp2graph", "none")],
+    "calc_features": [("kmer-counter-many", "reads"), ("features-calculator", "sample")],
+}
+
+
+def reads_bases(file):
+    """Estimate number of nucleotides in reads file from its size
+
+    Arguments:
+    file (str): path to reads file in FASTQ or FASTA format, possibly compressed
+
+    Returns:
+    float: approximate number of nucleotides
+    """
+    name, ext = os.path.splitext(file)
+    size = os.path.getsize(file) * EXPANSION.get(ext, 1.0)
+    if ext not in EXPANSION:
+        name = file
+    if os.path.splitext(name)[1].lower() in (".fq", ".fastq"):
+        return size / 2  # qualities take the same space as nucleotides
+    return size
+
+
+def samples_sizes(readsFiles, kmersDir):
+    """Collect sizes of samples: nucleotides in reads and bytes of k-mers files
+
+    Arguments:
+    readsFiles (list): paths to reads files
+    kmersDir (str): directory with pre-computed k-mers, empty string if not available
+
+    Returns:
+    tuple: (dict sample -> number of nucleotides, dict sample -> bytes of k-mers file, bool k-mers sizes are estimated)
+    """
+    bases = dict()
+    for file in readsFiles:
+        if os.path.exists(file):
+            sam = get_basename(file)
+            bases[sam] = bases.get(sam, 0) + reads_bases(file)
+
+    kmers = dict()
+    if kmersDir != '':
+        for file in glob.glob(kmersDir + "/*.kmers.bin"):
+            kmers[os.path.basename(file)[:-len(".kmers.bin")]] = os.path.getsize(file)
+    estimated = len(kmers) == 0
+    if estimated:
+        kmers = dict((sam, n * KMERS_BYTES_PER_BASE) for sam, n in bases.items())
+    return bases, kmers, estimated
+
+
+def step_memory(load, bases, kmers, categories, parallel=1):
+    """Estimate memory needed for one step
+
+    Arguments:
+    load (str): which data is loaded at once: reads, all, category, sample or none
+    bases (dict): sample -> number of nucleotides in reads
+    kmers (dict): sample -> bytes of k-mers file
+    categories (dict): category -> set of samples
+    parallel (int): number of samples processed at once by per-sample step
+
+    Returns:
+    int: memory in megabytes
+    """
+    if load == "reads":
+        need = COUNTER_BYTES_PER_BASE * max(bases.values(), default=0)
+    elif load == "all":
+        need = KMERS_MEM_RATIO * sum(kmers.values())
+    elif load == "category":
+        need = KMERS_MEM_RATIO * max((sum(kmers.get(sam, 0) for sam in samples) for samples in categories.values()), default=0)
+    elif load == "sample":
+        need = KMERS_MEM_RATIO * parallel * max(kmers.values(), default=0)
+    else:
+        need = 0
+    return max(int(need / 2 ** 20) + BASE_MEM, MIN_MEM)
+
+
+def make_plan(pipeline, bases, kmers, categories, mem, threads, skipCounting):
+    """Assign memory and threads to every step of pipeline within total budget. Per-sample steps process one sample
+    per thread, so their threads are limited by number of samples and by memory needed for samples loaded at once.
+    Other steps load their data once and get all threads
+
+    Arguments:
+    pipeline (str): name of pipeline
+    bases (dict): sample -> number of nucleotides in reads
+    kmers (dict): sample -> bytes of k-mers file
+    categories (dict): category -> set of samples
+    mem (int): memory budget in megabytes
+    threads (int): threads budget
+    skipCounting (bool): k-mers are already counted
+
+    Returns:
+    list: (step, tool, memory in megabytes, threads, estimated memory in megabytes) for every step
+    """
+    plan = []
+    for step, (tool, load) in enumerate(STEPS[pipeline], 1):
+        if load == "reads" and skipCounting:
+            continue
+        stepThreads = threads
+        if load == "sample":
+            stepThreads = max(min(threads, len(kmers)), 1)
+            while stepThreads > 1 and step_memory(load, bases, kmers, categories, stepThreads) > mem:
+                stepThreads -= 1
+        need = step_memory(load, bases, kmers, categories, stepThreads)
+        stepMem = min(-(-need // 256) * 256, mem)  # rounded up to 256M
+        plan.append((step, tool, stepMem, stepThreads, need))
+    return plan
+
+
+if __name__ == "__main__":
+    pipeline = ''
+    readsFile = ''
+    readsFiles = []
+    kmersDir = ''
+    categoriesFile = ''
+    outFile = ''
+    mem = ''
+    threads = ''
+
+    helpString = 'Usage: plan_resources.py --pipeline <name> [--reads-file <file> | --categories <file> <reads files>] [--kmers-dir <dir>] [-m <MEM>] [-t <int>] [--out <file>]'
+
+    try:
+        opts, args = getopt.getopt(sys.argv[1:], "hm:t:", ["pipeline=", "reads-file=", "kmers-dir=", "categories=", "out="])
+    except getopt.GetoptError:
+        print(helpString)
+        sys.exit(2)
+    for opt, arg in opts:
+        if opt == "-h":
+            print(helpString)
+            sys.exit()
+        elif opt == "--pipeline":
+            pipeline = arg
+        elif opt == "--reads-file":
+            readsFile = arg
+        elif opt == "--kmers-dir":
+            kmersDir = arg
+        elif opt == "--categories":
+            categoriesFile = arg
+        elif opt == "--out":
+            outFile = arg
+        elif opt == "-m":
+            mem = arg
+        elif opt == "-t":
+            threads = arg
+    if pipeline not in STEPS:
+        print("Unknown pipeline '" + pipeline + "'. Select one of: " + ", ".join(STEPS), file=sys.stderr)
+        sys.exit(1)
+
+    categories = dict()
+    readsFiles = args
+    if readsFile != '':
+        data = pd.read_csv(readsFile, sep="\t", header=None, index_col=None, dtype=str)
+        readsFiles = list(data.iloc[:, 0])
+        for file, cat in zip(data.iloc[:, 0], data.iloc[:, 1]):
+            categories.setdefault(cat, set()).add(get_basename(file))
+    elif categoriesFile != '':
+        # features are calculated for new samples, categories only define number of runs
+        for line in open(categoriesFile):
+            categories[line.split("\t")[0]] = set()
+
+    bases, kmers, estimated = samples_sizes(readsFiles, kmersDir)
+    if len(kmers) == 0:
+        print("Cannot find input reads or k-mers files to plan resources", file=sys.stderr)
+        sys.exit(1)
+
+    totalMem = parse_mem(mem) if mem else int(available_mem() * 0.9)
+    totalThreads = int(threads) if threads else available_cpus()
+    plan = make_plan(pipeline, bases, kmers, categories, totalMem, totalThreads, kmersDir != '')
+
+    print("Resources plan for " + pipeline + " pipeline: " + str(len(kmers)) + " samples, " + str(len(categories)) +
+          " categories, " + str(round(sum(kmers.values()) / 2 ** 30, 2)) + " GB of k-mers" +
+          (" (estimated from reads)" if estimated else "") + ", budget " + format_mem(totalMem) + " / " +
+          str(totalThreads) + " threads")
+    print("step\ttool\tmemory\tthreads")
+    for step, tool, stepMem, stepThreads, need in plan:
+        print(str(step) + "\t" + tool + "\t" + format_mem(stepMem) + "\t" + str(stepThreads) +
+              ("\t(estimated need " + format_mem(need) + " exceeds budget)" if need > stepMem else ""))
+
+    if outFile != '':
+        with open(outFile, "w") as fout:
+            for step, tool, stepMem, stepThreads, need in plan:
+                print(str(step) + "\t" + format_mem(stepMem) + "\t" + str(stepThreads), file=fout)
@@ -1,47 +1,176 @@
 #!/usr/bin/env python
-# Utility for predicting labels based on pre-trained RF model
+# Utility for predicting labels based on one or several pre-trained models
+import os
 import sys
+import getopt
+import zipfile
+import threading
+import numpy as np
 import pandas as pd
 from joblib import load
 from sklearn.metrics import classification_report
-import torch
+from concurrent.futures import ThreadPoolExecutor
+from metafx_stream import read_samples, predict_stream
+from metafx_forest import fast_predictor
+
+
+class LoadedModel():
+    """Pre-trained classification model with its label encoder and names of features it was trained on"""
+
+    def __init__(self, modelFile, estimator="auto"):
+        if estimator == "auto" and zipfile.is_zipfile(modelFile):
+            estimator = "Torch"
+        if estimator == "Torch":
+            import torch
+            self.model = torch.load(modelFile)
+        else:
+            self.model = load(modelFile)
+            if estimator == "auto":
+                estimator = "XGB" if self.model.__class__.__name__ == "XGBClassifier" else "RF"
+        self.estimator = estimator
+        self.name = os.path.basename(modelFile)[:-len(".joblib")] if modelFile.endswith(".joblib") else os.path.basename(modelFile)
+
+        self.le = None
+        if estimator in ("XGB", "Torch"):
+            self.le = load(modelFile[:-7] + "_le.joblib")
+        self.classes = self.le.classes_ if self.le is not None else self.model.classes_
+
+        if estimator == "XGB":
+            self.features = self.model.get_booster().feature_names
+            self.n_features = self.model.n_features_in_
+        elif estimator == "Torch":
+            self.features = getattr(self.model, "feature_names_in_", None)
+            self.n_features = self.model.n_features
+        else:
+            self.features = getattr(self.model, "feature_names_in_", None)
+            self.n_features = self.model.n_features_in_
+        self.missingReported = False
+
+        if estimator == "RF":
+            self._predict = fast_predictor(self.model)
+            self._predict_proba = fast_predictor(self.model, method="predict_proba")
+        else:
+            self._predict = self.model.predict
+            self._predict_proba = self.model.predict_proba
+
+    def align(self, X):
+        """Reorder features of table as in training data of model, absent features are set to 0
+
+        Arguments:
+        X (pd.DataFrame): table of shape (n_samples, n_features)
+
+        Returns:
+        pd.DataFrame: table of shape (n_samples, n_model_features)
+        """
+        if self.features is None:
+            if X.shape[1] != self.n_features:
+                raise ValueError("Model " + self.name + " expects " + str(self.n_features) + " features, " +
+                                 "but feature table has " + str(X.shape[1]) + " and model has no features' names to align them")
+            return X
+        if not self.missingReported:
+            self.missingReported = True
+            missing = len(set(self.features) - set(X.columns))
+            if missing > 0:
+                print("Feature table lacks " + str(missing) + " of " + str(len(self.features)) + " features used by model " +
+                      self.name + ", they are set to 0", file=sys.stderr)
+        return X.reindex(columns=list(self.features), fill_value=0)
+
+    def predict(self, X):
+        y_pred = self._predict(self.align(X))
+        if self.le is not None:
+            y_pred = self.le.inverse_transform(y_pred)
+        return y_pred
+
+    def predict_proba(self, X):
+        return self._predict_proba(self.align(X))
 
 
 if __name__ == "__main__":
-    features = pd.read_csv(sys.argv[1], header=0, index_col=0, sep="\t")
-    outName = sys.argv[2]
-    model_type = sys.argv[4]
-
-    model = None
-    if model_type == "RF":
-        model = load(sys.argv[3])
-    elif model_type == "XGB":
-        model = load(sys.argv[3])
-        le = load(sys.argv[3][:-7] + "_le.joblib")
-    elif model_type == "Torch":
-        model = torch.load(sys.argv[3])
-        le = load(sys.argv[3][:-7] + "_le.joblib")
+    featureFile = ''
+    outName = ''
+    modelFiles = []
+    estimator = "auto"
+    chunkSize = 0
+    nThreads = 1
+    metadataFile = ''
+
+    helpString = 'Usage: predict.py --table <file> --out <prefix> --model <file> [--model <file> ...] [-e RF|XGB|Torch|auto] [--chunk-size <int>] [-t <int>] [--metadata <file>]'
+
+    try:
+        opts, args = getopt.getopt(sys.argv[1:], "he:t:", ["table=", "out=", "model=", "chunk-size=", "metadata="])
+    except getopt.GetoptError:
+        print(helpString)
+        sys.exit(2)
+    for opt, arg in opts:
+        if opt == "-h":
+            print(helpString)
+            sys.exit()
+        elif opt == "--table":
+            featureFile = arg
+        elif opt == "--out":
+            outName = arg
+        elif opt == "--model":
+            modelFiles.append(arg)
+        elif opt == "-e":
+            estimator = arg
+        elif opt == "--chunk-size":
+            chunkSize = int(arg)
+        elif opt == "-t":
+            nThreads = int(arg)
+        elif opt == "--metadata":
+            metadataFile = arg
+
+    models = []
+    names = set()
+    for modelFile in modelFiles:
+        model = LoadedModel(modelFile, estimator)
+        if model.name in names:
+            model.name += "_" + str(len(models))
+        names.add(model.name)
+        models.append(model)
+        print("Loaded " + model.estimator + " model " + model.name + " from " + modelFile)
 
     metadata = None
-    if len(sys.argv) == 6:
-        metadata = pd.read_csv(sys.argv[5], sep="\t", header=None, index_col=0, dtype=str)
+    if metadataFile != '':
+        metadata = pd.read_csv(metadataFile, sep="\t", header=None, index_col=0, dtype=str)
         metadata.index = metadata.index.astype(str)
 
-    M = features.shape[0]  # features count
-    N = features.shape[1]  # samples  count
-
-    X = features.T
-    y_pred = model.predict(X)
+    N = len(read_samples(featureFile))  # samples count
+    if len(models) == 1:
+        samples, y_pred = predict_stream(models[0].predict, featureFile, range(N), outName, chunkSize, nThreads)
+        predicted = {models[0].name: dict(zip(samples, y_pred))}
+    else:
+        # every chunk of the table is loaded once and scored by all models concurrently,
+        # output row: <label> <class probabilities> for every model
+        predicted = {model.name: dict() for model in models}
+        lock = threading.Lock()
+        pool = ThreadPoolExecutor(max_workers=len(models))
 
-    if model_type == "XGB" or model_type == "Torch":
-        y_pred = le.inverse_transform(y_pred)
+        def predict_all(X):
+            probas = list(pool.map(lambda model: model.predict_proba(X), models))
+            rows = [[] for _ in range(X.shape[0])]
+            for model, proba in zip(models, probas):
+                labels = np.asarray(model.classes).take(np.argmax(proba, axis=1))
+                with lock:
+                    predicted[model.name].update(zip(X.index, labels))
+                for row, label, p in zip(rows, labels, proba):
+                    row.append(str(label))
+                    row.extend("{:.4f}".format(v) for v in p)
+            return ["\t".join(row) for row in rows]
 
-    outFile = open(outName + ".tsv", "w")
-    for sam, pred in zip(X.index, y_pred):
-        print(sam, pred, sep="\t", file=outFile)
-    outFile.close()
+        header = ["sample"]
+        for model in models:
+            header.append(model.name)
+            header.extend(model.name + ":" + str(cls) for cls in model.classes)
+        predict_stream(predict_all, featureFile, range(N), outName, chunkSize, nThreads, header="\t".join(header))
+        pool.shutdown()
 
     if metadata is not None:
-        y = [metadata.loc[i, 1] for i in X.index]
-        print("Predictions accuracy compared with given labels:")
-        print(classification_report(y, y_pred, zero_division=0))
+        for name, labels in predicted.items():
+            samples = [sam for sam in labels if sam in metadata.index]
+            y = [metadata.loc[sam, 1] for sam in samples]
+            if len(models) == 1:
+                print("Predictions accuracy compared with given labels:")
+            else:
+                print("Predictions accuracy of model " + name + " compared with given labels:")
+            print(classification_report(y, [labels[sam] for sam in samples], zero_division=0))
@@ -0,0 +1,257 @@
+#!/usr/bin/env python
+# Utility for decompressing reads files once into local cache to be shared by several k-mer counting runs
+# -*- coding: UTF-8 -*-
+
+import os
+import re
+import sys
+import bz2
+import gzip
+import time
+import getopt
+import shutil
+import hashlib
+import subprocess
+import pandas as pd
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+
+OPENERS = {".gz": gzip.open, ".bz2": bz2.open}
+# parallel decompressors: name -> arguments before file name (threads count is substituted)
+TOOLS = {".gz": [("pigz", ["-dc", "-p", "{}"])],
+         ".bz2": [("lbzip2", ["-dc", "-n", "{}"]), ("pbzip2", ["-dc", "-p{}"])]}
+# header of bzip2 stream followed by magic of its first block
+BZ2_STREAM = re.compile(rb"BZh[1-9]1AY&SY")
+BZ2_STREAM_LEN = 10
+# minimal size of compressed segment decoded by one thread, streams larger than MAX are decoded sequentially
+BZ2_SEGMENT = 1 << 22
+BZ2_MAX_SEGMENT = 1 << 28
+
+
+def cached_path(cacheDir, file):
+    """Get path of decompressed copy of reads file in cache. Copies are kept in subdirectories named by hash
+    of source path, so files with equal names do not collide, while original name is kept for sample detection
+
+    Arguments:
+    cacheDir (str): path to cache directory
+    file (str): path to reads file
+
+    Returns:
+    str: path to decompressed file (the same path for uncompressed files)
+    """
+    name, ext = os.path.splitext(os.path.basename(file))
+    if ext not in OPENERS:
+        return file
+    return cacheDir + "/" + hashlib.sha1(os.path.realpath(file).encode()).hexdigest()[:16] + "/" + name
+
+
+def source_stamp(file):
+    """Get identity of reads file used to check that its decompressed copy is up to date
+
+    Arguments:
+    file (str): path to reads file
+
+    Returns:
+    str: real path, size and modification time of file
+    """
+    st = os.stat(file)
+    return os.path.realpath(file) + "\t" + str(st.st_size) + "\t" + str(st.st_mtime_ns)
+
+
+def bz2_streams(fin, blockSize=1 << 26):
+    """Find offsets of concatenated bzip2 streams (as written by pbzip2 or by 'cat' of compressed files) without decoding.
+    Compressed blocks inside one stream are not byte-aligned, so single-stream file is never split
+
+    Arguments:
+    fin (file): compressed file opened in binary mode
+    blockSize (int): number of bytes read at once
+
+    Returns:
+    list: start offsets of streams, the first one is 0
+    """
+    starts = [0]
+    offset = 0
+    tail = b""
+    while True:
+        data = fin.read(blockSize)
+        if not data:
+            return starts
+        buf = tail + data
+        for m in BZ2_STREAM.finditer(buf):
+            start = offset - len(tail) + m.start()
+            if start > starts[-1]:
+                starts.append(start)
+        tail = buf[-(BZ2_STREAM_LEN - 1):]
+        offset += len(data)
+
+
+def decompress_bz2_parallel(file, fout, starts, nThreads):
+    """Decompress independent bzip2 streams of file in parallel, writing them in original order.
+    Small streams are grouped into segments, at most 2 * nThreads segments are held in memory at once
+
+    Arguments:
+    file (str): path to compressed file
+    fout (file): output file opened in binary mode
+    starts (list): start offsets of streams
+    nThreads (int): number of threads
+
+    Returns:
+    None
+    """
+    bounds = [0]
+    for start in starts[1:] + [os.path.getsize(file)]:
+        if start - bounds[-1] >= BZ2_SEGMENT or start == os.path.getsize(file):
+            bounds.append(start)
+    pending = deque()
+    with open(file, "rb") as fin, ThreadPoolExecutor(max_workers=nThreads) as pool:
+        for a, b in zip(bounds[:-1], bounds[1:]):
+            if len(pending) == 2 * nThreads:
+                fout.write(pending.popleft().result())
+            fin.seek(a)
+            pending.append(pool.submit(bz2.decompress, fin.read(b - a)))
+        while pending:
+            fout.write(pending.popleft().result())
+
+
+def decompress(file, target, nThreads=1):
+    """Decompress reads file unless its decompressed copy was made from file with the same path, size and modification time.
+    External parallel decompressors (pigz, lbzip2, pbzip2) are used if installed. Without them only
+    multi-stream bzip2 files (e.g. written by pbzip2) are decoded in parallel, other files are streamed in one thread
+
+    Arguments:
+    file (str): path to compressed reads file
+    target (str): path to decompressed copy
+    nThreads (int): number of threads used for one file
+
+    Returns:
+    str: name of used decompressor, empty string if copy from cache was used
+    """
+    stamp = source_stamp(file)
+    stampFile = target + ".source"
+    if os.path.exists(target) and os.path.exists(stampFile) and open(stampFile).read() == stamp:
+        return ""
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    ext = os.path.splitext(file)[1]
+    tmp = target + ".tmp" + str(os.getpid())
+    used = ""
+    with open(tmp, "wb") as fout:
+        for tool, args in TOOLS[ext]:
+            path = shutil.which(tool)
+            if path is not None:
+                cmd = [path] + [arg.format(nThreads) for arg in args] + [file]
+                if subprocess.run(cmd, stdout=fout).returncode == 0:
+                    used = tool
+                    break
+                fout.seek(0)
+                fout.truncate()
+        if used == "" and ext == ".bz2" and nThreads > 1:
+            with open(file, "rb") as fin:
+                starts = bz2_streams(fin)
+            largest = max(b - a for a, b in zip(starts, starts[1:] + [os.path.getsize(file)]))
+            if len(starts) > 1 and largest <= BZ2_MAX_SEGMENT:
+                try:
+                    decompress_bz2_parallel(file, fout, starts, nThreads)
+                    used = "python-bz2-streams"
+                except (OSError, EOFError, ValueError):
+                    # false stream boundary inside compressed data, decode sequentially
+                    fout.seek(0)
+                    fout.truncate()
+        if used == "":
+            with OPENERS[ext](file, "rb") as fin:
+                shutil.copyfileobj(fin, fout, 1 << 24)
+            used = "python-" + ext[1:]
+    os.replace(tmp, target)
+    with open(stampFile + ".tmp" + str(os.getpid()), "w") as out:
+        out.write(stamp)
+    os.replace(stampFile + ".tmp" + str(os.getpid()), stampFile)
+    return used
+
+
+def prepare(files, cacheDir, nThreads):
+    """Decompress all compressed reads files into cache, splitting threads between files
+
+    Arguments:
+    files (list): paths to reads files
+    cacheDir (str): path to cache directory
+    nThreads (int): total number of threads
+
+    Returns:
+    dict: original path -> path to be passed to downstream tools
+    """
+    os.makedirs(cacheDir, exist_ok=True)
+    targets = {file: cached_path(cacheDir, file) for file in files}
+    # several paths to the same file are decompressed once
+    compressed = list({target: file for file, target in targets.items() if target != file}.values())
+    if not compressed:
+        return targets
+    nJobs = min(len(compressed), nThreads)
+    perFile = max(nThreads // nJobs, 1)
+
+    def process(file):
+        start = time.time()
+        used = decompress(file, targets[file], perFile)
+        return used, time.time() - start
+
+    start = time.time()
+    totalIn = totalOut = 0
+    with ThreadPoolExecutor(max_workers=nJobs) as pool:
+        for file, (used, elapsed) in zip(compressed, pool.map(process, compressed)):
+            if used == "":
+                print("Found in cache " + file, file=sys.stderr)
+                continue
+            sizeIn = os.path.getsize(file) / 2 ** 20
+            sizeOut = os.path.getsize(targets[file]) / 2 ** 20
+            totalIn += sizeIn
+            totalOut += sizeOut
+            print("Decompressed " + file + " via " + used + ": " + str(round(sizeIn, 1)) + " MB -> " +
+                  str(round(sizeOut, 1)) + " MB, " + str(round(sizeOut / max(elapsed, 1e-3), 1)) + " MB/s", file=sys.stderr)
+    if totalOut > 0:
+        elapsed = time.time() - start
+        print("Decompression throughput: " + str(round(totalOut / max(elapsed, 1e-3), 1)) + " MB/s of reads (" +
+              str(round(totalIn / max(elapsed, 1e-3), 1)) + " MB/s of compressed input) in " +
+              str(round(elapsed, 1)) + " seconds", file=sys.stderr)
+    return targets
+
+
+if __name__ == "__main__":
+    cacheDir = ''
+    readsFile = ''
+    outFile = ''
+    nThreads = 0
+
+    helpString = 'Usage: prepare_reads.py --cache-dir <dir> [-t <int>] [--reads-file <file> --out <file>] [reads files]'
+
+    try:
+        opts, files = getopt.getopt(sys.argv[1:], "ht:", ["cache-dir=", "reads-file=", "out="])
+    except getopt.GetoptError:
+        print(helpString)
+        sys.exit(2)
+    for opt, arg in opts:
+        if opt == "-h":
+            print(helpString)
+            sys.exit()
+        elif opt == "--cache-dir":
+            cacheDir = arg
+        elif opt == "--reads-file":
+            readsFile = arg
+        elif opt == "--out":
+            outFile = arg
+        elif opt == "-t":
+            nThreads = int(arg)
+    if nThreads <= 0:
+        nThreads = os.cpu_count()
+
+    try:
+        if readsFile != '':
+            # tab-separated file <path_to_file>\t<category> is rewritten with paths to decompressed copies
+            data = pd.read_csv(readsFile, sep="\t", header=None, index_col=None, dtype=str)
+            targets = prepare(list(data.iloc[:, 0].unique()), cacheDir, nThreads)
+            data.iloc[:, 0] = [targets[file] for file in data.iloc[:, 0]]
+            data.to_csv(outFile, sep="\t", header=False, index=False)
+        else:
+            targets = prepare(files, cacheDir, nThreads)
+            print(" ".join(targets[file] for file in files))
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        sys.exit(1)
@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+# Utility for predicting labels of samples from features of subsampled reads and checking stability of predictions
+# -*- coding: UTF-8 -*-
+
+import sys
+import getopt
+import numpy as np
+import pandas as pd
+from predict import LoadedModel
+
+
+def scale_breadth(data, fractions):
+    """Extrapolate breadth of components' coverage from subsample to full read set.
+    If k-mers are present in reads independently (Poisson coverage), k-mer missing from fraction f of reads
+    with probability (1 - b_sub) is missing from all reads with probability (1 - b_sub)^(1/f)
+
+    Arguments:
+    data (pd.DataFrame): feature table of subsample: rows – features, columns – samples
+    fractions (pd.Series): fraction of reads of every sample in subsample
+
+    Returns:
+    pd.DataFrame: feature table with breadth values expected at full depth
+    """
+    f = fractions.reindex(data.columns).fillna(1.0).clip(lower=1e-9, upper=1.0).values
+    missing = np.clip(1.0 - data.values, 0.0, 1.0)
+    return pd.DataFrame(1.0 - np.power(missing, 1.0 / f), index=data.index, columns=data.columns)
+
+
+if __name__ == "__main__":
+    workDir = ''
+    modelFile = ''
+    estimator = 'auto'
+
+    helpString = 'Usage: screen_predict.py -w <dir> --model <file> [-e RF|XGB|Torch|auto] <subsample sizes>'
+
+    try:
+        opts, sizes = getopt.getopt(sys.argv[1:], "hw:e:", ["model="])
+    except getopt.GetoptError:
+        print(helpString)
+        sys.exit(2)
+    for opt, arg in opts:
+        if opt == "-h":
+            print(helpString)
+            sys.exit()
+        elif opt == "-w":
+            workDir = arg
+        elif opt == "--model":
+            modelFile = arg
+        elif opt == "-e":
+            estimator = arg
+    sizes = sorted(sizes, key=int)
+
+    model = LoadedModel(modelFile, estimator)
+    labels = dict()
+    probas = dict()
+    for size in sizes:
+        subDir = workDir + "/subsample_" + size
+        data = pd.read_csv(subDir + "/feature_table.tsv", header=0, index_col=0, sep="\t")
+        fractions = pd.read_csv(subDir + "/fractions.tsv", header=None, index_col=0, sep="\t").iloc[:, 0]
+        fractions.index = fractions.index.astype(str)
+        scaled = scale_breadth(data, fractions)
+        scaled.to_csv(subDir + "/feature_table_scaled.tsv", sep="\t")
+
+        proba = model.predict_proba(scaled.T)
+        labels[size] = pd.Series(np.asarray(model.classes).take(np.argmax(proba, axis=1)), index=scaled.columns)
+        probas[size] = pd.Series(np.max(proba, axis=1), index=scaled.columns)
+        labels[size].to_csv(subDir + "/predictions.tsv", sep="\t", header=False)
+
+    # prediction on the largest subsample is reported, agreement shows share of subsamples with the same label
+    report = pd.DataFrame(index=labels[sizes[-1]].index)
+    for size in sizes:
+        report["label_" + size] = labels[size]
+        report["proba_" + size] = probas[size].round(4)
+    agreement = sum((labels[size] == labels[sizes[-1]]).astype(int) for size in sizes) / len(sizes)
+    report["label"] = labels[sizes[-1]]
+    report["agreement"] = agreement.round(2)
+    report["stable"] = np.where(agreement == 1.0, "yes", "no")
+    report.index.name = "sample"
+    report.to_csv(workDir + "/screening_report.tsv", sep="\t")
+
+    print("Screening predictions (subsample sizes: " + ", ".join(sizes) + " reads):")
+    print(report[["label", "proba_" + sizes[-1], "agreement", "stable"]].to_string())
+    unstable = int((report["stable"] == "no").sum())
+    if unstable > 0:
+        print(str(unstable) + " of " + str(report.shape[0]) + " samples have unstable predictions, process them at full depth")
@@ -4,21 +4,51 @@
 
 import sys
 import getopt
-import pandas as pd
+from feature_index import load_index
+from workdir_storage import open_text
+
+
+def read_feature_seqs(workDir, category, featureId):
+    """Extract nucleotide sequences of feature from contigs of its category
+
+    Arguments:
+    workDir (str): path to directory with contigs for each category
+    category (str): name of feature's category
+    featureId (str): number of feature in category
+
+    Returns:
+    list: list of pairs (header, sequence)
+    """
+    seqs = []
+    featuresFasta = open_text(workDir + '/contigs_' + category + '/components.seq.fasta')
+    while True:
+        line = featuresFasta.readline()
+        if not line:
+            break
+        if len(line) == 0:
+            continue
+        if line[0] == '>':
+            line = line.strip()[1:]
+            seqName = line.split('_')[0]
+            if seqName == featureId:
+                seq = featuresFasta.readline().strip()
+                seqs.append((line, seq))
+    featuresFasta.close()
+    return seqs
+
 
 if __name__ == "__main__":
-    inputFile = ''
-    outputFile = ''
-    feature = ''
-    category = ''
-    featureId = ''
+    workDir = ''
+    resDir = ''
+    seedsDir = ''
+    features = []
     board = 0.1
 
-    helpString = 'Please add all mandatory parameters --work-dir, --feature, --res-dir and use optional float parameter --board'
+    helpString = 'Please add all mandatory parameters --work-dir, --feature (can be repeated), --res-dir and use optional float parameter --board and optional --seeds-dir'
 
     argv = sys.argv[1:]
     try:
-        opts, args = getopt.getopt(argv, "h", ["work-dir=", "feature=", "res-dir=", "board="])
+        opts, args = getopt.getopt(argv, "h", ["work-dir=", "feature=", "res-dir=", "board=", "seeds-dir="])
     except getopt.GetoptError:
         print(helpString)
         sys.exit(2)
@@ -38,8 +68,7 @@ if __name__ == "__main__":
                 feature = feature[1:]
             if feature[-1] == "'" or feature[-1] == '"':
                 feature = feature[:-1]
-            category = feature.split("_")[0]
-            featureId = feature.split("_")[1]
+            features.append(feature)
         elif opt == "--res-dir":
             resDir = arg
             if resDir[0] == "'" or resDir[0] == '"':
@@ -48,29 +77,45 @@ if __name__ == "__main__":
                 resDir = resDir[:-1]
         elif opt == "--board":
             board = float(arg)
+        elif opt == "--seeds-dir":
+            seedsDir = arg
 
-    data = pd.read_csv(workDir + '/feature_table.tsv', header=0, index_col=0, sep='\t')
-    data = data.T
-    filteredData = data[feature][data[feature] > board].keys().tolist()
-    samplesList = open(resDir + '/samples_list_feature_' + feature + '.txt', 'w')
-    print(*filteredData, sep="\n", file=samplesList)
-    samplesList.close()
+    values, rows, samples = load_index(workDir + '/feature_table.tsv')
+    samplesFeatures = dict()
+    for feature in features:
+        if feature not in rows:
+            print("Cannot find feature '" + feature + "' in " + workDir + "/feature_table.tsv")
+            sys.exit(1)
+        category = feature.split("_")[0]
+        featureId = feature.split("_")[1]
 
-    resSeqFile = open(resDir + '/seq_feature_' + feature + '.fasta', 'w')
-    featuresFasta = open(workDir + '/contigs_' + category + '/components.seq.fasta', 'r')
+        filteredData = [sam for sam, val in zip(samples, values[rows[feature]]) if val > board]
+        samplesList = open(resDir + '/samples_list_feature_' + feature + '.txt', 'w')
+        print(*filteredData, sep="\n", file=samplesList)
+        samplesList.close()
 
-    while True:
-        line = featuresFasta.readline()
-        if not line:
-            break
-        if len(line) == 0:
-            continue
-        if line[0] == '>':
-            line = line.strip()[1:]
-            seqName = line.split('_')[0]
-            if seqName == featureId:
-                seq = featuresFasta.readline().strip()
-                print(">"+line, file=resSeqFile)
-                print(seq, file=resSeqFile)
-    resSeqFile.close()
-    featuresFasta.close()
+        seqs = read_feature_seqs(workDir, category, featureId)
+        resSeqFile = open(resDir + '/seq_feature_' + feature + '.fasta', 'w')
+        for header, seq in seqs:
+            print(">" + header, file=resSeqFile)
+            print(seq, file=resSeqFile)
+        resSeqFile.close()
+
+        for sam in filteredData:
+            if sam not in samplesFeatures:
+                samplesFeatures[sam] = []
+            samplesFeatures[sam].append((feature, seqs))
+
+    if seedsDir != '':
+        # seeds of all features selected for sample are named '<category>_<feature id>_<contig id>'
+        # to be processed in a single run over sample's reads
+        out = open(resDir + '/samples_features.tsv', 'w')
+        for sam, featureSeqs in samplesFeatures.items():
+            print(sam, " ".join(feature for feature, _ in featureSeqs), sep="\t", file=out)
+            seedsFile = open(seedsDir + '/' + sam + '.fasta', 'w')
+            for feature, seqs in featureSeqs:
+                for header, seq in seqs:
+                    print(">" + feature.split("_")[0] + "_" + header.split()[0], file=seedsFile)
+                    print(seq, file=seedsFile)
+            seedsFile.close()
+        out.close()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+# Utility for splitting samples' k-mers into shards by hash prefix and merging per-shard results back
+import os
+import sys
+import shutil
+import getopt
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from metafx_kmers import KMER_DTYPE, hash_kmers
+
+
+def shard_ids(kmers, nShards):
+    """Get shard of every k-mer by prefix of its hash, so equal k-mers of all samples fall into the same shard
+
+    Arguments:
+    kmers (np.array): k-mers packed into int64
+    nShards (int): number of shards
+
+    Returns:
+    np.array: shard index of every k-mer
+    """
+    prefix = hash_kmers(kmers) >> np.uint64(32)
+    return ((prefix * np.uint64(nShards)) >> np.uint64(32)).astype(np.int64)
+
+
+def split_file(file, outDir, nShards):
+    """Split k-mers file of one sample into <outDir>/kmers_<j>/<sample>.kmers.bin files.
+    File is written for every shard (possibly empty), so all shards contain the same set of samples
+
+    Arguments:
+    file (str): path to .kmers.bin file
+    outDir (str): path to directory with shards
+    nShards (int): number of shards
+
+    Returns:
+    np.array: number of k-mers in every shard
+    """
+    data = np.fromfile(file, dtype=KMER_DTYPE)
+    shards = shard_ids(data["kmer"].astype(np.int64), nShards)
+    order = np.argsort(shards, kind="stable")
+    counts = np.bincount(shards, minlength=nShards)
+    bounds = np.concatenate([[0], np.cumsum(counts)])
+    for j in range(nShards):
+        data[order[bounds[j]:bounds[j + 1]]].tofile(outDir + "/kmers_" + str(j) + "/" + os.path.basename(file))
+    return counts
+
+
+def merge_files(files, outFile):
+    """Concatenate per-shard files of fixed-size k-mer records into one file.
+    Files are checked to consist of whole records before anything is written
+
+    Arguments:
+    files (list): paths to per-shard files
+    outFile (str): path to merged file
+
+    Returns:
+    int: number of records in merged file
+    """
+    total = 0
+    for file in files:
+        size = os.path.getsize(file)
+        if size % KMER_DTYPE.itemsize != 0:
+            raise ValueError("Size of " + file + " is not a multiple of k-mer record size (" +
+                             str(KMER_DTYPE.itemsize) + " bytes), cannot merge shards")
+        total += size // KMER_DTYPE.itemsize
+
+    os.makedirs(os.path.dirname(os.path.abspath(outFile)), exist_ok=True)
+    with open(outFile + ".tmp", "wb") as fout:
+        for file in files:
+            with open(file, "rb") as fin:
+                shutil.copyfileobj(fin, fout, 1 << 24)
+    os.replace(outFile + ".tmp", outFile)
+    return total
+
+
+if __name__ == "__main__":
+    outDir = ''
+    outFile = ''
+    nShards = 0
+    nThreads = 0
+
+    helpString = 'Usage: shard_kmers.py split -w <dir> --shards <int> [-t <int>] <kmers files> | merge --out <file> <per-shard files>'
+
+    if len(sys.argv) < 2 or sys.argv[1] not in ("split", "merge"):
+        print(helpString)
+        sys.exit(2)
+    command = sys.argv[1]
+    try:
+        opts, files = getopt.getopt(sys.argv[2:], "hw:t:", ["shards=", "out="])
+    except getopt.GetoptError:
+        print(helpString)
+        sys.exit(2)
+    for opt, arg in opts:
+        if opt == "-h":
+            print(helpString)
+            sys.exit()
+        elif opt == "-w":
+            outDir = arg
+        elif opt == "--shards":
+            nShards = int(arg)
+        elif opt == "--out":
+            outFile = arg
+        elif opt == "-t":
+            nThreads = int(arg)
+    if nThreads <= 0:
+        nThreads = os.cpu_count()
+
+    if command == "split":
+        for j in range(nShards):
+            os.makedirs(outDir + "/kmers_" + str(j), exist_ok=True)
+        with ThreadPoolExecutor(max_workers=nThreads) as pool:
+            counts = sum(pool.map(lambda file: split_file(file, outDir, nShards), files))
+        print("Split k-mers of " + str(len(files)) + " samples into " + str(nShards) + " shards, k-mers per shard: " +
+              str(counts.min()) + " - " + str(counts.max()))
+    else:
+        try:
+            total = merge_files(files, outFile)
+        except (OSError, ValueError) as e:
+            print(e, file=sys.stderr)
+            sys.exit(1)
+        print("Merged " + str(len(files)) + " shards into " + outFile + " (" + str(total) + " k-mers)")
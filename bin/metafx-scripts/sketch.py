@@ -0,0 +1,242 @@
+#!/usr/bin/env python
+# Utility for approximate distance matrix between samples via FracMinHash sketches of their k-mers
+# -*- coding: UTF-8 -*-
+
+import os
+import sys
+import glob
+import getopt
+import hashlib
+import numpy as np
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+from metafx_kmers import read_kmers, hash_kmers
+
+
+def make_sketch(file, scale):
+    """Build FracMinHash sketch of sample: hashes of k-mers below 2^64 / scale
+
+    Arguments:
+    file (str): path to .kmers.bin file
+    scale (int): expected number of k-mers per one hash in sketch
+
+    Returns:
+    np.array: sorted unique hashes of type uint64
+    """
+    h = hash_kmers(read_kmers(file)[0])
+    return np.unique(h[h < np.uint64(2 ** 64 // scale)])
+
+
+def load_sketch(cacheDir, file, scale):
+    """Get sketch of sample from cache or build and save it, cache entry is invalidated if k-mers file changes
+
+    Arguments:
+    cacheDir (str): path to cache directory
+    file (str): path to .kmers.bin file
+    scale (int): expected number of k-mers per one hash in sketch
+
+    Returns:
+    tuple: (sketch id made of sample name and sketch content, np.array with sketch)
+    """
+    st = os.stat(file)
+    stamp = os.path.realpath(file) + "\t" + str(st.st_size) + "\t" + str(st.st_mtime_ns) + "\t" + str(scale)
+    cached = cacheDir + "/" + hashlib.sha1(stamp.encode()).hexdigest() + ".sketch.npy"
+    if os.path.exists(cached):
+        sketch = np.load(cached)
+    else:
+        sketch = make_sketch(file, scale)
+        tmp = cached[:-len(".npy")] + ".tmp" + str(os.getpid()) + ".npy"
+        np.save(tmp, sketch)
+        os.replace(tmp, cached)
+    # sample name is a part of sketch id, so samples with equal (e.g. empty) sketches do not share memoized distances
+    name = os.path.basename(file)[:-len(".kmers.bin")]
+    return hashlib.sha1(name.encode() + b"\0" + sketch.tobytes()).hexdigest()[:16], sketch
+
+
+def mash_distance(common, sizeA, sizeB, k):
+    """Mash distance between samples estimated from Jaccard index of their sketches
+
+    Arguments:
+    common (np.array): number of hashes shared by sketches
+    sizeA (np.array): sizes of the first sketches
+    sizeB (np.array): sizes of the second sketches
+    k (int): k-mer size
+
+    Returns:
+    np.array: distances in range [0; 1]
+    """
+    union = sizeA + sizeB - common
+    j = np.divide(common, union, out=np.zeros(np.shape(common)), where=union > 0)
+    d = np.ones(np.shape(common))
+    shared = j > 0
+    d[shared] = -np.log(2 * j[shared] / (1 + j[shared])) / k
+    return np.clip(d, 0, 1)
+
+
+def distance_matrix(cacheDir, names, sketches, k):
+    """Calculate distance matrix reusing distances between sketches computed in previous runs,
+    only rows of samples with unknown distances are calculated
+
+    Arguments:
+    cacheDir (str): path to cache directory
+    names (list): samples' names
+    sketches (list): pairs (sketch id, sketch) for samples
+    k (int): k-mer size
+
+    Returns:
+    pd.DataFrame: symmetric distance matrix of shape (n_samples, n_samples)
+    """
+    from scipy.sparse import csr_matrix
+
+    memoFile = cacheDir + "/distances_k" + str(k) + ".tsv"
+    known = dict()
+    if os.path.exists(memoFile):
+        for line in open(memoFile):
+            a, b, d = line.split()
+            known.setdefault(a, dict())[b] = float(d)
+            known.setdefault(b, dict())[a] = float(d)
+
+    n = len(names)
+    ids = [sid for sid, _ in sketches]
+    # rows are calculated for samples not seen before and for pairs of old samples never met in one run
+    rows = [x for x in range(n) if ids[x] not in known]
+    old = [x for x in range(n) if ids[x] in known]
+    for i, x in enumerate(old):
+        if any(ids[y] not in known[ids[x]] for y in old[i + 1:]):
+            rows.append(x)
+    rows.sort()
+    print("Reused distances for " + str(n - len(rows)) + " samples, calculating " + str(len(rows)) + " new rows")
+
+    matrix = np.zeros((n, n))
+    for x in old:
+        for y in old:
+            if x != y and ids[y] in known[ids[x]]:
+                matrix[x, y] = known[ids[x]][ids[y]]
+
+    if rows:
+        # samples x hashes incidence matrix, shared hashes of pairs are obtained by sparse product
+        hashes, columns = np.unique(np.concatenate([s for _, s in sketches]), return_inverse=True)
+        sizes = np.array([len(s) for _, s in sketches])
+        incidence = csr_matrix((np.ones(len(columns), dtype=np.int32), (np.repeat(np.arange(n), sizes), columns.ravel())),
+                               shape=(n, len(hashes)))
+        common = (incidence[rows] @ incidence.T).toarray()
+        block = mash_distance(common, sizes[rows][:, np.newaxis], sizes[np.newaxis, :], k)
+        with open(memoFile, "a") as out:
+            for r, x in enumerate(rows):
+                for y in range(n):
+                    if x == y:
+                        continue
+                    matrix[x, y] = matrix[y, x] = block[r, y]
+                    if ids[y] not in known.get(ids[x], dict()):
+                        known.setdefault(ids[x], dict())[ids[y]] = block[r, y]
+                        known.setdefault(ids[y], dict())[ids[x]] = block[r, y]
+                        print(ids[x], ids[y], block[r, y], sep="\t", file=out)
+    return pd.DataFrame(matrix, index=names, columns=names)
+
+
+def draw_heatmap(matrix, outName):
+    """Draw heatmap of distance matrix with samples ordered by hierarchical clustering
+
+    Arguments:
+    matrix (pd.DataFrame): symmetric distance matrix
+    outName (str): prefix of output files
+
+    Returns:
+    None
+    """
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    from scipy.cluster.hierarchy import linkage, dendrogram
+    from scipy.spatial.distance import squareform
+
+    n = matrix.shape[0]
+    size = min(max(6, n * 0.2), 60)
+    fig = plt.figure(figsize=(size * 1.2, size))
+    axTree = fig.add_axes([0.05, 0.1, 0.15, 0.8])
+    axMap = fig.add_axes([0.21, 0.1, 0.65, 0.8])
+    axBar = fig.add_axes([0.88, 0.1, 0.02, 0.8])
+
+    order = list(range(n))
+    if n > 1:
+        tree = dendrogram(linkage(squareform(matrix.values, checks=False), method="average"),
+                          orientation="left", ax=axTree, no_labels=True, color_threshold=0)
+        order = tree["leaves"][::-1]
+    axTree.axis("off")
+
+    ordered = matrix.iloc[order, order]
+    im = axMap.imshow(ordered.values, aspect="auto", cmap="viridis_r", interpolation="nearest")
+    if n <= 200:
+        axMap.set_yticks(range(n))
+        axMap.set_yticklabels(ordered.index, fontsize=6)
+        axMap.set_xticks(range(n))
+        axMap.set_xticklabels(ordered.columns, fontsize=6, rotation=90)
+    else:
+        axMap.set_xticks([])
+        axMap.set_yticks([])
+    axMap.yaxis.tick_right()
+    fig.colorbar(im, cax=axBar)
+
+    plt.savefig(outName + ".png", bbox_inches='tight')
+    plt.savefig(outName + ".svg", bbox_inches='tight')
+    plt.close(fig)
+
+
+if __name__ == "__main__":
+    kmersDir = ''
+    cacheDir = ''
+    outDir = ''
+    k = 0
+    scale = 1000
+    nThreads = 0
+
+    helpString = 'Usage: sketch.py --kmers-dir <dir> -k <int> -w <dir> [--scale <int>] [--cache-dir <dir>] [-t <int>]'
+
+    try:
+        opts, args = getopt.getopt(sys.argv[1:], "hk:w:t:", ["kmers-dir=", "cache-dir=", "scale="])
+    except getopt.GetoptError:
+        print(helpString)
+        sys.exit(2)
+    for opt, arg in opts:
+        if opt == "-h":
+            print(helpString)
+            sys.exit()
+        elif opt == "--kmers-dir":
+            kmersDir = arg
+        elif opt == "--cache-dir":
+            cacheDir = arg
+        elif opt == "-w":
+            outDir = arg
+        elif opt == "-k":
+            k = int(arg)
+        elif opt == "--scale":
+            scale = int(arg)
+        elif opt == "-t":
+            nThreads = int(arg)
+
+    if kmersDir == '' or outDir == '' or k <= 0:
+        print(helpString)
+        sys.exit(2)
+    if cacheDir == '':
+        cacheDir = outDir + "/sketches"
+    if nThreads <= 0:
+        nThreads = os.cpu_count()
+    os.makedirs(cacheDir, exist_ok=True)
+
+    files = sorted(glob.glob(kmersDir + "/*.kmers.bin"))
+    if len(files) == 0:
+        print("No k-mers files found in " + kmersDir)
+        sys.exit(1)
+    names = [os.path.basename(f)[:-len(".kmers.bin")] for f in files]
+
+    with ThreadPoolExecutor(max_workers=nThreads) as pool:
+        sketches = list(pool.map(lambda f: load_sketch(cacheDir, f, scale), files))
+    print("Sketched " + str(len(files)) + " samples, " +
+          str(int(np.mean([len(s) for _, s in sketches]))) + " hashes per sample on average")
+
+    matrix = distance_matrix(cacheDir, names, sketches, k)
+    matrix.to_csv(outDir + "/dist_matrix.tsv", sep="\t")
+    print("Distance matrix saved to " + outDir + "/dist_matrix.tsv")
+
+    draw_heatmap(matrix, outDir + "/heatmap")
+    print("Heatmap saved to " + outDir + "/heatmap.png")
@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+# Utility for splitting threads and memory budget between concurrently running jobs
+import os
+import sys
+
+
+UNITS = {"K": 1 / 1024, "M": 1, "G": 1024, "T": 1024 * 1024}
+
+
+def parse_mem(s):
+    """Convert memory value with suffix into megabytes
+
+    Arguments:
+    s (str): memory value (1500M, 4G, etc.), value without suffix is treated as bytes
+
+    Returns:
+    int: memory in megabytes
+    """
+    s = s.strip()
+    if s[-1].upper() in UNITS:
+        return int(float(s[:-1]) * UNITS[s[-1].upper()])
+    return int(s) // (1024 * 1024)
+
+
+def format_mem(mb):
+    """Convert megabytes into memory value with suffix
+
+    Arguments:
+    mb (int): memory in megabytes
+
+    Returns:
+    str: memory value (1500M, 4G, etc.)
+    """
+    if mb % 1024 == 0:
+        return str(mb // 1024) + "G"
+    return str(mb) + "M"
+
+
+def cgroup_value(paths):
+    """Read the first numeric limit found in cgroup files
+
+    Arguments:
+    paths (list): paths to cgroup files
+
+    Returns:
+    str: content of file, empty string if no limit is set
+    """
+    for path in paths:
+        if os.path.exists(path):
+            value = open(path).read().strip()
+            if value and value.split()[0] != "max":
+                return value
+    return ""
+
+
+def available_mem():
+    """Get amount of currently available RAM in megabytes (total RAM if not supported by OS),
+    limited by memory of cgroup (container, SLURM job) and by SLURM allocation on shared nodes
+
+    Returns:
+    int: memory in megabytes
+    """
+    mem = os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES") // (1024 * 1024)
+    if os.path.exists("/proc/meminfo"):
+        for line in open("/proc/meminfo"):
+            if line.startswith("MemAvailable:"):
+                mem = int(line.split()[1]) // 1024
+    limit = cgroup_value(["/sys/fs/cgroup/memory.max", "/sys/fs/cgroup/memory/memory.limit_in_bytes"])
+    usage = cgroup_value(["/sys/fs/cgroup/memory.current", "/sys/fs/cgroup/memory/memory.usage_in_bytes"])
+    if limit and int(limit) < 2 ** 60:  # cgroup v1 reports huge number if there is no limit
+        mem = min(mem, (int(limit) - int(usage or 0)) // (1024 * 1024))
+    if "SLURM_MEM_PER_NODE" in os.environ:
+        mem = min(mem, int(os.environ["SLURM_MEM_PER_NODE"]))
+    elif "SLURM_MEM_PER_CPU" in os.environ:
+        mem = min(mem, int(os.environ["SLURM_MEM_PER_CPU"]) * available_cpus())
+    return max(mem, 1)
+
+
+def available_cpus():
+    """Get number of CPUs this process may use: affinity mask (cpuset of container or SLURM job),
+    CPU quota of cgroup and SLURM allocation are taken into account
+
+    Returns:
+    int: number of threads
+    """
+    cpus = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count()
+    quota = cgroup_value(["/sys/fs/cgroup/cpu.max"]).split()
+    if len(quota) == 2:
+        cpus = min(cpus, max(int(quota[0]) // int(quota[1]), 1))
+    if "SLURM_CPUS_PER_TASK" in os.environ:
+        cpus = min(cpus, int(os.environ["SLURM_CPUS_PER_TASK"]))
+    return cpus
+
+
+def split_resources(mem, threads, jobs):
+    """Split memory and threads budget between equal jobs
+
+    Arguments:
+    mem (str): total memory value with suffix, empty string for 90% of available RAM
+    threads (str): total number of threads, empty string for all available cores
+    jobs (int): number of concurrent jobs
+
+    Returns:
+    tuple: (memory in megabytes, number of threads) for each job
+    """
+    mem = parse_mem(mem) if mem else int(available_mem() * 0.9)
+    threads = int(threads) if threads else available_cpus()
+    return max(mem // jobs, 1), max(threads // jobs, 1)
+
+
+if __name__ == "__main__":
+    mem, threads = split_resources(sys.argv[1], sys.argv[2], int(sys.argv[3]))
+    print(format_mem(mem), threads)
@@ -0,0 +1,217 @@
+#!/usr/bin/env python
+# Utility for taking first-N or random subsamples of reads of several sizes at once for fast screening of samples
+# -*- coding: UTF-8 -*-
+
+import os
+import sys
+import bz2
+import gzip
+import getopt
+import hashlib
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from parse_samples_categories import get_basename
+
+
+COMPRESSED = (".gz", ".bz2")
+# number of first reads used to estimate total number of reads in random mode
+ESTIMATE_READS = 10000
+
+
+def open_reads(file):
+    """Open reads file for reading, possibly compressed
+
+    Arguments:
+    file (str): path to reads file in FASTQ or FASTA format
+
+    Returns:
+    tuple: (raw file object, file object with decompressed content)
+    """
+    raw = open(file, "rb")
+    ext = os.path.splitext(file)[1]
+    if ext == ".gz":
+        return raw, gzip.GzipFile(fileobj=raw)
+    if ext == ".bz2":
+        return raw, bz2.BZ2File(raw)
+    return raw, raw
+
+
+def records(fin):
+    """Iterate over reads of FASTQ or FASTA file
+
+    Arguments:
+    fin (file): file opened in binary mode
+
+    Returns:
+    generator: byte strings, each with all lines of one read
+    """
+    line = fin.readline()
+    if line.startswith(b"@"):
+        while line:
+            yield line + fin.readline() + fin.readline() + fin.readline()
+            line = fin.readline()
+    else:
+        record = line
+        for line in fin:
+            if line.startswith(b">"):
+                yield record
+                record = line
+            else:
+                record += line
+        if record:
+            yield record
+
+
+def read_key(record, seed):
+    """Get pseudo-random number of read from its name, equal for both reads of pair
+
+    Arguments:
+    record (bytes): lines of one read
+    seed (int): seed of random selection
+
+    Returns:
+    float: number in [0, 1)
+    """
+    name = record[1:].split(None, 1)[0]
+    if name[-2:] in (b"/1", b"/2"):
+        name = name[:-2]
+    digest = hashlib.blake2b(name, digest_size=8, salt=seed.to_bytes(8, "little", signed=True)).digest()
+    return int.from_bytes(digest, "little") / 2 ** 64
+
+
+def estimate_reads(file):
+    """Estimate number of reads in file, extrapolating compressed bytes taken by the first reads
+
+    Arguments:
+    file (str): path to reads file
+
+    Returns:
+    float: expected number of reads
+    """
+    raw, fin = open_reads(file)
+    head = sum(1 for _ in zip(range(ESTIMATE_READS), records(fin)))
+    consumed = raw.tell()
+    raw.close()
+    if head < ESTIMATE_READS:
+        return head
+    return head * os.path.getsize(file) / max(consumed, 1)
+
+
+def subsample_file(file, sizes, outDirs, mode, seed, expected):
+    """Write subsamples of several sizes of reads file. Smaller subsamples are subsets of larger ones,
+    and in random mode paired files get the same reads selected, as selection depends only on read names and seed
+
+    Arguments:
+    file (str): path to reads file
+    sizes (list): numbers of reads in subsamples
+    outDirs (list): output directory for every subsample
+    mode (str): first (first N reads) or random (about N random reads, whole file is read once)
+    seed (int): seed of random selection
+    expected (float): expected number of reads of sample in random mode, the same for paired files (not used in first mode)
+
+    Returns:
+    list: fraction of reads of file in every subsample
+    """
+    name = os.path.basename(file)
+    if os.path.splitext(name)[1] in COMPRESSED:
+        name = os.path.splitext(name)[0]
+    outs = [open(outDir + "/" + name, "wb") for outDir in outDirs]
+
+    if mode == "first":
+        raw, fin = open_reads(file)
+        taken = 0
+        for record in records(fin):
+            if taken == sizes[-1]:
+                break
+            for size, out in zip(sizes, outs):
+                if taken < size:
+                    out.write(record)
+            taken += 1
+        # total number of reads is extrapolated from compressed bytes consumed by subsample
+        consumed = raw.tell()
+        total = os.path.getsize(file)
+        ended = fin.read(1) == b""
+        raw.close()
+        if ended:
+            fractions = [min(size, taken) / max(taken, 1) for size in sizes]
+        else:
+            fractions = [size / (taken * total / max(consumed, 1)) for size in sizes]
+    else:
+        # read is taken with probability N / expected number of reads
+        raw, fin = open_reads(file)
+        thresholds = [size / max(expected, 1) for size in sizes]
+        taken = [0] * len(sizes)
+        total = 0
+        for record in records(fin):
+            u = read_key(record, seed)
+            for j, (threshold, out) in enumerate(zip(thresholds, outs)):
+                if u < threshold:
+                    out.write(record)
+                    taken[j] += 1
+            total += 1
+        raw.close()
+        fractions = [n / max(total, 1) for n in taken]
+
+    for out in outs:
+        out.close()
+    return [min(f, 1.0) for f in fractions]
+
+
+if __name__ == "__main__":
+    workDir = ''
+    sizes = []
+    mode = 'first'
+    seed = 0
+    nThreads = 0
+
+    helpString = 'Usage: subsample_reads.py -w <dir> --sizes <int,int,..> [--mode first|random] [--seed <int>] [-t <int>] <reads files>'
+
+    try:
+        opts, files = getopt.getopt(sys.argv[1:], "hw:t:", ["sizes=", "mode=", "seed="])
+    except getopt.GetoptError:
+        print(helpString)
+        sys.exit(2)
+    for opt, arg in opts:
+        if opt == "-h":
+            print(helpString)
+            sys.exit()
+        elif opt == "-w":
+            workDir = arg
+        elif opt == "--sizes":
+            sizes = sorted(int(size) for size in arg.split(","))
+        elif opt == "--mode":
+            mode = arg
+        elif opt == "--seed":
+            seed = int(arg)
+        elif opt == "-t":
+            nThreads = int(arg)
+    if mode not in ("first", "random"):
+        print("Unknown subsampling mode '" + mode + "'. Select one of: first, random", file=sys.stderr)
+        sys.exit(1)
+    if nThreads <= 0:
+        nThreads = os.cpu_count()
+
+    outDirs = [workDir + "/subsample_" + str(size) + "/reads" for size in sizes]
+    for outDir in outDirs:
+        os.makedirs(outDir, exist_ok=True)
+    with ProcessPoolExecutor(max_workers=min(nThreads, max(len(files), 1))) as pool:
+        expected = [0] * len(files)
+        if mode == "random":
+            # paired files share probability of taking read, so the same reads are selected from both
+            estimates = dict()
+            for file, n in zip(files, pool.map(estimate_reads, files)):
+                estimates.setdefault(get_basename(file), []).append(n)
+            expected = [np.mean(estimates[get_basename(file)]) for file in files]
+        results = list(pool.map(subsample_file, files, [sizes] * len(files), [outDirs] * len(files),
+                                [mode] * len(files), [seed] * len(files), expected))
+
+    # fraction of sample's reads is averaged over its files (e.g. R1 and R2)
+    samples = dict()
+    for file, fractions in zip(files, results):
+        samples.setdefault(get_basename(file), []).append(fractions)
+    for j, size in enumerate(sizes):
+        with open(workDir + "/subsample_" + str(size) + "/fractions.tsv", "w") as fout:
+            for sam, fractions in samples.items():
+                print(sam, np.mean([f[j] for f in fractions]), sep="\t", file=fout)
+        print("Subsample of " + str(size) + " reads: " + ", ".join(sam + " " + str(round(np.mean([f[j] for f in fractions]) * 100, 2)) + "%"
+                                                               for sam, fractions in samples.items()) + " of reads")
@@ -0,0 +1,423 @@
+#!/usr/bin/env python
+# Utility for running pipeline tasks with dependencies by independent workers sharing working directory
+# (locally or on several nodes), tasks are claimed via lock directories and retried on failure
+import os
+import sys
+import time
+import shutil
+import socket
+import getopt
+import threading
+import subprocess
+
+
+def read_tasks(queueDir):
+    """Read list of tasks of queue
+
+    Arguments:
+    queueDir (str): path to queue directory
+
+    Returns:
+    dict: task id -> (list of dependencies ids, shell command), in order of tasks file
+    """
+    tasks = dict()
+    for line in open(queueDir + "/tasks.tsv"):
+        taskId, deps, cmd = line.rstrip("\n").split("\t", 2)
+        tasks[taskId] = ([dep for dep in deps.split(",") if dep != ""], cmd)
+    return tasks
+
+
+def init_queue(queueDir, tasksFile, retries):
+    """Create queue from tasks file with rows <id>\t<comma-separated dependencies>\t<command>
+
+    Arguments:
+    queueDir (str): path to queue directory
+    tasksFile (str): path to tasks file
+    retries (int): number of restarts of failed task
+
+    Returns:
+    int: number of tasks
+    """
+    tasks = dict()
+    for line in open(tasksFile):
+        if line.strip() == "":
+            continue
+        taskId, deps, cmd = line.rstrip("\n").split("\t", 2)
+        if taskId in tasks:
+            raise ValueError("Duplicated task id " + taskId)
+        for dep in deps.split(","):
+            if dep != "" and dep not in tasks:
+                raise ValueError("Task " + taskId + " depends on unknown or later task " + dep)
+        tasks[taskId] = line
+    if os.path.exists(queueDir + "/tasks.tsv"):
+        raise ValueError("Queue already exists in " + queueDir)
+    for sub in ("locks", "done", "failed", "attempts", "logs", "clocks"):
+        os.makedirs(queueDir + "/" + sub, exist_ok=True)
+    with open(queueDir + "/retries", "w") as fout:
+        print(retries, file=fout)
+    with open(queueDir + "/tasks.tsv.tmp", "w") as fout:
+        fout.writelines(line if line.endswith("\n") else line + "\n" for line in tasks.values())
+    os.replace(queueDir + "/tasks.tsv.tmp", queueDir + "/tasks.tsv")
+    return len(tasks)
+
+
+def owner_id():
+    """Get id of this worker written into locks it holds
+
+    Returns:
+    str: <hostname>\t<pid>
+    """
+    return socket.gethostname() + "\t" + str(os.getpid())
+
+
+def clock_file(queueDir):
+    """Get path of file touched by this worker to read time of queue file system
+
+    Arguments:
+    queueDir (str): path to queue directory
+
+    Returns:
+    str: path to clock file
+    """
+    return queueDir + "/clocks/" + owner_id().replace("\t", ".")
+
+
+def queue_time(queueDir):
+    """Get current time by clock of file system holding the queue, so heartbeats written by workers on
+    other nodes are compared with it regardless of clock skew between nodes
+
+    Arguments:
+    queueDir (str): path to queue directory
+
+    Returns:
+    float: current time of queue file system
+    """
+    clock = clock_file(queueDir)
+    try:
+        os.utime(clock)
+    except OSError:
+        os.makedirs(queueDir + "/clocks", exist_ok=True)
+        open(clock, "w").close()
+    return os.path.getmtime(clock)
+
+
+def task_state(queueDir, taskId, timeout, now):
+    """Get state of task
+
+    Arguments:
+    queueDir (str): path to queue directory
+    taskId (str): task id
+    timeout (int): seconds without heartbeat after which running task is considered lost
+    now (float): current time of queue file system
+
+    Returns:
+    str: done, failed, running, lost or waiting
+    """
+    if os.path.exists(queueDir + "/done/" + taskId):
+        return "done"
+    if os.path.exists(queueDir + "/failed/" + taskId):
+        return "failed"
+    lock = queueDir + "/locks/" + taskId
+    if os.path.isdir(lock):
+        try:
+            beat = os.path.getmtime(lock + "/heartbeat")
+        except OSError:
+            beat = os.path.getmtime(lock)  # heartbeat is not written yet
+        return "running" if now - beat < timeout else "lost"
+    return "waiting"
+
+
+def attempts(queueDir, taskId):
+    """Count started attempts of task
+
+    Arguments:
+    queueDir (str): path to queue directory
+    taskId (str): task id
+
+    Returns:
+    int: number of attempts
+    """
+    return sum(1 for name in os.listdir(queueDir + "/attempts") if name.rsplit(".", 1)[0] == taskId)
+
+
+def break_lock(queueDir, taskId):
+    """Remove lock of task whose worker stopped sending heartbeats. Lock is renamed first,
+    so only one of workers noticing lost task removes it
+
+    Arguments:
+    queueDir (str): path to queue directory
+    taskId (str): task id
+
+    Returns:
+    None
+    """
+    stale = queueDir + "/locks/." + taskId + ".stale." + socket.gethostname() + "." + str(os.getpid())
+    try:
+        os.rename(queueDir + "/locks/" + taskId, stale)
+    except OSError:
+        return
+    print("Task " + taskId + " was lost by its worker, it will be restarted", file=sys.stderr)
+    shutil.rmtree(stale, ignore_errors=True)
+
+
+def claim(queueDir, taskId, maxAttempts):
+    """Try to acquire task via atomic creation of lock directory
+
+    Arguments:
+    queueDir (str): path to queue directory
+    taskId (str): task id
+    maxAttempts (int): maximal number of attempts of task
+
+    Returns:
+    int: number of this attempt, 0 if task was not acquired
+    """
+    lock = queueDir + "/locks/" + taskId
+    try:
+        os.mkdir(lock)
+    except OSError:
+        return 0
+    if os.path.exists(queueDir + "/done/" + taskId) or os.path.exists(queueDir + "/failed/" + taskId):
+        shutil.rmtree(lock, ignore_errors=True)  # finished by other worker just before lock was taken
+        return 0
+    attempt = attempts(queueDir, taskId) + 1
+    if attempt > maxAttempts:
+        open(queueDir + "/failed/" + taskId, "w").close()
+        shutil.rmtree(lock, ignore_errors=True)
+        return 0
+    owner = owner_id()
+    for file in (lock + "/heartbeat", queueDir + "/attempts/" + taskId + "." + str(attempt)):
+        with open(file, "w") as fout:
+            print(owner, file=fout)
+    return attempt
+
+
+def owns(lock):
+    """Check that lock is held by this worker, i.e. it was not broken and taken by other worker
+
+    Arguments:
+    lock (str): path to lock directory
+
+    Returns:
+    bool: True if lock belongs to this worker
+    """
+    try:
+        return open(lock + "/heartbeat").read().strip() == owner_id()
+    except OSError:
+        return False
+
+
+def release(queueDir, taskId):
+    """Remove lock of task if it is still held by this worker. Lock is renamed before the check,
+    so lock of other worker claiming the task meanwhile is not removed
+
+    Arguments:
+    queueDir (str): path to queue directory
+    taskId (str): task id
+
+    Returns:
+    None
+    """
+    lock = queueDir + "/locks/" + taskId
+    released = queueDir + "/locks/." + taskId + ".released." + owner_id().replace("\t", ".")
+    try:
+        os.rename(lock, released)
+    except OSError:
+        return
+    if owns(released):
+        shutil.rmtree(released, ignore_errors=True)
+        return
+    try:
+        os.rename(released, lock)
+    except OSError:
+        shutil.rmtree(released, ignore_errors=True)  # task was claimed once more meanwhile, it is run anyway
+    print("Lock of task " + taskId + " was taken by other worker", file=sys.stderr)
+
+
+def run_task(queueDir, taskId, cmd, attempt, maxAttempts, heartbeat):
+    """Run claimed task, updating heartbeat of its lock while it is running
+
+    Arguments:
+    queueDir (str): path to queue directory
+    taskId (str): task id
+    cmd (str): shell command of task
+    attempt (int): number of this attempt
+    maxAttempts (int): maximal number of attempts of task
+    heartbeat (int): seconds between heartbeats
+
+    Returns:
+    bool: True if task finished successfully
+    """
+    lock = queueDir + "/locks/" + taskId
+    finished = threading.Event()
+
+    def beat():
+        while not finished.wait(heartbeat):
+            if not owns(lock):
+                return
+            try:
+                os.utime(lock + "/heartbeat")
+            except OSError:
+                return
+
+    print("Running task " + taskId + " (attempt " + str(attempt) + " of " + str(maxAttempts) + "), log is saved to " +
+          queueDir + "/logs/" + taskId + ".log", flush=True)
+    beater = threading.Thread(target=beat, daemon=True)
+    beater.start()
+    with open(queueDir + "/logs/" + taskId + ".log", "a") as log:
+        print("# attempt " + str(attempt) + " on " + socket.gethostname() + ": " + cmd, file=log, flush=True)
+        code = subprocess.run(["bash", "-c", cmd], stdout=log, stderr=subprocess.STDOUT, stdin=subprocess.DEVNULL).returncode
+    finished.set()
+    beater.join()
+
+    if code == 0:
+        open(queueDir + "/done/" + taskId, "w").close()
+        print("Task " + taskId + " finished successfully", flush=True)
+    elif attempt >= maxAttempts:
+        open(queueDir + "/failed/" + taskId, "w").close()
+        print("Task " + taskId + " failed with code " + str(code) + ", no attempts left", flush=True)
+    else:
+        print("Task " + taskId + " failed with code " + str(code) + ", it will be restarted", flush=True)
+    release(queueDir, taskId)
+    return code == 0
+
+
+def worker(queueDir, timeout, heartbeat, poll):
+    """Run tasks of queue until all of them are finished or cannot be run due to failed dependencies
+
+    Arguments:
+    queueDir (str): path to queue directory
+    timeout (int): seconds without heartbeat after which running task is restarted
+    heartbeat (int): seconds between heartbeats
+    poll (int): seconds between checks of queue when no task is ready
+
+    Returns:
+    bool: True if all tasks finished successfully
+    """
+    tasks = read_tasks(queueDir)
+    maxAttempts = int(open(queueDir + "/retries").read()) + 1
+    try:
+        return run_tasks(queueDir, tasks, maxAttempts, timeout, heartbeat, poll)
+    finally:
+        try:
+            os.remove(clock_file(queueDir))
+        except OSError:
+            pass
+
+
+def run_tasks(queueDir, tasks, maxAttempts, timeout, heartbeat, poll):
+    """Scan queue and run ready tasks, see worker
+
+    Arguments:
+    queueDir (str): path to queue directory
+    tasks (dict): task id -> (list of dependencies ids, shell command)
+    maxAttempts (int): maximal number of attempts of task
+    timeout (int): seconds without heartbeat after which running task is restarted
+    heartbeat (int): seconds between heartbeats
+    poll (int): seconds between checks of queue when no task is ready
+
+    Returns:
+    bool: True if all tasks finished successfully
+    """
+    while True:
+        states = dict()
+        started = False
+        now = queue_time(queueDir)
+        for taskId, (deps, cmd) in tasks.items():
+            state = task_state(queueDir, taskId, timeout, now)
+            if state == "lost":
+                break_lock(queueDir, taskId)
+                state = "waiting"
+            if state == "waiting":
+                if any(states.get(dep) in ("failed", "blocked") for dep in deps):
+                    state = "blocked"
+                elif all(states.get(dep) == "done" for dep in deps):
+                    attempt = claim(queueDir, taskId, maxAttempts)
+                    if attempt > 0:
+                        run_task(queueDir, taskId, cmd, attempt, maxAttempts, heartbeat)
+                        started = True
+                        break  # rescan queue, as other workers could finish tasks meanwhile
+            states[taskId] = state
+        if started:
+            continue
+        if all(state in ("done", "failed", "blocked") for state in states.values()):
+            return all(state == "done" for state in states.values())
+        time.sleep(poll)
+
+
+def status(queueDir, timeout):
+    """Print states of all tasks of queue
+
+    Arguments:
+    queueDir (str): path to queue directory
+    timeout (int): seconds without heartbeat after which running task is considered lost
+
+    Returns:
+    dict: state -> number of tasks
+    """
+    counts = dict()
+    states = dict()
+    now = queue_time(queueDir)
+    os.remove(clock_file(queueDir))
+    for taskId, (deps, cmd) in read_tasks(queueDir).items():
+        state = task_state(queueDir, taskId, timeout, now)
+        if state == "waiting" and any(states.get(dep) in ("failed", "blocked") for dep in deps):
+            state = "blocked"
+        states[taskId] = state
+        counts[state] = counts.get(state, 0) + 1
+        owner = ""
+        if state == "running":
+            owner = "\t" + open(queueDir + "/locks/" + taskId + "/heartbeat").read().strip().replace("\t", ":")
+        print(taskId + "\t" + state + "\t" + str(attempts(queueDir, taskId)) + owner)
+    print("Total " + str(len(states)) + " tasks: " + ", ".join(str(n) + " " + state for state, n in counts.items()))
+    return counts
+
+
+if __name__ == "__main__":
+    queueDir = ''
+    tasksFile = ''
+    retries = 2
+    timeout = 600
+    heartbeat = 30
+    poll = 10
+
+    helpString = 'Usage: task_queue.py init -q <dir> --tasks <file> [--retries <int>] | worker -q <dir> [--timeout <sec>] [--heartbeat <sec>] [--poll <sec>] | status -q <dir> [--timeout <sec>]'
+
+    if len(sys.argv) < 2 or sys.argv[1] not in ("init", "worker", "status"):
+        print(helpString)
+        sys.exit(2)
+    command = sys.argv[1]
+    try:
+        opts, args = getopt.getopt(sys.argv[2:], "hq:", ["tasks=", "retries=", "timeout=", "heartbeat=", "poll="])
+    except getopt.GetoptError:
+        print(helpString)
+        sys.exit(2)
+    for opt, arg in opts:
+        if opt == "-h":
+            print(helpString)
+            sys.exit()
+        elif opt == "-q":
+            queueDir = arg
+        elif opt == "--tasks":
+            tasksFile = arg
+        elif opt == "--retries":
+            retries = int(arg)
+        elif opt == "--timeout":
+            timeout = int(arg)
+        elif opt == "--heartbeat":
+            heartbeat = int(arg)
+        elif opt == "--poll":
+            poll = int(arg)
+
+    if command == "init":
+        try:
+            n = init_queue(queueDir, tasksFile, retries)
+        except ValueError as e:
+            print(e, file=sys.stderr)
+            sys.exit(1)
+        print("Queue with " + str(n) + " tasks created in " + queueDir)
+    elif command == "worker":
+        if not worker(queueDir, timeout, heartbeat, poll):
+            print("Some tasks failed, see logs in " + queueDir + "/logs", file=sys.stderr)
+            sys.exit(1)
+    else:
+        status(queueDir, timeout)
@@ -0,0 +1,229 @@
+#!/usr/bin/env python
+# Utility for removing intermediate files from working directory, compressing text outputs and reporting disk usage
+import os
+import sys
+import glob
+import gzip
+import shutil
+import getopt
+from concurrent.futures import ThreadPoolExecutor
+
+
+# files and directories written by every step of pipelines, relative to working directory
+STEPS = {
+    "unique": [["kmers"], ["unique_kmers_*"], ["components_*"], ["features_*", "feature_table*"], ["contigs_*"]],
+    "stats": [["kmers"], ["statistic_kmers_*"], ["components_*"], ["features_*", "feature_table*"], ["contigs_*"]],
+    "chisq": [["kmers"], ["statistic_kmers_*"], ["components_*"], ["features_*", "feature_table*"], ["contigs_*"]],
+    "colored": [["kmers"], ["kmers_color"], ["component_colored", "components_*"], ["features_*", "feature_table*"], ["contigs_*"]],
+    "calc_features": [["kmers"], ["features_*", "feature_table*"]],
+}
+# artifacts used by downstream modules (calc_features, bandage, feature_analysis) and kept with '--retain needed'
+NEEDED = ["components_*/components.bin", "contigs_*/components-graph.gfa*", "contigs_*/components.seq.fasta*", "feature_table*"]
+# text outputs compressed with '--compress'
+COMPRESSED = ["contigs_*/*.gfa", "contigs_*/*.fasta", "features_*/vectors/*"]
+
+
+def open_text(file):
+    """Open text file for reading, using its gzip-compressed copy <file>.gz if the file itself was compressed
+
+    Arguments:
+    file (str): path to text file, possibly with .gz extension
+
+    Returns:
+    file: file object opened in text mode
+    """
+    if not file.endswith(".gz") and not os.path.exists(file) and os.path.exists(file + ".gz"):
+        file += ".gz"
+    if file.endswith(".gz"):
+        return gzip.open(file, "rt")
+    return open(file, "r")
+
+
+def disk_usage(path):
+    """Get number of bytes occupied by file or directory (symbolic links are not followed)
+
+    Arguments:
+    path (str): path to file or directory
+
+    Returns:
+    int: size in bytes
+    """
+    if os.path.islink(path) or not os.path.isdir(path):
+        return os.lstat(path).st_size
+    total = 0
+    for root, dirs, files in os.walk(path):
+        for name in files:
+            total += os.lstat(os.path.join(root, name)).st_size
+    return total
+
+
+def steps_usage(workDir, pipeline):
+    """Get disk usage of files written by every step of pipeline
+
+    Arguments:
+    workDir (str): path to working directory
+    pipeline (str): name of pipeline
+
+    Returns:
+    list: size in bytes for every step
+    """
+    return [sum(disk_usage(path) for pattern in patterns for path in glob.glob(workDir + "/" + pattern))
+            for patterns in STEPS[pipeline]]
+
+
+def remove(path, keep):
+    """Remove file or directory unless it contains one of input paths
+
+    Arguments:
+    path (str): path to file or directory
+    keep (list): paths to input data which must not be removed (e.g. pre-computed k-mers)
+
+    Returns:
+    None
+    """
+    real = os.path.realpath(path)
+    if any(os.path.realpath(k) == real or os.path.realpath(k).startswith(real + os.sep) for k in keep):
+        return
+    if os.path.isdir(path) and not os.path.islink(path):
+        shutil.rmtree(path)
+    else:
+        os.remove(path)
+
+
+def retain_needed(workDir, pipeline, keep):
+    """Remove files of pipeline steps which are not used by downstream modules
+
+    Arguments:
+    workDir (str): path to working directory
+    pipeline (str): name of pipeline
+    keep (list): paths to input data which must not be removed (e.g. pre-computed k-mers)
+
+    Returns:
+    None
+    """
+    needed = set()
+    for pattern in NEEDED:
+        for path in glob.glob(workDir + "/" + pattern):
+            if os.path.islink(path):
+                # replace link by its target, as the directory with target may be removed (e.g. component_colored)
+                target = os.path.realpath(path)
+                os.remove(path)
+                shutil.move(target, path)
+            needed.add(os.path.normpath(path))
+    neededDirs = set(os.path.dirname(path) for path in needed)
+
+    for patterns in STEPS[pipeline]:
+        for pattern in patterns:
+            for path in glob.glob(workDir + "/" + pattern):
+                path = os.path.normpath(path)
+                if path in needed:
+                    continue
+                if path not in neededDirs:
+                    remove(path, keep)
+                    continue
+                for name in os.listdir(path):
+                    child = os.path.join(path, name)
+                    if child not in needed:
+                        remove(child, keep)
+
+
+def compress_file(file):
+    """Replace text file by its gzip-compressed copy <file>.gz
+
+    Arguments:
+    file (str): path to file
+
+    Returns:
+    None
+    """
+    with open(file, "rb") as fin, gzip.open(file + ".gz.tmp", "wb", compresslevel=6) as fout:
+        shutil.copyfileobj(fin, fout, 1 << 24)
+    os.replace(file + ".gz.tmp", file + ".gz")
+    os.remove(file)
+
+
+def compress_outputs(workDir, nThreads):
+    """Compress GFA, FASTA and feature vectors files of working directory in parallel
+
+    Arguments:
+    workDir (str): path to working directory
+    nThreads (int): number of threads
+
+    Returns:
+    int: number of compressed files
+    """
+    files = [path for pattern in COMPRESSED for path in glob.glob(workDir + "/" + pattern)
+             if os.path.isfile(path) and not os.path.islink(path) and not path.endswith(".gz")]
+    with ThreadPoolExecutor(max_workers=nThreads) as pool:
+        list(pool.map(compress_file, files))
+    return len(files)
+
+
+def format_size(size):
+    """Convert number of bytes into human-readable value
+
+    Arguments:
+    size (int): size in bytes
+
+    Returns:
+    str: size with units
+    """
+    for unit in ["B", "KB", "MB", "GB"]:
+        if size < 1024:
+            return str(round(size, 1)) + " " + unit
+        size /= 1024
+    return str(round(size, 1)) + " TB"
+
+
+if __name__ == "__main__":
+    pipeline = ''
+    workDir = ''
+    retain = 'all'
+    compress = False
+    nThreads = 0
+    keep = []
+
+    helpString = 'Usage: workdir_storage.py --pipeline <name> -w <dir> [--retain all|needed] [--keep <path> ...] [--compress] [-t <int>]'
+
+    try:
+        opts, args = getopt.getopt(sys.argv[1:], "hw:t:", ["pipeline=", "retain=", "keep=", "compress"])
+    except getopt.GetoptError:
+        print(helpString)
+        sys.exit(2)
+    for opt, arg in opts:
+        if opt == "-h":
+            print(helpString)
+            sys.exit()
+        elif opt == "--pipeline":
+            pipeline = arg
+        elif opt == "-w":
+            workDir = arg
+        elif opt == "--retain":
+            retain = arg
+        elif opt == "--keep":
+            keep.append(arg)
+        elif opt == "--compress":
+            compress = True
+        elif opt == "-t":
+            nThreads = int(arg)
+    if pipeline not in STEPS:
+        print("Unknown pipeline '" + pipeline + "'. Select one of: " + ", ".join(STEPS), file=sys.stderr)
+        sys.exit(1)
+    if retain not in ("all", "needed"):
+        print("Unknown retention policy '" + retain + "'. Select one of: all, needed", file=sys.stderr)
+        sys.exit(1)
+    if nThreads <= 0:
+        nThreads = os.cpu_count()
+
+    written = steps_usage(workDir, pipeline)
+    if retain == "needed":
+        retain_needed(workDir, pipeline, keep)
+    if compress:
+        print("Compressed " + str(compress_outputs(workDir, nThreads)) + " text files")
+    kept = steps_usage(workDir, pipeline)
+
+    print("Disk usage of " + workDir + " by steps:")
+    print("step\twritten\tkept")
+    for step, (a, b) in enumerate(zip(written, kept), 1):
+        print(str(step) + "\t" + format_size(a) + "\t" + format_size(b))
+    print("total\t" + format_size(sum(written)) + "\t" + format_size(sum(kept)))